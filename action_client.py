@@ -0,0 +1,202 @@
+"""
+Shared Action Server Client
+
+- One process-wide requests.Session used by every helper that talks to
+  action_server.py (behavior_logic, TextDogCompanion, ActionTester), so calls
+  reuse keep-alive connections instead of opening a TCP connection each time.
+- Connection errors and 502/504 answers are retried with exponential
+  backoff. POSTs are only retried when the connection could not be made, so
+  an enqueue is never applied twice.
+- Connect/read timeouts come from config.py; pass timeout= to override one call.
+- Backpressure: a 429/503 (rate limit, full queue) is retried after the
+  server's Retry-After, and every later sequence upload from this process is
+  spaced out by an adaptive delay that doubles on each refusal and halves on each
+  accepted upload, so producers slow down instead of failing.
+- fetch_sequence() revalidates a cached /get_sequence body with If-None-Match,
+  and upload_batch() sends several sequences (for one or many dogs) in one
+  round-trip.
+
+Usage:
+    from action_client import get, post
+
+    response = post(f"{action_server_url}/upload_sequence", json={"sequence": [...]})
+"""
+
+import os
+import socket
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from config import action_server_url, action_client_pool_size, action_client_connect_timeout
+from config import action_client_read_timeout, action_client_retries, action_client_backoff
+from config import action_client_pushback_retries, action_client_max_backoff
+from wire_format import ACCEPT_BINARY, read_sequence_response
+
+_session = None
+_session_lock = threading.Lock()
+# Sent as X-Client-Id so the server rate-limits each producer process separately
+CLIENT_ID = f"{socket.gethostname()}:{os.getpid()}"
+PUSHBACK_STATUSES = (429, 503)
+# Endpoints that store a sequence; only these are spaced out by upload_throttle
+SEQUENCE_UPLOAD_PATHS = ("/upload_sequence", "/enqueue_sequence", "/append_sequence", "/upload_batch")
+
+
+class AdaptiveThrottle:
+    """
+    Delay between uploads that grows while the server pushes back and
+    shrinks back to zero once it accepts them again.
+    """
+    def __init__(self, max_delay=action_client_max_backoff, min_delay=action_client_backoff):
+        self.max_delay = max_delay
+        self.min_delay = min_delay
+        self.delay = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        delay = self.delay
+        if delay:
+            time.sleep(delay)
+
+    def slow_down(self, retry_after=None):
+        with self._lock:
+            self.delay = min(self.max_delay, max(self.delay * 2, retry_after or 0.0, self.min_delay))
+
+    def speed_up(self):
+        with self._lock:
+            self.delay = self.delay / 2 if self.delay > self.min_delay else 0.0
+
+
+upload_throttle = AdaptiveThrottle()
+
+
+def retry_after(response):
+    """Seconds from a Retry-After header (delta-seconds form), or None"""
+    try:
+        return float(response.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return None
+
+
+def _create_session():
+    retry = Retry(
+        total=action_client_retries,
+        backoff_factor=action_client_backoff,
+        status_forcelist=(502, 504),  # 429/503 are backpressure, handled in request()
+        allowed_methods=frozenset({"GET", "HEAD"}),  # read/status retries; connect errors retry any method
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_maxsize=action_client_pool_size, max_retries=retry)
+    session = requests.Session()
+    session.headers["X-Client-Id"] = CLIENT_ID
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_session():
+    """
+    Get the shared session, creating it on first use.
+    Returns:
+        requests.Session: The process-wide session.
+    """
+    global _session
+    session = _session
+    if session is not None:
+        return session
+    with _session_lock:
+        if _session is None:
+            _session = _create_session()
+        return _session
+
+
+def reset_session():
+    """Close the shared session; the next call opens a new one"""
+    global _session
+    with _session_lock:
+        session, _session = _session, None
+    if session is not None:
+        session.close()
+
+
+def request(method, url, **kwargs):
+    """
+    requests.request() on the shared session, with the configured timeouts.
+    429/503 answers are retried after their Retry-After (the server did not
+    apply the request, so this is safe for POSTs too); the last one is
+    returned if the server keeps refusing. Only sequence uploads go through
+    upload_throttle.
+    """
+    kwargs.setdefault("timeout", (action_client_connect_timeout, action_client_read_timeout))
+    upload = method == "POST" and urlsplit(url).path.endswith(SEQUENCE_UPLOAD_PATHS)
+    if upload:
+        upload_throttle.wait()
+    for attempt in range(action_client_pushback_retries + 1):
+        response = get_session().request(method, url, **kwargs)
+        if response.status_code not in PUSHBACK_STATUSES:
+            if upload:
+                upload_throttle.speed_up()
+            return response
+        delay = retry_after(response)
+        if upload:
+            upload_throttle.slow_down(delay)
+        if attempt < action_client_pushback_retries:
+            # The retry waits here only, not in upload_throttle.wait() as well
+            delay = min(delay or (upload_throttle.delay if upload else action_client_backoff), action_client_max_backoff)
+            print(f"⏳ Action server busy ({response.status_code}); retrying in {delay:.1f}s")
+            time.sleep(delay)
+    return response
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+
+def fetch_sequence(server_url, dog_id, binary=False, cache=None):
+    """
+    GET /get_sequence, sending the cached ETag so an unchanged sequence comes
+    back as an empty 304 Not Modified.
+    Args:
+        cache (dict): dog_id -> (etag, sequence, version), kept by the caller
+                      across calls and updated in place. None disables caching.
+    Returns:
+        tuple: (sequence, version, changed). changed is False when the cached
+               copy was reused.
+    """
+    headers = {"Accept": ACCEPT_BINARY} if binary else {}
+    cached = cache.get(dog_id) if cache is not None else None
+    if cached is not None:
+        headers["If-None-Match"] = cached[0]
+    response = get(f"{server_url}/get_sequence", params={"dog_id": dog_id}, headers=headers)
+    if response.status_code == 304 and cached is not None:
+        return cached[1], cached[2], False
+    response.raise_for_status()
+    sequence, version = read_sequence_response(response)
+    etag = response.headers.get("ETag")
+    if cache is not None and etag:
+        cache[dog_id] = (etag, sequence, version)
+    return sequence, version, True
+
+
+def upload_batch(items, server_url=action_server_url):
+    """
+    Upload several sequences in one request (POST /upload_batch).
+    Args:
+        items (list): {"sequence": [...], "dog_id": ..., "mode": "replace" |
+                      "enqueue" | "append"} dicts, applied in order. dog_id and
+                      mode are optional ("default" dog, replace).
+    Returns:
+        list: One result per item: {"dog_id", "status": "ok", "version"} or
+              {"dog_id", "status": "error", "message"}.
+    """
+    response = post(f"{server_url}/upload_batch", json={"items": items})
+    response.raise_for_status()
+    return response.json()["results"]
@@ -1,17 +1,532 @@
-from flask import Flask, request, jsonify
+import argparse
+import json
+import math
+import signal
+import time
+
+from flask import Flask, Response, request, jsonify, stream_with_context, g
+from werkzeug.exceptions import RequestEntityTooLarge
+
+from config import sequence_long_poll_timeout, sequence_sse_keepalive, default_dog_id
+from config import action_server_store, action_server_db_path, action_server_workers, action_server_threads
+from config import action_server_graceful_timeout, action_server_journal_dir
+from config import max_sequence_steps, max_upload_bytes, queue_full_retry_after, upload_rate_limit
+from sequence_store import SequenceStore, SqliteSequenceStore, QueueFull, StoreFull, SequenceTooLong
+from finger_history import FingerHistory, SqliteFingerHistory
+from journal import Journal, JournaledSequenceStore, JournaledFingerHistory
+from wire_format import CONTENT_TYPE, encode_sequence, decode_sequence
+from server_metrics import RequestMetrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from rate_limit import TokenBucketLimiter
 
 app = Flask(__name__)
-latest_sequence = None
+app.config["MAX_CONTENT_LENGTH"] = max_upload_bytes  # larger bodies get 413
+# One bounded FIFO queue per dog (see sequence_store.py). Every change gets a
+# new version; clients pass the last version they have seen. Each response
+# carries the whole latest sequence, so a client that skips versions still
+# ends up with everything.
+sequences = None
+# Recent hand-tracking entries, read incrementally with ?since=<cursor>
+finger_history = None
+# Durable log of the in-memory state (--store journal), else None
+journal = None
+# Request counts and latency histograms of this process, served by /metrics
+metrics = RequestMetrics()
+# Upload admission per client (per worker process when there are several)
+upload_limiter = TokenBucketLimiter()
+RATE_LIMITED_ENDPOINTS = {"upload_sequence", "enqueue_sequence", "append_sequence", "upload_batch"}
+
+
+def use_store(kind=action_server_store, path=action_server_db_path, journal_dir=action_server_journal_dir):
+    """
+    Select where sequences and finger history live.
+    Args:
+        kind (str): "memory" (this process only), "journal" (this process,
+                    logged to journal_dir and replayed on restart) or
+                    "sqlite" (a WAL database shared by every worker process).
+        path (str): SQLite database file.
+        journal_dir (str): Journal directory.
+    """
+    global sequences, finger_history, journal
+    if journal is not None:
+        journal.close()
+        journal = None
+    if kind == "sqlite":
+        sequences = SqliteSequenceStore(path)
+        finger_history = SqliteFingerHistory(path)
+    elif kind == "memory":
+        sequences = SequenceStore()
+        finger_history = FingerHistory()
+    elif kind == "journal":
+        sequences = JournaledSequenceStore()
+        finger_history = JournaledFingerHistory()
+        journal = Journal(journal_dir)
+        replayed = journal.attach(sequences, finger_history)
+        print(f"📜 Journal {journal_dir}: restored {sequences.stats()['dogs']} dogs ({replayed} records replayed)")
+    else:
+        raise ValueError(f"Unknown store {kind!r}, expected 'memory', 'journal' or 'sqlite'")
+
+
+use_store()
+
+
+def shutdown():
+    """Wake every long-poll and SSE stream so in-flight requests finish quickly"""
+    sequences.close()
+    if journal is not None:
+        journal.close()
+
+
+def dog_id_from(data=None):
+    """Dog/session ID from the JSON body or ?dog_id=, defaulting to the shared queue"""
+    dog_id = (data or {}).get("dog_id") or request.args.get("dog_id") or default_dog_id
+    return str(dog_id)
+
+
+def back_off(message, status, retry_after):
+    """429/503 telling the client to retry after retry_after seconds"""
+    response = jsonify({"status": "error", "message": message, "retry_after": retry_after})
+    response.status_code = status
+    response.headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def queue_full(e):
+    # A dog's full queue drains as it plays (429); a store full of busy dogs is an overload (503)
+    return back_off(str(e), 503 if isinstance(e, StoreFull) else 429, queue_full_retry_after)
+
+
+def client_id():
+    """
+    Rate limiting key: the X-Client-Id header (per producer process) within
+    the client address. The header is advisory; the address is also limited
+    as a whole (see rate_limit.py).
+    """
+    return f"{request.remote_addr}/{request.headers.get('X-Client-Id', '')}"
+
+
+def check_length(sequence):
+    """
+    Raises:
+        RequestEntityTooLarge: If the sequence has more than max_sequence_steps steps.
+    """
+    if isinstance(sequence, list) and len(sequence) > max_sequence_steps:
+        raise RequestEntityTooLarge(f"Sequence has {len(sequence)} steps; the limit is {max_sequence_steps}")
+
+
+def validate_sequence(sequence, allow_null=True):
+    """
+    Check the shape of an uploaded sequence: null (if allow_null), or a list
+    of step objects whose action is a string and whose emotions are
+    {name: weight} or [[name, weight], ...] with numeric weights.
+    Args:
+        allow_null (bool): Whether null (clear the dog) is acceptable; it
+                           isn't for appends.
+    Raises:
+        ValueError: Describing the first problem found.
+        RequestEntityTooLarge: If the sequence is longer than max_sequence_steps.
+    """
+    if sequence is None and allow_null:
+        return
+    if not isinstance(sequence, list):
+        raise ValueError("sequence must be a list of steps" + (" or null" if allow_null else ""))
+    check_length(sequence)
+    for i, step in enumerate(sequence):
+        if not isinstance(step, dict):
+            raise ValueError(f"Step {i} is not an object")
+        if not isinstance(step.get("action"), str):
+            raise ValueError(f"Step {i} has no action name")
+        emotions = step.get("emotions", {})
+        if isinstance(emotions, list) and all(isinstance(pair, list) and len(pair) == 2 for pair in emotions):
+            pairs = emotions
+        elif isinstance(emotions, dict):
+            pairs = emotions.items()
+        else:
+            pairs = None
+        if pairs is None or not all(isinstance(name, str) and isinstance(w, (int, float)) and not isinstance(w, bool)
+                                    for name, w in pairs):
+            raise ValueError(f"Step {i} emotions must map emotion names to numbers")
+
+
+def read_sequence(allow_null=True):
+    """
+    The uploaded sequence, as JSON {"sequence": [...]} or in the binary wire
+    format (Content-Type application/x-dog-sequence, dog_id in the query string).
+    Args:
+        allow_null (bool): Whether a null sequence is acceptable (see validate_sequence).
+    Returns:
+        tuple: (sequence, JSON body or None)
+    Raises:
+        ValueError: If the body is malformed (see validate_sequence).
+        RequestEntityTooLarge: If the sequence is longer than max_sequence_steps.
+    """
+    if request.mimetype == CONTENT_TYPE:
+        sequence, data = decode_sequence(request.get_data()), None
+    else:
+        data = request.get_json()
+        if not isinstance(data, dict) or "sequence" not in data:
+            raise ValueError("Expected {\"sequence\": [...]}")
+        sequence = data["sequence"]
+    validate_sequence(sequence, allow_null)
+    return sequence, data
+
+
+def bad_request(e):
+    return jsonify({"status": "error", "message": str(e)}), 400
+
+
+def sequence_etag(version, queued, binary):
+    # Dequeues change the queued count without a new version, so both go in
+    return f"{version}.{queued}.{'bin' if binary else 'json'}"
+
+
+def sequence_response(sequence, version, queued=None):
+    """
+    Binary body if the client accepts it (version/queued in headers), else JSON.
+    Plain GETs (queued given) carry an ETag; a client sending it back in
+    If-None-Match gets an empty 304 while the sequence is unchanged.
+    """
+    binary = request.accept_mimetypes.best_match(["application/json", CONTENT_TYPE]) == CONTENT_TYPE
+    if binary:
+        try:
+            payload = encode_sequence(sequence)
+        except ValueError:
+            binary = False  # steps the binary format can't carry
+    etag = None if queued is None else sequence_etag(version, queued, binary)
+    if etag is not None and request.if_none_match.contains(etag):
+        response = Response(status=304)
+    elif binary:
+        headers = {"X-Sequence-Version": str(version)}
+        if queued is not None:
+            headers["X-Sequence-Queued"] = str(queued)
+        response = Response(payload, mimetype=CONTENT_TYPE, headers=headers)
+    else:
+        body = {"sequence": sequence, "version": version}
+        if queued is not None:
+            body["queued"] = queued
+        response = jsonify(body)
+    if etag is not None:
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "no-cache"
+        response.vary.add("Accept")
+    return response
+
+
+@app.before_request
+def start_timer():
+    g.started = time.perf_counter()
+
+
+@app.after_request
+def record_metrics(response):
+    started = getattr(g, "started", None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule is not None else "other"
+        metrics.observe(route, request.method, response.status_code, time.perf_counter() - started,
+                        request.content_length or 0,
+                        None if response.is_streamed else response.content_length)
+    return response
+
+
+@app.before_request
+def admit_upload():
+    """Token-bucket rate limit on sequence uploads; reads are never limited"""
+    if request.endpoint not in RATE_LIMITED_ENDPOINTS:
+        return None
+    cost = 1
+    if request.endpoint == "upload_batch":
+        data = request.get_json(silent=True)
+        items = data.get("items") if isinstance(data, dict) else None
+        cost = max(1, len(items)) if isinstance(items, list) else 1
+    wait = upload_limiter.acquire(client_id(), cost, request.remote_addr)
+    if wait:
+        return back_off("Upload rate limit exceeded; slow down", 429, wait)
+    return None
+
+
+@app.errorhandler(RequestEntityTooLarge)
+def too_large(e):
+    message = e.description
+    if message == RequestEntityTooLarge.description:  # raised by MAX_CONTENT_LENGTH
+        message = f"Request body exceeds {max_upload_bytes} bytes"
+    return jsonify({"status": "error", "message": message}), 413
+
+
+@app.errorhandler(SequenceTooLong)
+def sequence_too_long(e):
+    # An append that would take the dog's sequence past max_sequence_steps
+    return jsonify({"status": "error", "message": str(e)}), 413
+
 
 @app.route("/upload_sequence", methods=["POST"])
 def upload_sequence():
-    global latest_sequence
-    latest_sequence = request.get_json()["sequence"]
-    return jsonify({"status": "ok"})
+    """Replace everything queued for the dog with this sequence"""
+    try:
+        sequence, data = read_sequence()
+        version = sequences.replace(sequence, dog_id_from(data))
+    except ValueError as e:
+        return bad_request(e)
+    except QueueFull as e:
+        return queue_full(e)
+    return jsonify({"status": "ok", "version": version})
+
+@app.route("/enqueue_sequence", methods=["POST"])
+def enqueue_sequence():
+    """Queue this sequence to play after the ones already waiting"""
+    try:
+        sequence, data = read_sequence()
+        version = sequences.enqueue(sequence, dog_id_from(data))
+    except ValueError as e:
+        return bad_request(e)
+    except QueueFull as e:
+        return queue_full(e)
+    return jsonify({"status": "ok", "version": version})
+
+@app.route("/append_sequence", methods=["POST"])
+def append_sequence():
+    try:
+        sequence, data = read_sequence(allow_null=False)
+        version = sequences.append(sequence, dog_id_from(data))
+    except ValueError as e:
+        return bad_request(e)
+    except QueueFull as e:
+        return queue_full(e)
+    return jsonify({"status": "ok", "version": version})
+
+@app.route("/upload_batch", methods=["POST"])
+def upload_batch():
+    """
+    Several uploads in one round-trip: {"items": [{"sequence": [...],
+    "dog_id": ..., "mode": "replace" | "enqueue" | "append"}, ...]}, applied
+    in order. Each item succeeds or fails on its own (e.g. a full queue).
+    """
+    data = request.get_json(silent=True)
+    items = data.get("items") if isinstance(data, dict) else None
+    if not isinstance(items, list):
+        return bad_request("Expected {\"items\": [...]}")
+    operations = {"replace": sequences.replace, "enqueue": sequences.enqueue, "append": sequences.append}
+    results = []
+    for item in items:
+        if not isinstance(item, dict):
+            results.append({"dog_id": None, "status": "error", "message": "Item is not an object"})
+            continue
+        dog_id = str(item.get("dog_id") or default_dog_id)
+        mode = item.get("mode", "replace")
+        operation = operations.get(mode) if isinstance(mode, str) else None
+        if operation is None or "sequence" not in item:
+            results.append({"dog_id": dog_id, "status": "error", "message": "Bad mode or missing sequence"})
+            continue
+        try:
+            validate_sequence(item["sequence"], allow_null=mode != "append")
+            results.append({"dog_id": dog_id, "status": "ok", "version": operation(item["sequence"], dog_id)})
+        except ValueError as e:
+            results.append({"dog_id": dog_id, "status": "error", "message": str(e)})
+        except RequestEntityTooLarge as e:
+            results.append({"dog_id": dog_id, "status": "error", "message": e.description})
+        except SequenceTooLong as e:
+            results.append({"dog_id": dog_id, "status": "error", "message": str(e)})
+        except QueueFull as e:
+            results.append({"dog_id": dog_id, "status": "error", "message": str(e),
+                            "retry_after": queue_full_retry_after})
+    return jsonify({"status": "ok", "results": results})
+
+@app.route("/clear_sequence", methods=["POST"])
+def clear_sequence():
+    data = request.get_json(silent=True)
+    try:
+        version = sequences.clear(dog_id_from(data))
+    except QueueFull as e:
+        return queue_full(e)
+    return jsonify({"status": "ok", "version": version})
+
+@app.route("/dequeue_sequence", methods=["POST"])
+def dequeue_sequence():
+    """Take the next queued sequence for the dog (null when nothing is queued)"""
+    data = request.get_json(silent=True)
+    try:
+        sequence, remaining = sequences.dequeue(dog_id_from(data))
+    except QueueFull as e:
+        return queue_full(e)
+    return jsonify({"sequence": sequence, "remaining": remaining})
+
+@app.route("/upload_Fingersequence", methods=["POST"])
+def upload_finger_sequence():
+    """Add hand-tracking entries: {"history": [...]} or a single entry object"""
+    data = request.get_json()
+    if not isinstance(data, dict):
+        return bad_request("Expected {\"history\": [...]} or an entry object")
+    entries = data["history"] if "history" in data else [data]
+    if not isinstance(entries, list) or not all(isinstance(entry, dict) for entry in entries):
+        return bad_request("history must be a list of entry objects")
+    return jsonify({"status": "ok", "cursor": finger_history.add(entries)})
+
+@app.route("/get_Fingersequence", methods=["GET"])
+def get_finger_sequence():
+    """
+    Without arguments: every buffered entry, as {"history": [...]}.
+    With ?since=<cursor>: only entries added after the cursor, plus the new
+    cursor; reset is true when the client missed entries and should rebuild
+    its window from the returned ones.
+    """
+    entries, cursor, reset = finger_history.since(request.args.get("since", -1, type=int))
+    return jsonify({"history": entries, "cursor": cursor, "reset": reset})
 
 @app.route("/get_sequence", methods=["GET"])
 def get_sequence():
-    return jsonify({"sequence": latest_sequence})
+    """
+    Plain GET returns the dog's latest sequence immediately (JSON, or the
+    binary wire format with Accept: application/x-dog-sequence).
+    Long-poll: /get_sequence?since=<version>[&timeout=<seconds>] blocks until a
+    newer version is stored, or answers 204 No Content on timeout.
+    """
+    dog_id = dog_id_from()
+    since = request.args.get("since", type=int)
+    if since is None:
+        sequence, version, queued = sequences.get(dog_id)
+        return sequence_response(sequence, version, queued)
+    timeout = min(request.args.get("timeout", sequence_long_poll_timeout, type=float), sequence_long_poll_timeout)
+    sequence, version = sequences.wait_for_version(since, timeout, dog_id)
+    if version is None:
+        return Response(status=204, headers={"X-Sequence-Version": str(since)})
+    return sequence_response(sequence, version)
+
+@app.route("/stream_sequence", methods=["GET"])
+def stream_sequence():
+    """
+    Server-sent events: one "sequence" event per new version, with the version
+    as the event id. Reconnecting clients resume via Last-Event-ID (or ?since=).
+    """
+    dog_id = dog_id_from()
+    since = request.headers.get("Last-Event-ID", type=int)
+    if since is None:
+        since = request.args.get("since", 0, type=int)
+
+    def events(since):
+        while True:
+            sequence, version = sequences.wait_for_version(since, sequence_sse_keepalive, dog_id)
+            if version is None and sequences.closed:
+                return  # server shutting down; the client reconnects with Last-Event-ID
+            if version is None:
+                yield ": keep-alive\n\n"
+                continue
+            since = version
+            yield f"id: {version}\nevent: sequence\ndata: {json.dumps({'sequence': sequence, 'version': version})}\n\n"
+
+    return Response(stream_with_context(events(since)), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    """Prometheus text format: per-route counters/histograms plus queue gauges"""
+    stats = sequences.stats()
+    now = time.time()
+
+    def age(stamp):
+        return None if stamp is None else max(0.0, now - stamp)
+
+    gauges = [
+        ("action_server_dogs", "Dogs with a queue.", stats["dogs"]),
+        ("action_server_queued_sequences", "Sequences queued over all dogs.", stats["queued"]),
+        ("action_server_max_queue_depth", "Sequences queued for the dog with the longest queue.",
+         stats["max_queued"]),
+        ("action_server_sequence_age_seconds", "Seconds since the newest sequence change.",
+         age(stats["newest_change"])),
+        ("action_server_oldest_queued_age_seconds",
+         "Seconds since the least recently changed dog with queued sequences was changed.",
+         age(stats["oldest_queued_change"])),
+        ("action_server_finger_cursor", "Finger entries received (sequence number of the newest).",
+         finger_history.cursor),
+    ]
+    return Response(metrics.render(gauges), content_type=METRICS_CONTENT_TYPE)
+
+
+def serve(host, port, workers=action_server_workers, threads=action_server_threads):
+    """
+    Serve with a production WSGI server: gunicorn (multi-process, Linux/macOS)
+    if installed, else waitress (multi-threaded, single process), else the
+    Flask development server. SIGTERM / Ctrl+C shut down gracefully: new
+    connections are refused and in-flight requests get
+    action_server_graceful_timeout seconds to finish.
+    """
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        BaseApplication = None
+
+    if BaseApplication is not None:
+        def post_worker_init(worker):
+            if journal is not None:
+                # The journal's threads didn't survive the fork, and a restarted
+                # worker must pick up what the previous one logged
+                use_store("journal", journal_dir=journal.directory)
+            # Wake long-polls before gunicorn waits for in-flight requests
+            previous = signal.getsignal(signal.SIGTERM)
+
+            def handle_term(signum, frame):
+                shutdown()
+                if callable(previous):
+                    previous(signum, frame)
+
+            signal.signal(signal.SIGTERM, handle_term)
+
+        class GunicornServer(BaseApplication):
+            def load_config(self):
+                self.cfg.set("bind", f"{host}:{port}")
+                self.cfg.set("workers", workers)
+                self.cfg.set("threads", threads)
+                self.cfg.set("worker_class", "gthread")
+                self.cfg.set("graceful_timeout", int(action_server_graceful_timeout))
+                self.cfg.set("post_worker_init", post_worker_init)
+
+            def load(self):
+                return app
+
+        print(f"🚀 Action server on {host}:{port} (gunicorn, {workers} workers x {threads} threads)")
+        GunicornServer().run()
+        return
+
+    try:
+        from waitress import serve as waitress_serve
+    except ImportError:
+        waitress_serve = None
+    try:
+        if waitress_serve is not None:
+            if workers > 1:
+                print("⚠️  gunicorn is not available; serving from one waitress process")
+            print(f"🚀 Action server on {host}:{port} (waitress, {threads} threads)")
+            waitress_serve(app, host=host, port=port, threads=threads)
+        else:
+            print("⚠️  Neither gunicorn nor waitress is installed; using the Flask development server")
+            app.run(host=host, port=port, threaded=True)
+    finally:
+        shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Action sequence server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=50007)
+    parser.add_argument("--production", action="store_true",
+                        help="serve with gunicorn/waitress instead of the Flask development server")
+    parser.add_argument("--workers", type=int, default=action_server_workers)
+    parser.add_argument("--threads", type=int, default=action_server_threads)
+    parser.add_argument("--store", choices=["memory", "journal", "sqlite"], default=action_server_store)
+    parser.add_argument("--db", default=action_server_db_path, help="SQLite database for --store sqlite")
+    parser.add_argument("--journal", default=action_server_journal_dir, help="directory for --store journal")
+    parser.add_argument("--upload-rate-limit", type=float, default=upload_rate_limit,
+                        help="uploads per second per client (0 turns admission control off)")
+    args = parser.parse_args()
+    upload_limiter.rate = args.upload_rate_limit
+
+    store = args.store
+    if args.production and args.workers > 1 and store != "sqlite":
+        print("ℹ️  Several workers need a shared store; using --store sqlite")
+        store = "sqlite"
+    use_store(store, args.db, args.journal)
+
+    if args.production:
+        serve(args.host, args.port, args.workers, args.threads)
+    else:
+        app.run(host=args.host, port=args.port, threaded=True)
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=50007)
\ No newline at end of file
+    main()
@@ -14,12 +14,18 @@ Features:
 
 import requests
 import json
-from config import core_sentiments, allowed_actions, actions_short
+from config import core_sentiments, allowed_actions, actions_short, action_server_url
+from config import action_server_binary, default_dog_id
+from wire_format import sequence_request
+import action_client
+from action_client import fetch_sequence
 from dog_personality import DogPersonality
 
 class ActionTester:
     def __init__(self):
-        self.server_url = "http://localhost:50007"
+        self.server_url = action_server_url
+        self.binary = action_server_binary  # compact binary uploads/downloads (wire_format.py)
+        self.sequence_cache = {}  # ETag-validated copy of the server sequence
         self.dog = DogPersonality()  # Instantiate DogPersonality
         self.current_sequence = []
         
@@ -122,14 +128,15 @@ class ActionTester:
         print(f"Current sequence length: {len(self.current_sequence)}")
         # Upload immediately
         try:
-            response = requests.post(f"{self.server_url}/upload_sequence", json={"sequence": [action_entry]})
+            response = action_client.post(f"{self.server_url}/upload_sequence",
+                                          **sequence_request([action_entry], default_dog_id, self.binary))
             if response.status_code == 200:
                 print(f"\n✓ Uploaded action with full emotion vector to server!")
             else:
                 print(f"\n✗ Failed to upload. Status code: {response.status_code}")
         except requests.exceptions.RequestException as e:
             print(f"\n✗ Error connecting to server: {e}")
-            print("Make sure the server is running on localhost:50007")
+            print(f"Make sure the server is running on {self.server_url}")
         
     def view_current_sequence(self):
         if not self.current_sequence:
@@ -150,8 +157,8 @@ class ActionTester:
             return
             
         try:
-            response = requests.post(f"{self.server_url}/upload_sequence", 
-                                   json={"sequence": self.current_sequence})
+            response = action_client.post(f"{self.server_url}/upload_sequence",
+                                          **sequence_request(self.current_sequence, default_dog_id, self.binary))
             if response.status_code == 200:
                 print(f"\n✓ Successfully uploaded {len(self.current_sequence)} actions to server!")
                 print("Response:", response.json())
@@ -159,26 +166,26 @@ class ActionTester:
                 print(f"\n✗ Failed to upload. Status code: {response.status_code}")
         except requests.exceptions.RequestException as e:
             print(f"\n✗ Error connecting to server: {e}")
-            print("Make sure the server is running on localhost:50007")
+            print(f"Make sure the server is running on {self.server_url}")
             
     def get_sequence_from_server(self):
         try:
-            response = requests.get(f"{self.server_url}/get_sequence")
-            if response.status_code == 200:
-                data = response.json()
-                sequence = data.get("sequence", [])
-                if sequence:
-                    print(f"\nServer Sequence ({len(sequence)} actions):")
-                    for i, entry in enumerate(sequence, 1):
-                        action = entry["action"]
-                        emotions = entry["emotions"]
-                        print(f"{i:2d}. Action: {action}")
-                        for emotion, weight in emotions.items():
-                            print(f"      {emotion}: {weight}")
-                else:
-                    print("\nNo sequence on server.")
+            sequence, _, changed = fetch_sequence(self.server_url, default_dog_id, self.binary,
+                                                  self.sequence_cache)
+            if not changed:
+                print("\n(Server sequence unchanged since last fetch)")
+            if sequence:
+                print(f"\nServer Sequence ({len(sequence)} actions):")
+                for i, entry in enumerate(sequence, 1):
+                    action = entry["action"]
+                    emotions = entry["emotions"]
+                    print(f"{i:2d}. Action: {action}")
+                    for emotion, weight in emotions.items():
+                        print(f"      {emotion}: {weight}")
             else:
-                print(f"\n✗ Failed to get sequence. Status code: {response.status_code}")
+                print("\nNo sequence on server.")
+        except requests.exceptions.HTTPError as e:
+            print(f"\n✗ Failed to get sequence. Status code: {e.response.status_code}")
         except requests.exceptions.RequestException as e:
             print(f"\n✗ Error connecting to server: {e}")
             
@@ -188,8 +195,7 @@ class ActionTester:
         
     def clear_server_sequence(self):
         try:
-            response = requests.post(f"{self.server_url}/upload_sequence", 
-                                   json={"sequence": []})
+            response = action_client.post(f"{self.server_url}/clear_sequence", json={})
             if response.status_code == 200:
                 print("\n✓ Cleared server sequence.")
             else:
@@ -242,7 +248,7 @@ class ActionTester:
         Fetch and display the finger sequence history from /get_Fingersequence endpoint.
         """
         try:
-            response = requests.get(f"{self.server_url}/get_Fingersequence")
+            response = action_client.get(f"{self.server_url}/get_Fingersequence")
             if response.status_code == 200:
                 data = response.json()
                 history = data.get("history", [])
@@ -17,12 +17,25 @@ Sections:
 """
 
 import os
-import openai
+import asyncio
 import requests
 import time
 import json
 from dog_personality import DogPersonality
-from config import core_sentiments, action_transitions, rules, allowed_actions
+from llm_client import get_llm_client, report_llm_failure
+from reaction_cache import reaction_cache
+from hedged_requests import hedged_call, AttemptCancelled
+from prompt_builder import build_gesture_messages, build_text_messages, goal_max_tokens, prompt_stats
+from goal_parser import get_validator, structured_output_options, StreamingGoalParser
+from fallback_planner import plan_fallback_goals, plan_with_deadline, stream_with_deadline, LatePlan
+from fallback_planner import late_plan_window
+from config import core_sentiments, action_transitions, allowed_actions, llm_model, llm_streaming
+from config import llm_fallback_enabled, fallback_replace_late_plan, late_plan_wait, llm_deadline
+from config import action_server_url, sequence_long_poll_timeout, default_dog_id, action_server_binary
+from config import action_client_connect_timeout
+from wire_format import ACCEPT_BINARY, sequence_request, read_sequence_response
+import action_client
+from action_client import fetch_sequence
 
 
 # 1. Data Structures
@@ -47,7 +60,7 @@ def shortest_action_path(dog, start_action, end_action, emotionAction):
     queue = deque()
     # Start with initial emotions
     dog.blend_emotions(emotionAction)
-    initial_emotions = dog.get_emotion_vector().copy()
+    initial_emotions = dog.get_emotion_vector()
     queue.append((start_action, [(start_action, initial_emotions)]))
     visited = set([start_action])
 
@@ -62,14 +75,16 @@ def shortest_action_path(dog, start_action, end_action, emotionAction):
                 visited.add(next_action)
                 # Update emotions for this action
                 dog.blend_emotions(emotionAction)
-                current_emotions = dog.get_emotion_vector().copy()
+                current_emotions = dog.get_emotion_vector()
                 queue.append((next_action, path_so_far + [(next_action, current_emotions)]))
     return None
 
 # New function to directly blend emotions for an action
 def direct_emotion_blend(dog, action, emotions):
     dog.blend_emotions(emotions)
-    return (action, dog.get_emotion_vector())
+    vector = dog.get_emotion_vector()
+    dog.record_emotions(action)
+    return (action, vector)
 
 
 # Updated buildSequence function to use direct_emotion_blend
@@ -91,107 +106,301 @@ def buildSequence(dog, valid_goals):
     return fullSequence
     
 
-def get_llm_goals(dog_personality):    
-    if not os.getenv("OPENAI_API_KEY"):
-        raise RuntimeError("OPENAI_API_KEY environment variable not set.")
-
-    # Initialize the OpenAI client with the new API
-    client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+def build_goal_messages(dog_personality):
+    """
+    Build the chat messages asking the LLM to react to the latest (gesture) input.
+    """
+    return build_gesture_messages(dog_personality)
 
-    personality = dog_personality.get_personality()
-    emotion = dog_personality.get_emotion_vector()
-   
+def build_text_goal_messages(dog_personality, user_text):
+    """
+    Build the chat messages asking the LLM to react to written text input.
+    """
+    return build_text_messages(dog_personality, user_text)
 
-    # Get the last user input 
-    recent_inputs = dog_personality.get_user_inputs()[-1:]
-    
+def _cache_key(dog_personality, user_input, kind):
+    return reaction_cache.make_key(
+        dog_personality.get_personality(), user_input, dog_personality.get_emotion_vector(), kind
+    )
 
-    prompt = f"""
-You are a dog with the following personality: {personality}
+def goal_prompt(dog_personality, user_text=None, kind=None):
+    """
+    Read everything a goal request needs from the dog, so the request itself
+    can run on another thread without touching it.
+    Args:
+        dog_personality (DogPersonality): The dog to plan for.
+        user_text (str, optional): Written text input; gesture prompt if None.
+        kind (str, optional): Reaction cache namespace ("gesture" or "text" by default).
+    Returns:
+        tuple: (cache_key, cached_goals, messages). messages is None when the
+               reaction cache already has the goals.
+    """
+    kind = kind or ("gesture" if user_text is None else "text")
+    cache_key = None
+    if reaction_cache is not None:
+        user_input = dog_personality.get_user_inputs()[-1:] if user_text is None else user_text
+        cache_key = _cache_key(dog_personality, user_input, kind)
+        cached_goals = reaction_cache.get(cache_key)
+        if cached_goals is not None:
+            return cache_key, cached_goals, None
+    if user_text is None:
+        return cache_key, None, build_goal_messages(dog_personality)
+    return cache_key, None, build_text_goal_messages(dog_personality, user_text)
+
+def cached_goal_request(prompt, actions=allowed_actions, timeout=None):
+    """
+    Get the goals for a goal_prompt(): from the reaction cache if it had
+    them, otherwise from a hedged LLM call whose result is cached. Only talks
+    to the LLM, never to the dog, so it can run on a worker thread.
+    Args:
+        prompt (tuple): goal_prompt() result.
+        actions (list): Allowed action names (allowed_actions or actions_short).
+        timeout (float): Seconds per LLM request, without client retries (None:
+                         the client's llm_timeout and llm_max_retries).
+    Returns:
+        list: Validated goals.
+    Raises:
+        RuntimeError: If no valid goals could be obtained.
+    """
+    cache_key, cached_goals, messages = prompt
+    # Repeated inputs are served from the reaction cache without an LLM call
+    if cached_goals is not None:
+        print("Valid goals (cached):", cached_goals)
+        return cached_goals
 
-{rules}
-"""
-    userPrompt= f""" I am doing this currently {recent_inputs} I need you to react in an excited and very unique manner utilizing different commands and possibilities DO NOT JUST USE SIT AND WALK OR ELSE I WILL BEAT YOU"""
+    if not os.getenv("OPENAI_API_KEY"):
+        raise RuntimeError("OPENAI_API_KEY environment variable not set.")
 
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": prompt},
-                {"role": "user", "content": userPrompt}
-                ],
-            max_tokens=512,
+    # Reuse the shared, pooled OpenAI client
+    client = get_llm_client()
+    if timeout is not None:
+        client = client.with_options(timeout=timeout, max_retries=0)
+
+    def request_goals(cancelled):
+        if cancelled.is_set():
+            raise AttemptCancelled()
+        started = time.perf_counter()
+        # Streamed, so an attempt that lost the hedge can close its connection
+        # (and stop generation) at the next chunk instead of running to the end
+        stream = client.chat.completions.create(
+            model=llm_model,
+            messages=messages,
+            max_tokens=goal_max_tokens(),
             temperature=0.7,
+            stream=True,
+            stream_options={"include_usage": True},
+            **structured_output_options(actions),
         )
-        content = response.choices[0].message.content.strip()
-        return parse_llm_goal_output(content, allowed_actions, core_sentiments)
+        parts = []
+        try:
+            for chunk in stream:
+                if cancelled.is_set():
+                    raise AttemptCancelled()
+                if chunk.usage is not None:
+                    prompt_stats.record(chunk.usage, time.perf_counter() - started)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+        finally:
+            stream.close()
+        return parse_llm_goal_output("".join(parts).strip(), actions, core_sentiments)
+
+    try:
+        # Hedged: backup attempts for slow responses or outputs that fail validation
+        valid_goals = hedged_call(request_goals)
+        if cache_key is not None:
+            reaction_cache.put(cache_key, valid_goals)
+        return valid_goals
     except Exception as e:
+        report_llm_failure(e)
         raise RuntimeError(f"Failed to get valid LLM goals: {e}")
 
-def get_llm_goals_from_text(dog_personality, user_text):    
+def get_llm_goals(dog_personality):
     """
-    Generate dog actions based on written text input instead of finger sequences.
+    Generate dog actions for the latest (gesture) input.
     """
-    if not os.getenv("OPENAI_API_KEY"):
-        raise RuntimeError("OPENAI_API_KEY environment variable not set.")
-
-    # Initialize the OpenAI client with the new API
-    client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
-    personality = dog_personality.get_personality()
-    emotion = dog_personality.get_emotion_vector()
-    
-    # Get the last few user inputs for context
-    recent_inputs = dog_personality.get_user_inputs()[-3:]
-    
-    prompt = f"""
-You are a dog with the following personality: {personality}
+    return cached_goal_request(goal_prompt(dog_personality))
 
-{rules}
-"""
-    
-    userPrompt = f"""The human said to me: "{user_text}"
+def get_llm_goals_from_text(dog_personality, user_text):
+    """
+    Generate dog actions based on written text input instead of finger sequences.
+    """
+    return cached_goal_request(goal_prompt(dog_personality, user_text))
 
-Recent conversation context: {recent_inputs}
+def stream_llm_goals(dog_personality, user_text=None, max_goals=3, prompt=None, timeout=None):
+    """
+    Stream the LLM completion and yield each validated goal as soon as its
+    ("Action", [(emotion, w), ...]) tuple closes, instead of waiting for the
+    whole list.
+    Args:
+        dog_personality (DogPersonality): The dog to plan for.
+        user_text (str, optional): Written text input; gesture prompt if None.
+        max_goals (int): Stop after this many valid goals.
+        prompt (tuple, optional): goal_prompt() result, read from the dog in
+                                  advance; the generator then never reads the dog.
+        timeout (float, optional): Seconds for the LLM request, without client
+                                   retries (None: the client's settings).
+    Yields:
+        tuple: (action, [(emotion, weight), ...])
+    """
+    cache_key, cached_goals, messages = prompt or goal_prompt(dog_personality, user_text)
+    if cached_goals is not None:
+        for goal in cached_goals[:max_goals]:
+            yield goal
+        return
 
-I need to react as a dog would to this human communication. Consider:
-- The tone and emotion in their words
-- What they might want me to do
-- How I should respond based on my personality
-- Whether they're being friendly, commanding, playful, or emotional
+    if not os.getenv("OPENAI_API_KEY"):
+        raise RuntimeError("OPENAI_API_KEY environment variable not set.")
 
-React in an authentic dog-like manner with varied and creative actions!"""
+    client = get_llm_client()
+    if timeout is not None:
+        client = client.with_options(timeout=timeout, max_retries=0)
 
+    parser = StreamingGoalParser(allowed_actions, core_sentiments, max_goals=max_goals)
+    streamed_goals = []
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": prompt},
-                {"role": "user", "content": userPrompt}
-                ],
-            max_tokens=512,
+        started = time.perf_counter()
+        stream = client.chat.completions.create(
+            model=llm_model,
+            messages=messages,
+            max_tokens=goal_max_tokens(),
             temperature=0.7,
+            stream=True,
+            stream_options={"include_usage": True},
         )
-        content = response.choices[0].message.content.strip()
-        return parse_llm_goal_output(content, allowed_actions, core_sentiments)
+        try:
+            for chunk in stream:
+                if chunk.usage is not None:
+                    prompt_stats.record(chunk.usage, time.perf_counter() - started)
+                if not chunk.choices:
+                    continue
+                text = chunk.choices[0].delta.content
+                if text:
+                    for goal in parser.feed(text):
+                        streamed_goals.append(goal)
+                        yield goal
+                if parser.done:
+                    break
+        finally:
+            stream.close()
     except Exception as e:
-        raise RuntimeError(f"Failed to get valid LLM goals from text: {e}")
+        report_llm_failure(e)
+        raise RuntimeError(f"Failed to stream LLM goals: {e}")
+    if parser.goal_count == 0:
+        raise RuntimeError("LLM output did not meet valid goal constraints.")
+    if cache_key is not None:
+        reaction_cache.put(cache_key, streamed_goals)
 
 # 5. System Loop & Interrupt Handling
 # -----------------------------------
-def newInput(dog, user_input):
+def plan_goals(dog, user_input):
+    """
+    Record the user input and ask the LLM for goals (local fallback plan if
+    the LLM misses its deadline or fails).
+    Does not touch the dog's emotions; that happens in buildSequence.
+    """
     dog.add_user_input(user_input)
-    valid_goals=get_llm_goals(dog)
+    prompt = goal_prompt(dog)
+    # The late plan is discarded, so the request is only useful until the deadline
+    valid_goals, _ = plan_with_fallback(dog, user_input, lambda: cached_goal_request(prompt, timeout=llm_deadline))
+    return valid_goals
+
+def plan_with_fallback(dog, user_input, llm_planner, actions=allowed_actions):
+    """
+    Run llm_planner within config.llm_deadline, falling back to the local planner.
+    llm_planner runs on the executor, so it must not read the dog: build its
+    prompt first (goal_prompt) and pass only the request (cached_goal_request).
+    Returns:
+        tuple: (valid_goals, late_plan) where late_plan is the pending LLM
+               plan (LatePlan) if the fallback plan was used, otherwise None.
+    """
+    if not llm_fallback_enabled:
+        return llm_planner(), None
+    valid_goals, source, late_plan = plan_with_deadline(
+        llm_planner, lambda: plan_fallback_goals(dog, user_input, actions)
+    )
+    return valid_goals, late_plan and LatePlan(late_plan, dog)
+
+def apply_late_plan(dog, late_plan, timeout=late_plan_wait, upload=None):
+    """
+    Wait (on the thread that owns the dog) up to timeout seconds for a late
+    LLM plan, then build and upload it in place of the fallback reaction.
+    The fallback plan's emotion blend is undone first, so the dog's emotions
+    reflect the input once. Nothing happens if the plan failed, is still
+    running, or a newer input has arrived.
+    Returns:
+        list or None: The uploaded sequence, if the late plan was applied.
+    """
+    if late_plan is None or not fallback_replace_late_plan:
+        return None
+    late_plan.wait(timeout)
+    valid_goals = late_plan.goals(dog)
+    if valid_goals is None:
+        late_plan.cancel()
+        return None
+    dog.set_emotion_vector(late_plan.emotions)
+    json_ready_sequence = to_json_sequence(buildSequence(dog, valid_goals))
+    (upload or upload_sequence)(json_ready_sequence)
+    print("🔁 Replaced fallback reaction with the late LLM plan")
+    return json_ready_sequence
+
+def to_json_sequence(fullSequence):
+    return [{"action": act, "emotions": emos} for (act, emos) in fullSequence]
+
+def newInput(dog, user_input, stream=llm_streaming, late_plan_timeout=late_plan_wait):
+    if stream:
+        return newInput_streaming(dog, user_input, late_plan_timeout=late_plan_timeout)
+    dog.add_user_input(user_input)
+    prompt = goal_prompt(dog)
+    valid_goals, late_plan = plan_with_fallback(
+        dog, user_input, lambda: cached_goal_request(prompt, timeout=late_plan_window)
+    )
     fullSequence=buildSequence(dog, valid_goals)
     
-    json_ready_sequence = [{"action": act, "emotions": emos} for (act, emos) in fullSequence]
+    json_ready_sequence = to_json_sequence(fullSequence)
     print("JsonSequence:", json_ready_sequence)
     upload_sequence(json_ready_sequence)
+    return apply_late_plan(dog, late_plan, late_plan_timeout) or json_ready_sequence
+
+def newInput_streaming(dog, user_input, user_text=None, late_plan_timeout=late_plan_wait):
+    """
+    Streaming variant of newInput: each goal is blended and pushed to the
+    action server as soon as the LLM finishes emitting it, so the first
+    animation starts after the first tuple instead of after the whole list.
+    If the first goal misses config.llm_deadline (or the stream fails), the
+    local fallback plan is uploaded instead, and the streamed plan replaces
+    it when it completes (apply_late_plan).
+    """
+    dog.add_user_input(user_input)
+    # The dog is read here; the stream itself runs without touching it
+    goals = stream_llm_goals(dog, user_text=user_text, prompt=goal_prompt(dog, user_text), timeout=late_plan_window)
+    if llm_fallback_enabled:
+        goals, source, late_plan = stream_with_deadline(
+            goals, lambda: plan_fallback_goals(dog, user_text or user_input)
+        )
+        if source == "fallback":
+            late_plan = late_plan and LatePlan(late_plan, dog)
+            json_ready_sequence = to_json_sequence(buildSequence(dog, goals))
+            upload_sequence(json_ready_sequence)
+            print("Fallback sequence:", json_ready_sequence)
+            return apply_late_plan(dog, late_plan, late_plan_timeout) or json_ready_sequence
+
+    json_ready_sequence = []
+    for action, emotions in goals:
+        act, emos = direct_emotion_blend(dog, action, emotions)
+        step = {"action": act, "emotions": emos}
+        if json_ready_sequence:
+            append_sequence([step])
+        else:
+            upload_sequence([step])
+        json_ready_sequence.append(step)
+        print("Streamed step:", step)
     return json_ready_sequence
 
-def newInput_from_text(dog, user_text, auto_upload=True):
+def newInput_from_text(dog, user_text, auto_upload=True, late_plan_timeout=late_plan_wait):
     """
     Process written text input and generate dog response sequence.
+    If the fallback plan was uploaded, waits up to late_plan_timeout seconds
+    for the LLM plan to replace it.
     """
     print(f"\n🐕 Processing text input: '{user_text}'")
     
@@ -199,8 +408,11 @@ def newInput_from_text(dog, user_text, auto_upload=True):
     dog.add_user_input(user_text)
     
     try:
-        # Get LLM goals based on text input
-        valid_goals = get_llm_goals_from_text(dog, user_text)
+        # Get LLM goals based on text input (local fallback plan if the LLM is slow or fails)
+        prompt = goal_prompt(dog, user_text)
+        valid_goals, late_plan = plan_with_fallback(
+            dog, user_text, lambda: cached_goal_request(prompt, timeout=late_plan_window)
+        )
         print(f"📋 Generated {len(valid_goals)} goals: {[goal[0] for goal in valid_goals]}")
         
         # Build the action sequence
@@ -218,6 +430,7 @@ def newInput_from_text(dog, user_text, auto_upload=True):
         if auto_upload:
             upload_sequence(json_ready_sequence)
             print("✅ Uploaded sequence to server!")
+            json_ready_sequence = apply_late_plan(dog, late_plan, late_plan_timeout) or json_ready_sequence
             
         return json_ready_sequence
         
@@ -225,67 +438,69 @@ def newInput_from_text(dog, user_text, auto_upload=True):
         print(f"❌ Error processing text input: {e}")
         return None
 
-import requests
+def upload_sequence(sequence, dog_id=default_dog_id):
+    """Replace everything queued for the dog on the action server with this sequence"""
+    response = action_client.post(f"{action_server_url}/upload_sequence",
+                                  **sequence_request(sequence, dog_id, action_server_binary))
+    return response.json()
 
-def upload_sequence(sequence):
-    response = requests.post("http://localhost:50007/upload_sequence", json={"sequence": sequence})
+def enqueue_sequence(sequence, dog_id=default_dog_id):
+    """Queue a sequence to play after the ones already waiting for the dog"""
+    response = action_client.post(f"{action_server_url}/enqueue_sequence",
+                                  **sequence_request(sequence, dog_id, action_server_binary))
     return response.json()
 
-def get_sequence():
-    response = requests.get("http://localhost:50007/get_sequence")
-    data=response.json()
-    print ("Data:", data)
-    return data["sequence"]
+def append_sequence(steps, dog_id=default_dog_id):
+    response = action_client.post(f"{action_server_url}/append_sequence",
+                                  **sequence_request(steps, dog_id, action_server_binary))
+    return response.json()
 
-import ast
+def upload_sequences(items):
+    """
+    Upload several sequences, for one dog or many, in a single round-trip.
+    Args:
+        items (list): {"sequence": [...], "dog_id": ..., "mode": "replace"|"enqueue"|"append"}
+    Returns:
+        list: Per-item results from the server.
+    """
+    return action_client.upload_batch(items, action_server_url)
+
+# dog_id -> (etag, sequence, version) of the last /get_sequence body
+_sequence_cache = {}
+
+def get_sequence(dog_id=default_dog_id):
+    sequence, version, changed = fetch_sequence(action_server_url, dog_id, action_server_binary, _sequence_cache)
+    print ("Data:", {"sequence": sequence, "version": version, "changed": changed})
+    return sequence
+
+def wait_for_sequence(since_version, timeout=sequence_long_poll_timeout, dog_id=default_dog_id):
+    """
+    Long-poll the action server for a sequence newer than since_version.
+    Returns:
+        tuple: (sequence, version), or (None, since_version) if nothing new arrived.
+    """
+    response = action_client.get(f"{action_server_url}/get_sequence",
+                                 params={"since": since_version, "timeout": timeout, "dog_id": dog_id},
+                                 headers={"Accept": ACCEPT_BINARY} if action_server_binary else None,
+                                 timeout=(action_client_connect_timeout, timeout + 5))
+    if response.status_code == 204:
+        return None, since_version
+    return read_sequence_response(response)
+
+def validate_goal_item(item, allowed_actions, allowed_emotions):
+    """
+    Validate a single ("Action", [(emotion, weight), ...]) goal tuple.
+    Returns:
+        tuple or None: (action, [(emotion, float_weight), ...]) if valid, else None.
+    """
+    return get_validator(allowed_actions, allowed_emotions).validate_item(item)
 
 def parse_llm_goal_output(content, allowed_actions, allowed_emotions, max_goals=3):
-    # Remove code fencing if present
-    content = content.strip()
-    if content.startswith("```"):
-        content = content.split("\n", 1)[-1]
-    if content.endswith("```"):
-        content = content.rsplit("```", 1)[0]
-    # Only grab substring that is a list
-    start = content.find('[')
-    end = content.rfind(']')
-    if start == -1 or end == -1:
-        raise ValueError("No valid list in LLM output.")
-    content = content[start:end+1]
-    # Parse as Python literal (list of tuples)
-    try:
-        goals = ast.literal_eval(content)
-    except Exception as e:
-        raise ValueError(f"Could not parse LLM output as Python data: {e}")
-    if isinstance(goals, tuple):  # Make singletons into list
-        goals = [goals]
-    if not isinstance(goals, list):
-        raise ValueError("Parsed LLM output is not a list.")
-
-    valid_goals = []
-    for item in goals:
-        if not (isinstance(item, tuple) and len(item) == 2):
-            continue
-        action, emotions = item
-        if action not in allowed_actions:
-            continue
-        if (
-            isinstance(emotions, list) and
-            1 <= len(emotions) <= 10 and  # You can set max number if you wish
-            all(
-                isinstance(e, tuple) and len(e) == 2 and
-                e[0] in allowed_emotions and
-                isinstance(e[1], (float, int))
-                for e in emotions
-            )
-        ):
-            total_weight = sum(float(e[1]) for e in emotions)
-            if 0.0 <= total_weight <= 1.05:  # A small buffer for float math
-                valid_emotions = [(e[0], float(e[1])) for e in emotions]
-                valid_goals.append((action, valid_emotions))
-
-    if not (1 <= len(valid_goals) <= max_goals):
-        raise RuntimeError("LLM output did not meet valid goal constraints.")
+    """
+    Parse LLM output (legacy tuple list or JSON structured output) into valid goals.
+    Plans longer than max_goals are truncated; raises ValueError if nothing validates.
+    """
+    valid_goals = get_validator(allowed_actions, allowed_emotions, max_goals).parse(content)
     print("Valid goals:", valid_goals)
     return valid_goals
 
@@ -295,7 +510,7 @@ def parse_llm_goal_output(content, allowed_actions, allowed_emotions, max_goals=
 def get_finger_sequence():
     """Poll the finger sequence server for user input history"""
     try:
-        response = requests.get("http://127.0.0.1:50007/get_Fingersequence", timeout=5)
+        response = action_client.get(f"{action_server_url}/get_Fingersequence")
         if response.status_code == 200:
             data = response.json()
             # Handle the new structure with "history" key
@@ -311,11 +526,30 @@ def get_finger_sequence():
         print(f"Error connecting to finger sequence server: {e}")
         return {}
 
-def parse_finger_sequence_to_user_input(finger_sequence):
-    """Convert finger sequence data into meaningful user input for the LLM"""
-    if not finger_sequence:
-        return "No user activity detected"
-    
+def get_finger_updates(cursor):
+    """
+    Poll the finger sequence server for entries added after cursor.
+    Returns:
+        tuple: (new entries, new cursor, reset). reset is True when the server
+               could not continue from cursor and sent every buffered entry
+               instead. The cursor is None if the server doesn't support
+               cursors; entries is then the whole history.
+    """
+    try:
+        response = action_client.get(f"{action_server_url}/get_Fingersequence", params={"since": cursor})
+        if response.status_code != 200:
+            print(f"Failed to get finger sequence. Status code: {response.status_code}")
+            return [], cursor, False
+        data = response.json()
+        if "cursor" not in data:
+            return data.get("history", data.get("sequence", [])), None, True
+        return data["history"], data["cursor"], data["reset"]
+    except requests.exceptions.RequestException as e:
+        print(f"Error connecting to finger sequence server: {e}")
+        return [], cursor, False
+
+def extract_gesture_features(finger_sequence):
+    """Summarize the recent finger sequence entries into comparable gesture features"""
     # Handle the new JSON structure with "history" key
     if isinstance(finger_sequence, dict) and "history" in finger_sequence:
         finger_sequence = finger_sequence["history"]
@@ -326,7 +560,6 @@ def parse_finger_sequence_to_user_input(finger_sequence):
     # Analyze the recent actions for patterns
     keypoints = [action.get('keypoint', 'unknown') for action in recent_actions]
     point_history = [action.get('point_history', 'unknown') for action in recent_actions]
-    emotions = [action.get('emotion', 'neutral') for action in recent_actions]
     emotion_strengths = [action.get('emotion_strength', 0) for action in recent_actions]
     
     # Get the most common patterns
@@ -336,50 +569,56 @@ def parse_finger_sequence_to_user_input(finger_sequence):
     # Calculate average emotion strength
     avg_emotion_strength = sum(emotion_strengths) / len(emotion_strengths) if emotion_strengths else 0
     
+    return {
+        "keypoint": most_common_keypoint,
+        "direction": most_common_direction,
+        "avg_emotion_strength": avg_emotion_strength,
+        "recent": list(zip(keypoints[-3:], point_history[-3:])),
+    }
+
+def gestures_differ(features_a, features_b, strength_threshold=0.5):
+    """Return True if two gesture feature dicts describe a meaningfully different gesture"""
+    if features_a is None or features_b is None:
+        return True
+    if features_a["keypoint"] != features_b["keypoint"]:
+        return True
+    if features_a["direction"] != features_b["direction"]:
+        return True
+    return abs(features_a["avg_emotion_strength"] - features_b["avg_emotion_strength"]) >= strength_threshold
+
+def parse_finger_sequence_to_user_input(finger_sequence):
+    """Convert finger sequence data into meaningful user input for the LLM"""
+    if not finger_sequence:
+        return "No user activity detected"
+    
+    features = extract_gesture_features(finger_sequence)
+    
     # Create descriptive user input
-    user_input = f"User hand gesture: {most_common_keypoint} keypoint, moving {most_common_direction}, "
-    user_input += f"average emotion strength: {avg_emotion_strength:.1f}, "
-    user_input += f"recent actions: {', '.join([f'{k}->{p}' for k, p in zip(keypoints[-3:], point_history[-3:])])}"
+    user_input = f"User hand gesture: {features['keypoint']} keypoint, moving {features['direction']}, "
+    user_input += f"average emotion strength: {features['avg_emotion_strength']:.1f}, "
+    user_input += f"recent actions: {', '.join([f'{k}->{p}' for k, p in features['recent']])}"
     
     return user_input
 
 def poll_and_respond(dog, poll_interval=2.0):
-    """Main polling loop that continuously monitors user inputs and generates dog responses"""
+    """
+    Main polling loop that continuously monitors user inputs and generates dog responses.
+    Thin synchronous wrapper around the asyncio GestureEngine, which polls,
+    plans and uploads concurrently.
+    """
+    # Imported here because gesture_engine builds on the functions in this module
+    from gesture_engine import GestureEngine
+
     print(f"Starting dog behavior polling system...")
     print(f"Polling finger sequence server every {poll_interval} seconds")
     print(f"Press Ctrl+C to stop")
-    
-    last_processed_sequence = None
-    
+
+    engine = GestureEngine(dog, poll_interval)
     try:
-        while True:
-            # Get current finger sequence
-            current_finger_sequence = get_finger_sequence()
-            
-            # Check if we have new data to process
-            if current_finger_sequence and current_finger_sequence != last_processed_sequence:
-                print(f"\n--- New user activity detected ---")
-                print(f"Finger sequence: {current_finger_sequence}")
-                
-                # Parse finger sequence to user input
-                user_input = parse_finger_sequence_to_user_input(current_finger_sequence)
-                print(f"Parsed user input: {user_input}")
-                
-                # Process through behavior logic
-                try:
-                    dog_response = newInput(dog, user_input)
-                    print(f"Generated dog response: {dog_response}")
-                except Exception as e:
-                    print(f"Error generating dog response: {e}")
-                
-                # Update last processed sequence
-                last_processed_sequence = current_finger_sequence.copy()
-            
-            # Wait before next poll
-            time.sleep(poll_interval)
-            
+        asyncio.run(engine.run())
     except KeyboardInterrupt:
         print("\nStopping dog behavior polling system...")
+    print(f"Polling stats: {engine.stats}")
 
 def start_polling_system(poll_interval=2.0):
     """Start the autonomous dog behavior polling system"""
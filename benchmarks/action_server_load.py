@@ -0,0 +1,181 @@
+"""
+Load test for action_server.py: requests/sec and latency of upload/get.
+
+Starts the server in a subprocess (or targets --url), then runs 1, 8 and 64
+concurrent clients. Each client has its own keep-alive session and
+X-Client-Id, and alternates POST /upload_sequence and GET /get_sequence for
+one of --dogs dog IDs.
+
+The server is started with upload admission control off, so the numbers are
+the server's capacity; pass --rate-limit to keep it on. Refusals (429/503)
+are counted apart from real errors either way. Against --url, all clients
+still share their address's allowance (see rate_limit.py).
+
+Usage (from the repository root):
+    python -m benchmarks.action_server_load --production --workers 4 --store sqlite
+    python -m benchmarks.action_server_load --clients 1 8 --duration 3      # development server
+    python -m benchmarks.action_server_load --url http://127.0.0.1:50007     # already running
+
+Clients are threads in this one process, so at high concurrency the numbers
+include some client-side overhead.
+"""
+
+import argparse
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+from config import core_sentiments
+
+SEQUENCE = [
+    {"action": action, "emotions": {emotion: round(0.05 * i, 2) for i, emotion in enumerate(core_sentiments)}}
+    for action in ("Jump", "Spin", "Sit")
+]
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def start_server(args):
+    """Start action_server.py in a subprocess and wait until it answers."""
+    port = _free_port()
+    command = [sys.executable, "action_server.py", "--host", "127.0.0.1", "--port", str(port),
+               "--store", args.store, "--db", args.db, "--workers", str(args.workers)]
+    if args.production:
+        command.append("--production")
+    if not args.rate_limit:
+        command += ["--upload-rate-limit", "0"]
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        try:
+            requests.get(f"{url}/get_sequence", timeout=1)
+            return process, url
+        except requests.exceptions.RequestException:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("action_server.py did not start")
+
+
+def stop_server(process):
+    """SIGTERM (graceful shutdown), then kill if it takes too long."""
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def run_clients(url, clients, duration, dogs):
+    """
+    Returns:
+        tuple: (op -> list of latencies in seconds, errors, refusals), where
+               refusals are 429/503 answers from admission control.
+    """
+    latencies = {"upload": [], "get": []}
+    errors = [0]
+    refusals = [0]
+    lock = threading.Lock()
+    start = threading.Barrier(clients + 1)
+
+    def client(index):
+        session = requests.Session()
+        session.headers["X-Client-Id"] = f"load-{os.getpid()}-{index}"  # one rate-limit bucket per client
+        dog_id = f"dog-{index % dogs}"
+        local = {"upload": [], "get": []}
+        failures = refused = 0
+        start.wait()
+        end = time.perf_counter() + duration
+        upload = True
+        while time.perf_counter() < end:
+            op = "upload" if upload else "get"
+            started = time.perf_counter()
+            try:
+                if upload:
+                    response = session.post(f"{url}/upload_sequence", json={"sequence": SEQUENCE, "dog_id": dog_id})
+                else:
+                    response = session.get(f"{url}/get_sequence", params={"dog_id": dog_id})
+                if response.status_code in (429, 503):
+                    refused += 1
+                else:
+                    response.raise_for_status()
+                    local[op].append(time.perf_counter() - started)
+            except requests.exceptions.RequestException:
+                failures += 1
+            upload = not upload
+        with lock:
+            for op, samples in local.items():
+                latencies[op].extend(samples)
+            errors[0] += failures
+            refusals[0] += refused
+        session.close()
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    start.wait()
+    for thread in threads:
+        thread.join()
+    return latencies, errors[0], refusals[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", help="target an already running server instead of starting one")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 64])
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per concurrency level")
+    parser.add_argument("--dogs", type=int, default=16, help="distinct dog IDs the clients spread over")
+    parser.add_argument("--production", action="store_true", help="start the server with --production")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--store", choices=["memory", "sqlite"], default="memory")
+    parser.add_argument("--rate-limit", action="store_true",
+                        help="keep the server's upload admission control on (default: off)")
+    parser.add_argument("--db", default=os.path.join(tempfile.gettempdir(), "action_server_load.sqlite3"))
+    args = parser.parse_args()
+
+    process = None
+    url = args.url
+    if url is None:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(args.db + suffix):
+                os.remove(args.db + suffix)
+        process, url = start_server(args)
+    try:
+        mode = "external" if process is None else (
+            f"{'production' if args.production else 'development'}, {args.store} store"
+            + (f", {args.workers} workers" if args.production else ""))
+        print(f"Action server load test against {url} ({mode}), {args.duration:.0f}s per level")
+        print(f"{'clients':>7s} {'op':7s} {'req/s':>9s} {'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s} "
+              f"{'errors':>7s} {'refused':>8s}")
+        for clients in args.clients:
+            latencies, errors, refusals = run_clients(url, clients, args.duration, args.dogs)
+            for op, samples in latencies.items():
+                if not samples:
+                    print(f"{clients:7d} {op:7s} {0:9.1f} {'-':>8s} {'-':>8s} {'-':>8s} {errors:7d} {refusals:8d}")
+                    continue
+                ordered = sorted(samples)
+                print(f"{clients:7d} {op:7s} {len(ordered) / args.duration:9.1f} "
+                      f"{_percentile(ordered, 0.50) * 1000:8.2f} {_percentile(ordered, 0.95) * 1000:8.2f} "
+                      f"{_percentile(ordered, 0.99) * 1000:8.2f} {errors:7d} {refusals:8d}")
+    finally:
+        if process is not None:
+            stop_server(process)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Per-operation cost of DogPersonality: list-backed __slots__ (current) vs the
+previous dict-backed implementation (kept below as DictDogPersonality).
+
+Usage (from the repository root):
+    python -m benchmarks.dog_personality_bench --repeat 100000
+"""
+
+import argparse
+import timeit
+
+from config import core_sentiments
+from dog_personality import DogPersonality
+
+
+class DictDogPersonality:
+    """The dict-backed emotion state DogPersonality used before (emotion methods only)"""
+    def __init__(self, core_emotions=core_sentiments):
+        self.core_emotions = core_emotions
+        self.emotion_vector = {emotion: 0.0 for emotion in self.core_emotions}
+        self.emotion_vector["Happy"] = 0.5
+        self.emotion_vector["Curious"] = 0.3
+        self.emotion_vector["Excitement"] = 0.2
+        self.normalize_emotions()
+
+    def update_emotion(self, emotion, delta):
+        if emotion in self.emotion_vector:
+            self.emotion_vector[emotion] += delta
+            self.emotion_vector[emotion] = max(0.0, self.emotion_vector[emotion])
+            self.normalize_emotions()
+
+    def decay_emotions(self, decay_rate=0.05):
+        dominant = self.get_dominant_emotion()
+        for emotion in self.emotion_vector:
+            if emotion != dominant:
+                self.emotion_vector[emotion] *= (1.0 - decay_rate)
+        self.normalize_emotions()
+
+    def blend_emotions(self, blend_dict):
+        emotion_dict = dict(blend_dict) if isinstance(blend_dict, list) else blend_dict
+        for emotion, value in emotion_dict.items():
+            if emotion in core_sentiments:
+                self.emotion_vector[emotion] += value
+        self.normalize_emotions()
+
+    def normalize_emotions(self):
+        total = sum(self.emotion_vector.values())
+        if total > 0:
+            for emotion in self.emotion_vector:
+                self.emotion_vector[emotion] /= total
+
+    def get_emotion_vector(self):
+        return dict(self.emotion_vector)
+
+    def get_dominant_emotion(self):
+        return max(self.emotion_vector, key=self.emotion_vector.get)
+
+    def get_top_emotions(self, n=3):
+        return sorted(self.emotion_vector.items(), key=lambda x: x[1], reverse=True)[:n]
+
+
+BLEND = [("Happy", 0.3), ("Excitement", 0.2)]
+
+OPERATIONS = {
+    "blend_emotions": lambda dog: dog.blend_emotions(BLEND),
+    "update_emotion": lambda dog: dog.update_emotion("Curious", 0.05),
+    "decay_emotions": lambda dog: dog.decay_emotions(0.05),
+    "normalize_emotions": lambda dog: dog.normalize_emotions(),
+    "get_emotion_vector": lambda dog: dog.get_emotion_vector(),
+    "get_dominant_emotion": lambda dog: dog.get_dominant_emotion(),
+    "get_top_emotions": lambda dog: dog.get_top_emotions(3),
+    # direct_emotion_blend: what buildSequence does once per goal
+    "blend + vector": lambda dog: (dog.blend_emotions(BLEND), dog.get_emotion_vector()),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=100000)
+    args = parser.parse_args()
+
+    print(f"{'operation':22s} {'dict ns':>9s} {'list ns':>9s} {'speedup':>8s}")
+    for name, operation in OPERATIONS.items():
+        timings = []
+        for cls in (DictDogPersonality, DogPersonality):
+            dog = cls()
+            timings.append(min(timeit.repeat(lambda: operation(dog), number=args.repeat, repeat=3))
+                           / args.repeat * 1e9)
+        print(f"{name:22s} {timings[0]:9.0f} {timings[1]:9.0f} {timings[0] / timings[1]:7.2f}x")
+
+    dict_dog, list_dog = DictDogPersonality(), DogPersonality()
+    dict_size = dict_dog.__sizeof__() + dict_dog.__dict__.__sizeof__() + dict_dog.emotion_vector.__sizeof__()
+    list_size = list_dog.__sizeof__() + list_dog._weights.__sizeof__()
+    print(f"\nInstance size (object + emotion storage): dict {dict_size} B, list {list_size} B")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Fleet tick cost: DogPopulation batched operations vs a loop over DogPersonality.
+
+One tick = blend an event into half of the dogs, decay everyone, then read
+every dog's dominant emotion and top 3 emotions. The idle column is the cost
+of catching a fleet up on an hour without events: one lazy settle() against
+360 decay ticks at the default 10 s interval.
+
+Usage (from the repository root):
+    python -m benchmarks.dog_population_bench --dogs 1000 10000 --ticks 20
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from config import emotion_decay_rate, emotion_decay_interval
+from dog_personality import DogPersonality
+from dog_population import DogPopulation
+
+EVENT = {"Happy": 0.3, "Excitement": 0.2}
+
+
+def tick_population(population, excited):
+    population.blend(EVENT, excited)
+    population.decay(0.05)
+    population.dominant_emotions()
+    population.top_k(3)
+
+
+def tick_objects(dogs, excited):
+    for i in excited:
+        dogs[i].blend_emotions(EVENT)
+    for dog in dogs:
+        dog.decay_emotions(0.05)
+        dog.get_dominant_emotion()
+        dog.get_top_emotions(3)
+
+
+def time_ticks(tick, state, excited, ticks):
+    started = time.perf_counter()
+    for _ in range(ticks):
+        tick(state, excited)
+    return (time.perf_counter() - started) / ticks * 1000
+
+
+def time_idle_hour(size):
+    """(ticked ms, settled ms) to bring `size` dogs up to date after an idle hour"""
+    hour = 3600.0
+    ticks = int(hour / emotion_decay_interval)
+    ticked = DogPopulation(size, decay_rate=0)
+    started = time.perf_counter()
+    for _ in range(ticks):
+        ticked.decay(emotion_decay_rate)
+    ticked_ms = (time.perf_counter() - started) * 1000
+
+    now = [0.0]
+    settled = DogPopulation(size, clock=lambda: now[0])
+    now[0] = hour
+    started = time.perf_counter()
+    settled.settle()
+    return ticked_ms, (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dogs", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--ticks", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'dogs':>6s} {'objects ms':>11s} {'population ms':>14s} {'speedup':>8s} {'idle hour ms':>18s}")
+    for size in args.dogs:
+        excited = np.arange(0, size, 2)
+        objects_ms = time_ticks(tick_objects, [DogPersonality() for _ in range(size)], excited.tolist(),
+                                max(1, args.ticks // 10))
+        population_ms = time_ticks(tick_population, DogPopulation(size), excited, args.ticks)
+        ticked_ms, settled_ms = time_idle_hour(size)
+        print(f"{size:6d} {objects_ms:11.2f} {population_ms:14.2f} {objects_ms / population_ms:7.1f}x"
+              f" {ticked_ms:8.1f} -> {settled_ms:6.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Microbenchmark: legacy ast.literal_eval goal parser vs the precompiled GoalValidator.
+
+Covers valid, malformed and oversized LLM outputs, plus JSON structured output.
+
+Usage (from the repository root):
+    python -m benchmarks.goal_parser_bench --repeat 20000
+"""
+
+import argparse
+import ast
+import json
+import timeit
+
+from config import core_sentiments, allowed_actions
+from goal_parser import gesture_goal_validator
+
+
+def legacy_parse_llm_goal_output(content, allowed_actions, allowed_emotions, max_goals=3):
+    """The original behavior_logic parser, kept here as the baseline."""
+    content = content.strip()
+    if content.startswith("```"):
+        content = content.split("\n", 1)[-1]
+    if content.endswith("```"):
+        content = content.rsplit("```", 1)[0]
+    start = content.find('[')
+    end = content.rfind(']')
+    if start == -1 or end == -1:
+        raise ValueError("No valid list in LLM output.")
+    content = content[start:end+1]
+    try:
+        goals = ast.literal_eval(content)
+    except Exception as e:
+        raise ValueError(f"Could not parse LLM output as Python data: {e}")
+    if isinstance(goals, tuple):
+        goals = [goals]
+    if not isinstance(goals, list):
+        raise ValueError("Parsed LLM output is not a list.")
+    valid_goals = []
+    for item in goals:
+        if not (isinstance(item, tuple) and len(item) == 2):
+            continue
+        action, emotions = item
+        if action not in allowed_actions:
+            continue
+        if (
+            isinstance(emotions, list) and
+            1 <= len(emotions) <= 10 and
+            all(
+                isinstance(e, tuple) and len(e) == 2 and
+                e[0] in allowed_emotions and
+                isinstance(e[1], (float, int))
+                for e in emotions
+            )
+        ):
+            total_weight = sum(float(e[1]) for e in emotions)
+            if 0.0 <= total_weight <= 1.05:
+                valid_emotions = [(e[0], float(e[1])) for e in emotions]
+                valid_goals.append((action, valid_emotions))
+    if not (1 <= len(valid_goals) <= max_goals):
+        raise RuntimeError("LLM output did not meet valid goal constraints.")
+    return valid_goals
+
+
+VALID = """```python
+[
+("Jump", [("Happy", 0.45), ("Excitement", 0.35)]),
+("Spin", [("Excitement", 0.55), ("Curious", 0.25)]),
+("Sit", [("Happy", 0.60), ("Self confidence", 0.20)]),
+]
+```"""
+
+MALFORMED = """Sure! Here is my plan:
+[
+("Jump", [("Happy", 0.45), ("Excitement", 0.35)]),
+("Spin", [("Excitement", 0.55), ("Curious", 0.25)
+"""
+
+OVERSIZED = "[\n" + ",\n".join(
+    f'("{action}", [("Happy", 0.3), ("Curious", 0.2)])'
+    for action in (allowed_actions * 3)[:24]
+) + "\n]"
+
+JSON_OUTPUT = json.dumps({"goals": [
+    {"action": "Jump", "emotions": [{"emotion": "Happy", "weight": 0.45}, {"emotion": "Excitement", "weight": 0.35}]},
+    {"action": "Spin", "emotions": [{"emotion": "Excitement", "weight": 0.55}, {"emotion": "Curious", "weight": 0.25}]},
+    {"action": "Sit", "emotions": [{"emotion": "Happy", "weight": 0.6}, {"emotion": "Self confidence", "weight": 0.2}]},
+]})
+
+CASES = {
+    "valid": VALID,
+    "malformed": MALFORMED,
+    "oversized": OVERSIZED,
+    "json": JSON_OUTPUT,
+}
+
+
+def _run(parser, content):
+    try:
+        return len(parser(content))
+    except Exception:
+        return "error"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20000)
+    args = parser.parse_args()
+
+    def legacy(content):
+        return legacy_parse_llm_goal_output(content, allowed_actions, core_sentiments)
+
+    new = gesture_goal_validator.parse
+
+    print(f"{'case':10s} {'legacy us':>10s} {'new us':>10s} {'speedup':>8s}   legacy -> new goals")
+    for name, content in CASES.items():
+        legacy_time = timeit.timeit(lambda: _run(legacy, content), number=args.repeat) / args.repeat
+        new_time = timeit.timeit(lambda: _run(new, content), number=args.repeat) / args.repeat
+        print(f"{name:10s} {legacy_time * 1e6:10.2f} {new_time * 1e6:10.2f} {legacy_time / new_time:7.1f}x"
+              f"   {_run(legacy, content)} -> {_run(new, content)}")
+
+
+if __name__ == "__main__":
+    main()
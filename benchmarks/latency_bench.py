@@ -0,0 +1,373 @@
+"""
+End-to-end latency benchmark: user input -> sequence uploaded to the action server.
+
+Runs the real planning code against local stand-ins (benchmarks.mock_llm_server
+and benchmarks.mock_action_server), so results depend only on this code and
+the configured mock latency, not on the network or the model.
+
+Scenarios:
+    new_input       behavior_logic.newInput with scripted gesture descriptions
+    text_input      behavior_logic.newInput_from_text with scripted phrases
+    companion       TextDogCompanion.process_text_input with scripted phrases
+    gesture_engine  the GestureEngine behind poll_and_respond: a gesture is pushed
+                    to /get_Fingersequence and timed until /upload_sequence
+
+Calls are timed until the first upload: synchronous scenarios don't wait for
+a late LLM plan to replace a fallback reaction (late_plan_timeout=0).
+
+Stages are timed by wrapping the module functions each scenario goes through:
+    poll, plan, llm, llm_first_goal (streaming), parse, fallback, build, upload
+
+Usage (from the repository root):
+    python -m benchmarks.latency_bench --iterations 30 --output latency.json
+    python -m benchmarks.latency_bench --llm-latency 0.5 --malformed-rate 0.1 --compare latency.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import functools
+import inspect
+import json
+import os
+import platform
+import subprocess
+import threading
+import time
+
+from benchmarks.mock_action_server import MockActionServer
+from benchmarks.mock_llm_server import MockLLMServer
+
+SCENARIOS = ["new_input", "text_input", "companion", "gesture_engine"]
+
+GESTURES = [
+    {"keypoint": "Open", "point_history": "Clockwise", "emotion_strength": 0.8},
+    {"keypoint": "Pointer", "point_history": "Move", "emotion_strength": 0.4},
+    {"keypoint": "Close", "point_history": "Stop", "emotion_strength": 1.6},
+    {"keypoint": "OK", "point_history": "Counter Clockwise", "emotion_strength": 0.2},
+]
+
+TEXTS = [
+    "Good boy!",
+    "Want to go for a walk?",
+    "Sit!",
+    "No! Bad dog!",
+    "I love you so much",
+    "Time for dinner!",
+    "Let's play fetch with the ball",
+    "I'm tired, time for bed",
+]
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def summarize(samples):
+    """
+    Returns:
+        dict: count, mean, p50, p95, p99 and max in milliseconds.
+    """
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "mean": sum(ordered) / len(ordered) * 1000,
+        "p50": _percentile(ordered, 0.50) * 1000,
+        "p95": _percentile(ordered, 0.95) * 1000,
+        "p99": _percentile(ordered, 0.99) * 1000,
+        "max": ordered[-1] * 1000,
+    }
+
+
+class StageTimer:
+    """
+    Times pipeline stages by replacing module/class attributes with timing wrappers.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._patches = []
+        self.samples = {}
+
+    def record(self, stage, seconds):
+        with self._lock:
+            self.samples.setdefault(stage, []).append(seconds)
+
+    def reset(self):
+        with self._lock:
+            self.samples = {}
+
+    def wrap(self, owner, name, stage):
+        """Time every call of owner.name as the given stage."""
+        original = getattr(owner, name)
+        if inspect.isgeneratorfunction(original):
+            @functools.wraps(original)
+            def timed(*args, **kwargs):
+                # Streaming planners: time to first goal and to exhaustion
+                started = time.perf_counter()
+                first = True
+                try:
+                    for item in original(*args, **kwargs):
+                        if first:
+                            self.record(f"{stage}_first_goal", time.perf_counter() - started)
+                            first = False
+                        yield item
+                finally:
+                    self.record(stage, time.perf_counter() - started)
+        else:
+            @functools.wraps(original)
+            def timed(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return original(*args, **kwargs)
+                finally:
+                    self.record(stage, time.perf_counter() - started)
+        setattr(owner, name, timed)
+        self._patches.append((owner, name, original))
+
+    def restore(self):
+        for owner, name, original in reversed(self._patches):
+            setattr(owner, name, original)
+        self._patches = []
+
+
+def instrument(timer):
+    """Wrap the functions every scenario goes through."""
+    import behavior_logic
+    import gesture_engine
+    import text_dog_companion
+    from text_dog_companion import TextDogCompanion
+
+    timer.wrap(behavior_logic, "get_finger_sequence", "poll")
+    for module in (behavior_logic, gesture_engine):
+        timer.wrap(module, "get_finger_updates", "poll")
+        timer.wrap(module, "buildSequence", "build")
+        timer.wrap(module, "upload_sequence", "upload")
+        timer.wrap(module, "append_sequence", "upload")
+        timer.wrap(module, "stream_llm_goals", "llm")
+        timer.wrap(module, "plan_fallback_goals", "fallback")
+    timer.wrap(behavior_logic, "plan_goals", "plan")
+    for module in (behavior_logic, gesture_engine, text_dog_companion):
+        timer.wrap(module, "cached_goal_request", "llm")
+    timer.wrap(behavior_logic, "parse_llm_goal_output", "parse")
+    timer.wrap(text_dog_companion, "plan_fallback_goals", "fallback")
+    timer.wrap(TextDogCompanion, "build_sequence", "build")
+    timer.wrap(TextDogCompanion, "upload_sequence", "upload")
+
+
+def _timed_calls(iterations, call):
+    """
+    Returns:
+        tuple: (latencies of successful calls, number of failed calls)
+    """
+    samples = []
+    errors = 0
+    for i in range(iterations):
+        started = time.perf_counter()
+        try:
+            call(i)
+        except Exception as e:
+            print(f"Iteration {i} failed: {e}")
+            errors += 1
+            continue
+        samples.append(time.perf_counter() - started)
+    return samples, errors
+
+
+def run_new_input(args, action_server):
+    from behavior_logic import newInput, parse_finger_sequence_to_user_input
+    from dog_personality import DogPersonality
+
+    dog = DogPersonality()
+    history = []
+
+    def call(i):
+        history.append(GESTURES[i % len(GESTURES)])
+        newInput(dog, parse_finger_sequence_to_user_input(history[-5:]), stream=args.stream, late_plan_timeout=0)
+
+    return _timed_calls(args.iterations, call)
+
+
+def run_text_input(args, action_server):
+    from behavior_logic import newInput_from_text
+    from dog_personality import DogPersonality
+
+    dog = DogPersonality()
+    return _timed_calls(args.iterations, lambda i: newInput_from_text(dog, TEXTS[i % len(TEXTS)], late_plan_timeout=0))
+
+
+def run_companion(args, action_server):
+    from text_dog_companion import TextDogCompanion
+
+    companion = TextDogCompanion()
+    return _timed_calls(args.iterations, lambda i: companion.process_text_input(TEXTS[i % len(TEXTS)], late_plan_timeout=0))
+
+
+def run_gesture_engine(args, action_server):
+    from dog_personality import DogPersonality
+    from gesture_engine import GestureEngine
+
+    engine = GestureEngine(DogPersonality(), args.poll_interval, stream=args.stream)
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_until_complete, args=(engine.run(),), daemon=True)
+    thread.start()
+
+    samples = []
+    timeouts = 0
+    try:
+        for i in range(args.iterations):
+            pushed = action_server.push_gesture(GESTURES[i % len(GESTURES)])
+            uploaded = action_server.wait_for_upload(pushed, timeout=args.timeout)
+            if uploaded is None:
+                timeouts += 1
+            else:
+                samples.append(uploaded - pushed)
+    finally:
+        loop.call_soon_threadsafe(engine.stop)
+        thread.join(timeout=5)
+        loop.close()
+    return samples, timeouts
+
+
+RUNNERS = {
+    "new_input": run_new_input,
+    "text_input": run_text_input,
+    "companion": run_companion,
+    "gesture_engine": run_gesture_engine,
+}
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(results):
+    print(f"{'scenario':15s} {'stage':15s} {'n':>5s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s} {'max ms':>9s}")
+    for scenario, result in results.items():
+        if result["errors"]:
+            print(f"{scenario:15s} {'errors':15s} {result['errors']:5d}")
+        rows = [("overall", result["overall"])] + sorted(result["stages"].items())
+        for stage, stats in rows:
+            if not stats["count"]:
+                print(f"{scenario:15s} {stage:15s} {0:5d}")
+                continue
+            print(f"{scenario:15s} {stage:15s} {stats['count']:5d} {stats['p50']:9.2f} "
+                  f"{stats['p95']:9.2f} {stats['p99']:9.2f} {stats['max']:9.2f}")
+
+
+def print_comparison(results, baseline):
+    """Print p50/p95/p99 deltas against a results file from another commit."""
+    print(f"\nCompared with {baseline['meta'].get('commit')} ({baseline['meta'].get('timestamp')})")
+    print(f"{'scenario':15s} {'stage':15s} {'p50 ms':>17s} {'p95 ms':>17s} {'p99 ms':>17s}")
+    for scenario, result in results.items():
+        old = baseline["results"].get(scenario)
+        if old is None:
+            continue
+        rows = [("overall", result["overall"], old["overall"])]
+        rows += [(stage, stats, old["stages"][stage])
+                 for stage, stats in sorted(result["stages"].items()) if stage in old["stages"]]
+        for stage, new_stats, old_stats in rows:
+            if not new_stats["count"] or not old_stats["count"]:
+                continue
+            cells = []
+            for key in ("p50", "p95", "p99"):
+                change = (new_stats[key] - old_stats[key]) / old_stats[key] * 100 if old_stats[key] else 0.0
+                cells.append(f"{new_stats[key]:8.2f} {change:+6.1f}%")
+            print(f"{scenario:15s} {stage:15s} " + " ".join(f"{cell:>17s}" for cell in cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="mock LLM base latency (s)")
+    parser.add_argument("--llm-jitter", type=float, default=0.05, help="mean extra mock LLM latency (s)")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="delay between streamed chunks (s)")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="fraction of unparseable completions")
+    parser.add_argument("--stream", action="store_true", help="stream goals (newInput, gesture engine)")
+    parser.add_argument("--hedge-k", type=int, default=None, help="override config.llm_hedge_k")
+    parser.add_argument("--cache", action="store_true", help="keep the reaction cache enabled")
+    parser.add_argument("--poll-interval", type=float, default=0.25, help="gesture engine poll interval (s)")
+    parser.add_argument("--timeout", type=float, default=10.0, help="gesture engine wait per gesture (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="results file from another commit to compare against")
+    parser.add_argument("--verbose", action="store_true", help="show the output of the planning code")
+    args = parser.parse_args()
+
+    llm_server = MockLLMServer(latency=args.llm_latency, jitter=args.llm_jitter, token_delay=args.token_delay,
+                               malformed_rate=args.malformed_rate, seed=args.seed).start()
+    action_server = MockActionServer().start()
+    os.environ["OPENAI_BASE_URL"] = llm_server.base_url
+    os.environ.setdefault("OPENAI_API_KEY", "mock-key")
+    import config
+    # Must be set before the planning modules are imported (they copy it once)
+    config.action_server_url = action_server.base_url
+
+    import behavior_logic
+    import text_dog_companion
+    from hedged_requests import hedge_stats
+    from llm_client import reset_llm_client
+    from prompt_builder import prompt_stats
+
+    if args.hedge_k is not None:
+        config.llm_hedge_k = args.hedge_k
+    if not args.cache:
+        behavior_logic.reaction_cache = None
+        text_dog_companion.reaction_cache = None
+
+    timer = StageTimer()
+    instrument(timer)
+    results = {}
+    quiet = open(os.devnull, "w")
+    try:
+        for scenario in args.scenarios:
+            print(f"Running {scenario} ({args.iterations} iterations)...")
+            timer.reset()
+            action_server.reset()
+            output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(quiet)
+            with output:
+                overall, errors = RUNNERS[scenario](args, action_server)
+            results[scenario] = {
+                "errors": errors,
+                "overall": summarize(overall),
+                "stages": {stage: summarize(samples) for stage, samples in timer.samples.items()},
+            }
+    finally:
+        timer.restore()
+        quiet.close()
+        reset_llm_client()
+        llm_server.stop()
+        action_server.stop()
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "settings": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+            "llm_requests": llm_server.requests_served,
+            "llm_malformed": llm_server.malformed_served,
+            "tokens": prompt_stats.summary(),
+            "hedging": hedge_stats.summary(),
+        },
+        "results": results,
+    }
+    print()
+    print_report(results)
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(results, json.load(f))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Per-call overhead of a fresh OpenAI client vs the shared pooled client.
+
+Runs both strategies against the local mock endpoint, so the numbers show
+client construction + connection setup cost rather than model latency.
+
+Usage (from the repository root):
+    python -m benchmarks.llm_client_bench --calls 200
+"""
+
+import argparse
+import os
+import statistics
+import time
+
+import openai
+
+from benchmarks.mock_llm_server import MockLLMServer
+from config import llm_model
+from llm_client import get_llm_client, reset_llm_client
+
+MESSAGES = [
+    {"role": "system", "content": "You are a dog."},
+    {"role": "user", "content": "Good boy!"},
+]
+
+
+def _call(client):
+    client.chat.completions.create(model=llm_model, messages=MESSAGES, max_tokens=64)
+
+
+def bench_fresh_client(calls):
+    """Old behaviour: a new client (and connection pool) for every call."""
+    timings = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        _call(client)
+        timings.append(time.perf_counter() - start)
+        client.close()
+    return timings
+
+
+def bench_pooled_client(calls):
+    """New behaviour: one shared client with keep-alive connections."""
+    reset_llm_client()
+    _call(get_llm_client())  # warm-up, as in a long-running process
+    timings = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        _call(get_llm_client())
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def _report(name, timings):
+    ordered = sorted(timings)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    print(f"{name:15s} mean {statistics.mean(timings) * 1000:7.3f} ms   "
+          f"p50 {statistics.median(timings) * 1000:7.3f} ms   p99 {p99 * 1000:7.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200)
+    args = parser.parse_args()
+
+    server = MockLLMServer().start()
+    os.environ["OPENAI_BASE_URL"] = server.base_url
+    os.environ.setdefault("OPENAI_API_KEY", "mock-key")
+    try:
+        fresh = bench_fresh_client(args.calls)
+        pooled = bench_pooled_client(args.calls)
+    finally:
+        reset_llm_client()
+        server.stop()
+
+    print(f"LLM client overhead over {args.calls} calls ({server.base_url})")
+    _report("fresh client", fresh)
+    _report("pooled client", pooled)
+    saved = statistics.mean(fresh) - statistics.mean(pooled)
+    print(f"Saved per call: {saved * 1000:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Local stand-in for action_server.py and the finger-sequence endpoint.
+
+Serves the routes the dog clients use:
+    POST /upload_sequence, POST /append_sequence, GET /get_sequence,
+    GET /get_Fingersequence[?since=<cursor>]   (scripted by the benchmark)
+
+Every upload is timestamped, so a benchmark can measure the time from
+push_gesture() to the sequence arriving (wait_for_upload()).
+
+Usage:
+    python -m benchmarks.mock_action_server --port 50107
+    export ACTION_SERVER_URL=http://127.0.0.1:50107
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from finger_history import FingerHistory
+
+
+class MockActionHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, body, status=200):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/get_sequence":
+            self._send_json({"sequence": self.server.current_sequence()})
+        elif url.path == "/get_Fingersequence":
+            since = int(parse_qs(url.query).get("since", ["-1"])[0])
+            entries, cursor, reset = self.server.finger_history.since(since)
+            self._send_json({"history": entries, "cursor": cursor, "reset": reset})
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        data = json.loads(self.rfile.read(length) or b"{}")
+        path = urlparse(self.path).path
+        if path not in ("/upload_sequence", "/append_sequence"):
+            self._send_json({"error": "not found"}, status=404)
+            return
+        sequence = data.get("sequence")
+        if not isinstance(sequence, list):
+            self._send_json({"status": "error", "message": "No sequence provided"}, status=400)
+            return
+        length = self.server.record_upload(sequence, append=path == "/append_sequence")
+        self._send_json({"status": "success", "length": length})
+
+
+class MockActionServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, history_size=20):
+        super().__init__((host, port), MockActionHandler)
+        self.history_size = history_size
+        self.finger_history = FingerHistory(history_size)
+        self.uploads = []           # (perf_counter timestamp, kind, sequence)
+        self._sequence = []
+        self._changed = threading.Condition()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """Serve in a background daemon thread and return self."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def push_gesture(self, entry):
+        """
+        Append a finger-sequence entry (keypoint, point_history, emotion_strength).
+        Returns:
+            float: perf_counter timestamp of the push.
+        """
+        pushed = time.perf_counter()
+        self.finger_history.add([entry])
+        return pushed
+
+    def current_sequence(self):
+        with self._changed:
+            return list(self._sequence)
+
+    def record_upload(self, sequence, append=False):
+        with self._changed:
+            self._sequence = self._sequence + sequence if append else list(sequence)
+            self.uploads.append((time.perf_counter(), "append" if append else "upload", sequence))
+            self._changed.notify_all()
+            return len(self._sequence)
+
+    def wait_for_upload(self, after, timeout):
+        """
+        Wait for the first upload (not append) recorded after a timestamp.
+        Returns:
+            float or None: Its timestamp, or None on timeout.
+        """
+        def first_upload():
+            for stamp, kind, _ in self.uploads:
+                if stamp > after and kind == "upload":
+                    return stamp
+            return None
+
+        with self._changed:
+            self._changed.wait_for(lambda: first_upload() is not None, timeout=timeout)
+            return first_upload()
+
+    def reset(self):
+        with self._changed:
+            self.uploads = []
+            self._sequence = []
+            self.finger_history = FingerHistory(self.history_size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the action server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=50107)
+    args = parser.parse_args()
+
+    server = MockActionServer(args.host, args.port)
+    print(f"Mock action server on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+Local OpenAI-compatible mock endpoint for benchmarks.
+
+Serves POST /v1/chat/completions (plain or streamed) and GET /v1/models with
+a canned dog plan, over HTTP/1.1 so clients can keep connections alive
+between calls.
+
+- latency + jitter: fixed delay plus an exponential tail, like a real model.
+- malformed_rate: fraction of completions replaced by unparseable output.
+- usage: token counts estimated from the request and response text; a system
+  prompt seen before is reported as cached prompt tokens.
+
+Usage:
+    python -m benchmarks.mock_llm_server --port 50100
+    export OPENAI_BASE_URL=http://127.0.0.1:50100/v1
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_PLAN = '[("Jump", [("Happy", 0.5), ("Excitement", 0.4)]), ("Sit", [("Happy", 0.3), ("Intimacy", 0.3)])]'
+
+MALFORMED_PLAN = 'Woof! I would love to play, let me think about it... [("Jump", [("Happy"'
+
+
+def _estimate_tokens(text):
+    return len(text) // 4 + 1
+
+
+def _usage(request, content, cached_tokens):
+    prompt_tokens = sum(_estimate_tokens(str(m.get("content", ""))) for m in request.get("messages", []))
+    completion_tokens = _estimate_tokens(content)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "prompt_tokens_details": {"cached_tokens": cached_tokens},
+    }
+
+
+def _completion_body(content, model, usage):
+    return {
+        "id": "chatcmpl-mock",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": usage,
+    }
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, body, status=200):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json({"object": "list", "data": [{"id": "mock", "object": "model"}]})
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json({"error": "not found"}, status=404)
+            return
+        delay = self.server.next_latency()
+        if delay:
+            time.sleep(delay)
+        content, cached_tokens = self.server.next_completion(request)
+        usage = _usage(request, content, cached_tokens)
+        if request.get("stream"):
+            include_usage = (request.get("stream_options") or {}).get("include_usage")
+            self._send_stream(content, request.get("model", "mock"), usage if include_usage else None)
+        else:
+            self._send_json(_completion_body(content, request.get("model", "mock"), usage))
+
+    def _send_stream(self, content, model, usage=None, chunk_size=8):
+        """Send the completion as server-sent events, a few characters per chunk."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        pieces = [content[i:i + chunk_size] for i in range(0, len(content), chunk_size)]
+        for piece in pieces:
+            chunk = {
+                "id": "chatcmpl-mock",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+            }
+            self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            if self.server.token_delay:
+                time.sleep(self.server.token_delay)
+        if usage is not None:
+            chunk = {
+                "id": "chatcmpl-mock",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [],
+                "usage": usage,
+            }
+            self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+
+
+class MockLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, plan=DEFAULT_PLAN, token_delay=0.0,
+                 jitter=0.0, malformed_rate=0.0, seed=None):
+        super().__init__((host, port), MockLLMHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.token_delay = token_delay
+        self.plan = plan
+        self.malformed_rate = malformed_rate
+        self.requests_served = 0
+        self.malformed_served = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._seen_prompts = set()
+
+    def next_latency(self):
+        """Fixed latency plus an exponentially distributed jitter (mean = jitter)."""
+        with self._lock:
+            extra = self._random.expovariate(1.0 / self.jitter) if self.jitter else 0.0
+        return self.latency + extra
+
+    def next_completion(self, request):
+        """
+        Pick the completion text for a request.
+        Returns:
+            tuple: (content, cached prompt tokens)
+        """
+        messages = request.get("messages") or [{}]
+        system = str(messages[0].get("content", ""))
+        with self._lock:
+            self.requests_served += 1
+            cached_tokens = _estimate_tokens(system) if system in self._seen_prompts else 0
+            self._seen_prompts.add(system)
+            if self.malformed_rate and self._random.random() < self.malformed_rate:
+                self.malformed_served += 1
+                return MALFORMED_PLAN, cached_tokens
+        return self.plan, cached_tokens
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        """Serve in a background daemon thread and return self."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible mock endpoint")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=50100)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds to wait before answering")
+    parser.add_argument("--jitter", type=float, default=0.0, help="mean extra latency (exponential tail)")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="fraction of unparseable completions")
+    args = parser.parse_args()
+
+    server = MockLLMServer(args.host, args.port, latency=args.latency, jitter=args.jitter,
+                           malformed_rate=args.malformed_rate)
+    print(f"Mock LLM endpoint on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Payload size and encode/decode time: JSON vs the binary wire format.
+
+Sequences have full 12-emotion vectors, as produced by direct_emotion_blend.
+
+Usage (from the repository root):
+    python -m benchmarks.wire_format_bench --repeat 20000
+"""
+
+import argparse
+import json
+import random
+import timeit
+
+from config import core_sentiments, allowed_actions
+from wire_format import encode_sequence, decode_sequence
+
+
+def make_sequence(steps, seed=0):
+    rng = random.Random(seed)
+    sequence = []
+    for _ in range(steps):
+        weights = [rng.random() for _ in core_sentiments]
+        total = sum(weights)
+        sequence.append({
+            "action": rng.choice(allowed_actions),
+            "emotions": {emotion: w / total for emotion, w in zip(core_sentiments, weights)},
+        })
+    return sequence
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f"{'steps':>5s} {'json B':>8s} {'binary B':>9s} {'ratio':>6s}   "
+          f"{'json enc us':>11s} {'bin enc us':>10s}   {'json dec us':>11s} {'bin dec us':>10s}")
+    for steps in (1, 3, 10, 50):
+        sequence = make_sequence(steps)
+        as_json = json.dumps({"sequence": sequence}).encode("utf-8")
+        as_binary = encode_sequence(sequence)
+
+        def per_call(fn):
+            return timeit.timeit(fn, number=args.repeat) / args.repeat * 1e6
+
+        json_encode = per_call(lambda: json.dumps({"sequence": sequence}).encode("utf-8"))
+        binary_encode = per_call(lambda: encode_sequence(sequence))
+        json_decode = per_call(lambda: json.loads(as_json)["sequence"])
+        binary_decode = per_call(lambda: decode_sequence(as_binary))
+        print(f"{steps:5d} {len(as_json):8d} {len(as_binary):9d} {len(as_json) / len(as_binary):5.1f}x   "
+              f"{json_encode:11.2f} {binary_encode:10.2f}   {json_decode:11.2f} {binary_decode:10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
+import os
+
 
 core_sentiments = [
     "Happy",
@@ -51,6 +53,98 @@ allowed_actions = list(action_transitions.keys())
 
 max_goals=5
 
+# Emotion decay, applied lazily in closed form when a dog's emotions are read or blended
+emotion_decay_rate = 0.0                # fraction non-dominant emotions lose per interval (0 = off, e.g. 0.05)
+emotion_decay_interval = 10.0           # seconds per decay step
+emotion_decay_resolution = 0.01         # reads less than this many seconds after the last update skip decay
+
+# User input history per dog (see input_history.py)
+input_history_size = 32                 # recent inputs kept verbatim; older ones are summarized
+input_history_summary_keys = 64         # most common gestures/events/keywords kept in the summary
+input_history_archive = None            # e.g. "user_inputs.jsonl" to append summarized inputs to disk
+
+# Emotion recorder (see emotion_recorder.py)
+emotion_recorder_capacity = 1024        # events preallocated per emotion recorder; doubled when full
+
+# Action server (sequence uploads and finger history); set ACTION_SERVER_URL to point elsewhere
+action_server_url = os.getenv("ACTION_SERVER_URL", "http://localhost:50007")
+action_client_pool_size = 8             # keep-alive connections to the action server per process
+action_client_connect_timeout = 3.05    # seconds to connect to the action server
+action_client_read_timeout = 10.0       # seconds to wait for a response
+action_client_retries = 3               # retries after connection errors and 502/503/504
+action_client_backoff = 0.2             # first retry delay in seconds, doubled for each retry
+action_client_pushback_retries = 3      # retries of an upload the server refused with 429/503
+action_client_max_backoff = 5.0         # cap in seconds on the adaptive delay between uploads
+sequence_long_poll_timeout = 30.0       # max seconds a /get_sequence?since= long-poll blocks
+sequence_sse_keepalive = 15.0           # seconds between keep-alive comments on /stream_sequence
+default_dog_id = "default"              # queue used by clients that don't name a dog
+sequence_queue_length = 16              # max sequences queued per dog
+sequence_max_dogs = 1000                # max dogs tracked; idle dogs are evicted beyond this
+action_server_binary = False            # exchange sequences in the binary wire format (wire_format.py)
+finger_history_size = 256               # finger entries kept by the server's ring buffer
+finger_window = 5                       # recent finger entries a poller keeps to describe the gesture
+
+# Action server serving mode (python action_server.py --help)
+action_server_store = os.getenv("ACTION_SERVER_STORE", "memory")  # "memory", "journal" or "sqlite" (shared by workers)
+action_server_db_path = os.getenv("ACTION_SERVER_DB", "action_server.sqlite3")
+action_server_journal_dir = os.getenv("ACTION_SERVER_JOURNAL", "action_server_journal")
+action_server_workers = 4               # worker processes (needs gunicorn; sqlite store is used when > 1)
+action_server_threads = 16              # request threads per worker
+action_server_graceful_timeout = 10     # seconds in-flight requests get to finish on shutdown
+sequence_store_poll_interval = 0.05     # seconds between checks for changes made by other workers
+journal_fsync_interval = 0.05           # seconds between batched fsyncs (max data lost on a crash)
+journal_compact_bytes = 8 * 1024 * 1024 # log size that triggers a snapshot + new log
+
+# Admission control on sequence uploads (clients told to back off get 429/503 + Retry-After)
+upload_rate_limit = 20.0                # sustained uploads per second per client (0 = unlimited)
+upload_burst = 40                       # uploads a client may send back to back
+rate_limit_max_clients = 10000          # clients tracked; the least recently seen is dropped beyond this
+rate_limit_ids_per_address = 4          # X-Client-Ids from one address share this many clients' allowance
+max_sequence_steps = 64                 # steps per uploaded sequence (413 beyond)
+max_upload_bytes = 256 * 1024           # request body size (413 beyond)
+queue_full_retry_after = 1              # Retry-After seconds sent when a queue or the store is full
+
+# LLM client settings (shared, long-lived client used by every planning call)
+llm_model = "gpt-4o-mini"
+llm_pool_size = 10              # max concurrent connections to the LLM endpoint
+llm_keepalive_connections = 5   # idle connections kept open between calls
+llm_keepalive_expiry = 60.0     # seconds an idle connection is kept alive
+llm_timeout = 30.0              # overall request timeout in seconds
+llm_connect_timeout = 5.0       # connection setup timeout in seconds
+llm_max_retries = 2
+llm_streaming = False           # stream goals to the action server as they are generated
+llm_structured_output = False   # request JSON-schema constrained goals (non-streaming calls)
+
+# Hedged LLM requests (see hedged_requests.py)
+llm_hedge_k = 2                         # max attempts per plan (one backup); 1 disables hedging
+llm_hedge_concurrent = False            # fire all k attempts at once instead of staggering
+llm_hedge_delay = None                  # seconds before a backup attempt; None = latency percentile
+llm_hedge_percentile = 0.9              # observed request latency percentile used as hedge delay
+llm_hedge_default_delay = 2.0           # hedge delay until enough latency samples exist
+
+# Local fallback planner (see fallback_planner.py)
+llm_fallback_enabled = True
+llm_deadline = 3.0                      # seconds to wait for an LLM plan before using the fallback
+fallback_replace_late_plan = True       # upload a late LLM plan in place of the fallback reaction
+late_plan_wait = 10.0                   # seconds a caller waits for the late LLM plan after the fallback upload
+
+# Gesture engine scheduling (see gesture_engine.py)
+plan_staleness_deadline = 5.0           # seconds; older plans are dropped instead of uploaded
+gesture_strength_threshold = 0.5        # emotion-strength change that counts as a new gesture
+
+# Prompt building (see prompt_builder.py)
+prompt_context_token_budget = 200       # tokens of recent user inputs sent as context
+prompt_tokens_per_goal = 32             # completion tokens reserved per planned goal
+prompt_token_overhead = 24              # completion tokens for list brackets and resting state
+
+# Reaction cache for LLM goal plans (see reaction_cache.py)
+reaction_cache_enabled = True
+reaction_cache_size = 256               # max cached inputs (LRU eviction)
+reaction_cache_ttl = 1800.0             # seconds before a cached plan expires
+reaction_cache_variants = 3             # plan variants kept per input
+reaction_cache_emotion_buckets = 4      # quantization steps per emotion weight
+reaction_cache_path = None              # e.g. "reaction_cache.sqlite3" to persist across restarts
+
 rules = f"""
 Just like a real dog you will respond to the users actions and inputs, but will also have a mind and personality of your own.
 I want you to think of a personal goal and intent the dog is trying to achieve through these actions.
@@ -1,22 +1,141 @@
-from config import core_sentiments
+import time
+from collections.abc import MutableMapping
+from operator import itemgetter
+
+from config import core_sentiments, emotion_decay_rate, emotion_decay_interval, emotion_decay_resolution
+from input_history import InputHistory
+
+# tuple(core emotions) -> {emotion: position}, shared by every dog with the same emotions
+_emotion_indexes = {}
+
+
+def emotion_index(core_emotions):
+    """
+    Position of each emotion in the weight array.
+    Returns:
+        dict: {emotion: index}, cached per emotion list.
+    """
+    key = tuple(core_emotions)
+    index = _emotion_indexes.get(key)
+    if index is None:
+        index = _emotion_indexes[key] = {emotion: i for i, emotion in enumerate(key)}
+    return index
+
+
+class EmotionVectorView(MutableMapping):
+    """
+    Live dict-style view of a dog's emotion weights (emotion: weight). Values
+    can be changed, but emotions can't be added or removed.
+    """
+    __slots__ = ("_dog", "_names", "_index")
+
+    def __init__(self, dog):
+        self._dog = dog
+        self._names = dog.core_emotions
+        self._index = dog._index
+
+    def __getitem__(self, emotion):
+        return self._dog._weights[self._index[emotion]]
+
+    def __setitem__(self, emotion, weight):
+        self._dog._set_weight(self._index[emotion], float(weight))
+
+    def __delitem__(self, emotion):
+        raise TypeError("Emotions can't be removed from the emotion vector")
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __len__(self):
+        return len(self._names)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
 class DogPersonality:
     """
-    Stores the dog's long-term personality/context, a malleable emotion vector, and a history of all user inputs.
+    Stores the dog's long-term personality/context, a malleable emotion vector, and a history of user inputs
+    (recent ones verbatim, older ones summarized; see input_history.py).
     The emotion vector represents the current weight/percentage of each core sentiment.
     Designed for extensibility: can be expanded to include memory, mood, or adaptive traits.
+
+    The weights live in a fixed-order list of floats (core_emotions order) that
+    is updated in place. The emotion: weight dict is only built when asked for
+    (get_emotion_vector, the JSON boundary) and kept until the next change;
+    callers get a copy of it, so they can't change the dog by editing it.
+    (A plain list beats array.array here: CPython boxes a float on every array
+    read.)
+
+    Emotions decay with time: every decay_interval seconds the non-dominant
+    ones lose decay_rate, as if decay_emotions(decay_rate) were called on a
+    timer. Instead of ticking, the decay owed since the last update is applied
+    in closed form when the emotions are next read or blended, so an idle dog
+    costs nothing.
     """
-    def __init__(self, personality_description=None, core_emotions=core_sentiments, action="sit"):
-        
+    __slots__ = ("personality", "user_inputs", "core_emotions", "action", "_index", "_weights", "_vector",
+                 "decay_rate", "decay_interval", "clock", "_updated", "_settle_at", "recorder")
+
+    def __init__(self, personality_description=None, core_emotions=core_sentiments, action="sit",
+                 decay_rate=emotion_decay_rate, decay_interval=emotion_decay_interval, clock=time.monotonic,
+                 recorder=None):
+
         self.personality = personality_description or "A playful, loyal, and curious dog companion."
-        self.user_inputs = []  
         self.core_emotions = core_emotions
-        self.emotion_vector = {emotion: 0.0 for emotion in self.core_emotions}
-        self.emotion_vector["Happy"] = 0.5 
-        self.emotion_vector["Curious"] = 0.3
-        self.emotion_vector["Excitement"] = 0.2
+        self.user_inputs = InputHistory(core_emotions)
+        self._index = emotion_index(core_emotions)
+        self._weights = [0.0] * len(self._index)
+        self._vector = None   # cached get_emotion_vector() dict, None after a change
+        for emotion, weight in (("Happy", 0.5), ("Curious", 0.3), ("Excitement", 0.2)):
+            if emotion in self._index:
+                self._weights[self._index[emotion]] = weight
         self.action= action
+        self.decay_rate = decay_rate
+        self.decay_interval = decay_interval
+        self.clock = clock           # seconds, monotonic; injectable for simulations
+        self._updated = clock()      # when the decay was last brought up to date
+        self._settle_at = self._updated + emotion_decay_resolution  # reads before this skip _settle
+        self.recorder = recorder     # EmotionRecorder (emotion_recorder.py) fed by record_emotions, or None
         self.normalize_emotions()
 
+    @property
+    def emotion_vector(self):
+        """Live dict-style view of the weights (emotion: weight); assigning a dict replaces them"""
+        return EmotionVectorView(self)
+
+    @emotion_vector.setter
+    def emotion_vector(self, new_vector):
+        self.set_emotion_vector(new_vector)
+
+    def _set_weight(self, i, weight):
+        self._weights[i] = weight
+        self._vector = None
+
+    def _settle(self):
+        """
+        Apply the decay owed since the last update. n ticks of decay_emotions
+        scale every non-dominant weight by (1 - rate) ** n and renormalize each
+        time; the dominant emotion stays dominant, so one scaling with the
+        total factor and one normalization give the same result.
+        Reads only call it when the clock is outside [_updated, _settle_at).
+        """
+        now = self.clock()
+        elapsed = now - self._updated
+        if 0 <= elapsed < emotion_decay_resolution:
+            return  # owed decay keeps accumulating; (1 - r) ** a * (1 - r) ** b == (1 - r) ** (a + b)
+        self._updated = now
+        self._settle_at = now + emotion_decay_resolution
+        # A clock that went backwards owes nothing; rates outside [0, 1] are clamped
+        keep = min(1.0, max(0.0, 1.0 - self.decay_rate))
+        if elapsed <= 0 or keep == 1.0:
+            return
+        factor = keep ** (elapsed / self.decay_interval)
+        weights = self._weights
+        dominant = weights.index(max(weights))
+        kept = weights[dominant]
+        weights[:] = [w * factor for w in weights]
+        weights[dominant] = kept
+        self.normalize_emotions()
 
     def set_personality(self, description):
         """
@@ -36,17 +155,17 @@ class DogPersonality:
 
     def add_user_input(self, user_input):
         """
-        Add a user input event to the history.
+        Add a user input event to the history, with the current emotions for its summary.
         Args:
             user_input (dict or str): The user input event.
         """
-        self.user_inputs.append(user_input)
+        self.user_inputs.append(user_input, self._weights)
 
     def get_user_inputs(self):
         """
-        Get the history of all user inputs.
+        Get the recent user inputs (older ones are in user_inputs.summary).
         Returns:
-            list: List of user input events.
+            InputHistory: List-like window of user input events, oldest first.
         """
         return self.user_inputs
 
@@ -55,8 +174,9 @@ class DogPersonality:
         Set the entire emotion vector. Expects a dict of emotion: weight.
         Automatically normalizes the vector.
         """
-        for emotion in self.core_emotions:
-            self.emotion_vector[emotion] = float(new_vector.get(emotion, 0.0))
+        self._weights[:] = [float(new_vector.get(emotion, 0.0)) for emotion in self.core_emotions]
+        self._updated = self.clock()
+        self._settle_at = self._updated + emotion_decay_resolution
         self.normalize_emotions()
 
     def update_emotion(self, emotion, delta):
@@ -66,10 +186,11 @@ class DogPersonality:
             emotion (str): The emotion to update.
             delta (float): The amount to add (can be negative).
         """
-        if emotion in self.emotion_vector:
-            self.emotion_vector[emotion] += delta
+        i = self._index.get(emotion)
+        if i is not None:
+            self._settle()
             # Clamp to [0, None] (no negative emotions)
-            self.emotion_vector[emotion] = max(0.0, self.emotion_vector[emotion])
+            self._weights[i] = max(0.0, self._weights[i] + delta)
             self.normalize_emotions()
 
     def decay_emotions(self, decay_rate=0.05):
@@ -78,10 +199,13 @@ class DogPersonality:
         Args:
             decay_rate (float): The fraction to decay each emotion by.
         """
-        dominant = self.get_dominant_emotion()
-        for emotion in self.emotion_vector:
-            if emotion != dominant:
-                self.emotion_vector[emotion] *= (1.0 - decay_rate)
+        self._settle()
+        weights = self._weights
+        dominant = weights.index(max(weights))
+        kept = weights[dominant]
+        keep = 1.0 - decay_rate
+        weights[:] = [w * keep for w in weights]
+        weights[dominant] = kept
         self.normalize_emotions()
 
     def blend_emotions(self, blend_dict):
@@ -91,32 +215,40 @@ class DogPersonality:
             blend_dict: Either a dict of emotion: weight or a list of (emotion, weight) tuples
         """
         # Handle both list of tuples and dictionary inputs
-        if isinstance(blend_dict, list):
-            # Convert list of tuples to dictionary
-            emotion_dict = dict(blend_dict)
-        else:
-            emotion_dict = blend_dict
-
-        # Update emotions
+        emotion_dict = dict(blend_dict) if isinstance(blend_dict, list) else blend_dict
+        self._settle()
+        weights, index = self._weights, self._index
         for emotion, value in emotion_dict.items():
-            if emotion in core_sentiments:
-                self.emotion_vector[emotion] += value
+            i = index.get(emotion)
+            if i is not None:
+                weights[i] += value
         self.normalize_emotions()
 
     def normalize_emotions(self):
         """
         Normalize the emotion vector so all weights sum to 1.0 (if total > 0).
         """
-        total = sum(self.emotion_vector.values())
+        weights = self._weights
+        total = sum(weights)
         if total > 0:
-            for emotion in self.emotion_vector:
-                self.emotion_vector[emotion] /= total
+            weights[:] = [w / total for w in weights]
+        self._vector = None
 
     def get_emotion_vector(self):
         """
         Get the current emotion vector (dict of emotion: weight).
+        Returns a new dict each call (copied from one built after the last change).
         """
-        return dict(self.emotion_vector)
+        if not self._updated <= self.clock() < self._settle_at:
+            self._settle()
+        vector = self._vector
+        if vector is None:
+            # The index dict already has the keys in order; copying it and
+            # filling in the weights beats dict(zip(...))
+            vector = self._index.copy()
+            vector.update(zip(self.core_emotions, self._weights))
+            self._vector = vector
+        return vector.copy()
 
     def get_dominant_emotion(self):
         """
@@ -124,7 +256,10 @@ class DogPersonality:
         Returns:
             str: The dominant emotion.
         """
-        return max(self.emotion_vector, key=self.emotion_vector.get)
+        if not self._updated <= self.clock() < self._settle_at:
+            self._settle()
+        weights = self._weights
+        return self.core_emotions[weights.index(max(weights))]
 
     def get_top_emotions(self, n=3):
         """
@@ -134,18 +269,29 @@ class DogPersonality:
         Returns:
             List[Tuple[str, float]]: List of (emotion, weight) tuples.
         """
-        sorted_emotions = sorted(self.emotion_vector.items(), key=lambda x: x[1], reverse=True)
+        if not self._updated <= self.clock() < self._settle_at:
+            self._settle()
+        sorted_emotions = sorted(zip(self.core_emotions, self._weights), key=itemgetter(1), reverse=True)
         return sorted_emotions[:n]
 
+    def record_emotions(self, action):
+        """
+        Append the current emotions and action to the recorder, if the dog has one.
+        Args:
+            action (str): The action the emotions go with.
+        """
+        if self.recorder is not None:
+            self.recorder.record(self._weights, action)
+
     def process_emotion_tuples(self, emotion_tuples):
         """
         Process a list of emotion tuples from valid goals and normalize the emotion vector.
-        
+
         Args:
             emotion_tuples: List of tuples in format [('emotion1', weight1), ('emotion2', weight2)]
         """
         # Pass the emotion tuples directly to blend_emotions
-        self.blend_emotions(emotion_tuples) 
+        self.blend_emotions(emotion_tuples)
 
     def get_action(self):
         """
@@ -153,4 +299,4 @@ class DogPersonality:
         Returns:
             str: The current action.
         """
-        return self.action
\ No newline at end of file
+        return self.action
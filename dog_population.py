@@ -0,0 +1,258 @@
+"""
+Dog Population (struct-of-arrays emotion state for a fleet of dogs)
+
+- Every dog's emotion weights live in one (dogs x emotions) NumPy matrix and
+  every current action in one integer array, so blend / decay / normalize /
+  dominant emotion / top-k run across the whole fleet in one call.
+- Batched operations take an optional `dogs` selector (index array, slice or
+  boolean mask); leaving it out means every dog.
+- population[i] is a DogHandle: a DogPersonality whose weights are row i of
+  the matrix, so existing code (buildSequence, prompt building, ...) works on
+  fleet dogs unchanged.
+- Results match DogPersonality to rounding: same normalization, ties
+  resolved to the earliest emotion, decay sparing the dominant emotion, and
+  the same lazy time-based decay (one timestamp per dog, settled in closed
+  form for the selected dogs before each batched read or update).
+
+Usage:
+    population = DogPopulation(10000)
+    population.blend({"Happy": 0.3, "Excitement": 0.2}, dogs=np.arange(0, 10000, 2))
+    population.decay(0.05)
+    names = population.dominant_emotions()
+    dog = population[42]        # DogPersonality API
+"""
+
+import time
+
+import numpy as np
+
+from config import core_sentiments, allowed_actions
+from config import emotion_decay_rate, emotion_decay_interval, emotion_decay_resolution
+from dog_personality import DogPersonality, emotion_index
+from input_history import InputHistory
+
+ALL = slice(None)
+
+
+class DogPopulation:
+    """
+    Emotion matrix and action array for many dogs, with batched updates.
+    """
+    def __init__(self, size, core_emotions=core_sentiments, action="sit", personality_description=None,
+                 decay_rate=emotion_decay_rate, decay_interval=emotion_decay_interval, clock=time.monotonic):
+        self.core_emotions = core_emotions
+        self._index = emotion_index(core_emotions)
+        self.personality = personality_description or "A playful, loyal, and curious dog companion."
+        self.emotions = np.zeros((size, len(self._index)), dtype=np.float64)
+        for emotion, weight in (("Happy", 0.5), ("Curious", 0.3), ("Excitement", 0.2)):
+            if emotion in self._index:
+                self.emotions[:, self._index[emotion]] = weight
+        self.action_names = list(allowed_actions)
+        self._action_ids = {name: i for i, name in enumerate(self.action_names)}
+        self.actions = np.full(size, self.action_id(action), dtype=np.int32)
+        self._handles = {}
+        self.decay_rate = decay_rate
+        self.decay_interval = decay_interval
+        self.clock = clock
+        self.updated = np.full(size, clock())  # when each dog's decay was last brought up to date
+        self.normalize()
+
+    def __len__(self):
+        return self.emotions.shape[0]
+
+    def __getitem__(self, dog):
+        """Per-dog DogPersonality handle (created on first use, then reused)"""
+        dog = range(len(self))[dog]  # bounds check and negative indexes
+        handle = self._handles.get(dog)
+        if handle is None:
+            handle = self._handles[dog] = DogHandle(self, dog)
+        return handle
+
+    def action_id(self, action):
+        """Integer id of an action name, registering names outside allowed_actions"""
+        action_id = self._action_ids.get(action)
+        if action_id is None:
+            action_id = self._action_ids[action] = len(self.action_names)
+            self.action_names.append(action)
+        return action_id
+
+    def emotion_weights(self, blend):
+        """
+        Turn a blend into a weight vector in core_emotions order.
+        Args:
+            blend: dict or list of (emotion, weight) pairs (unknown emotions
+                   ignored), or an array already in core_emotions order.
+        """
+        if isinstance(blend, (dict, list)):
+            vector = np.zeros(len(self._index))
+            for emotion, weight in (blend.items() if isinstance(blend, dict) else dict(blend).items()):
+                i = self._index.get(emotion)
+                if i is not None:
+                    vector[i] = weight
+            return vector
+        return np.asarray(blend, dtype=np.float64)
+
+    def set_actions(self, actions, dogs=ALL):
+        """Set current actions from a name, a list of names or an id array"""
+        if isinstance(actions, str):
+            actions = self.action_id(actions)
+        elif len(actions) and isinstance(actions[0], str):
+            actions = [self.action_id(name) for name in actions]
+        self.actions[dogs] = actions
+
+    def get_actions(self, dogs=ALL):
+        names = self.action_names
+        return [names[i] for i in np.atleast_1d(self.actions[dogs])]
+
+    def normalize(self, dogs=ALL):
+        """Scale each selected dog's weights to sum to 1.0 (rows summing to 0 stay as they are)"""
+        rows = self.emotions[dogs]
+        totals = rows.sum(axis=1, keepdims=True)
+        np.divide(rows, totals, out=rows, where=totals > 0)
+        self.emotions[dogs] = rows
+
+    def settle(self, dogs=ALL):
+        """
+        Apply the time-based decay the selected dogs are owed, in closed form
+        (see DogPersonality._settle). Dogs updated less than
+        emotion_decay_resolution seconds ago are left for later.
+        """
+        now = self.clock()
+        updated = self.updated[dogs]
+        elapsed = now - updated
+        # Negative elapsed (the clock went backwards) just moves the timestamp
+        due = (elapsed >= emotion_decay_resolution) | (elapsed < 0)
+        if not due.any():
+            return
+        updated[due] = now
+        self.updated[dogs] = updated
+        keep = min(1.0, max(0.0, 1.0 - self.decay_rate))
+        if keep == 1.0:
+            return
+        factors = np.where(elapsed >= emotion_decay_resolution,
+                           keep ** (np.maximum(elapsed, 0.0) / self.decay_interval), 1.0)
+        self._scale_except_dominant(factors[:, None], dogs)
+
+    def _scale_except_dominant(self, factors, dogs):
+        rows = self.emotions[dogs]
+        dominant = rows.argmax(axis=1)
+        picked = np.arange(rows.shape[0])
+        kept = rows[picked, dominant]
+        rows *= factors
+        rows[picked, dominant] = kept
+        self.emotions[dogs] = rows
+        self.normalize(dogs)
+
+    def blend(self, blend, dogs=ALL):
+        """
+        Add emotion weights, then normalize.
+        Args:
+            blend: One blend for every selected dog (dict, pairs or vector), or
+                   a (selected dogs x emotions) matrix with one row per dog.
+        """
+        self.settle(dogs)
+        self.emotions[dogs] += self.emotion_weights(blend)
+        self.normalize(dogs)
+
+    def update_emotion(self, emotion, delta, dogs=ALL):
+        """Add delta to one emotion (clamped at 0), then normalize"""
+        i = self._index.get(emotion)
+        if i is None:
+            return
+        self.settle(dogs)
+        column = self.emotions[dogs, i] + delta
+        self.emotions[dogs, i] = np.maximum(column, 0.0)
+        self.normalize(dogs)
+
+    def decay(self, decay_rate=0.05, dogs=ALL):
+        """Decay every emotion except each dog's dominant one by decay_rate, then normalize"""
+        self.settle(dogs)
+        self._scale_except_dominant(1.0 - decay_rate, dogs)
+
+    def dominant(self, dogs=ALL):
+        """
+        Returns:
+            np.ndarray: Index of each selected dog's dominant emotion.
+        """
+        self.settle(dogs)
+        return self.emotions[dogs].argmax(axis=1)
+
+    def dominant_emotions(self, dogs=ALL):
+        names = self.core_emotions
+        return [names[i] for i in self.dominant(dogs)]
+
+    def top_k(self, k=3, dogs=ALL):
+        """
+        The k strongest emotions of each selected dog, strongest first.
+        Returns:
+            tuple: (emotion indexes, weights), both (selected dogs x k) arrays.
+        """
+        self.settle(dogs)
+        rows = self.emotions[dogs]
+        order = np.argsort(-rows, axis=1, kind="stable")[:, :k]
+        return order, np.take_along_axis(rows, order, axis=1)
+
+
+class DogHandle(DogPersonality):
+    """
+    DogPersonality API for one dog of a DogPopulation; emotions and action
+    read and write the population's arrays.
+    """
+    __slots__ = ("population", "dog")
+
+    def __init__(self, population, dog):
+        self.population = population
+        self.dog = dog
+        self.personality = population.personality
+        self.user_inputs = InputHistory(population.core_emotions)
+        self.core_emotions = population.core_emotions
+        self._index = population._index
+        self._weights = population.emotions[dog]  # row view, updated in place
+        self._vector = None
+        self.recorder = None
+
+    @property
+    def action(self):
+        population = self.population
+        return population.action_names[population.actions[self.dog]]
+
+    @action.setter
+    def action(self, action):
+        self.population.actions[self.dog] = self.population.action_id(action)
+
+    def _set_weight(self, i, weight):
+        self._weights[i] = weight
+
+    def _settle(self):
+        self.population.settle([self.dog])
+
+    def set_emotion_vector(self, new_vector):
+        self._weights[:] = [float(new_vector.get(emotion, 0.0)) for emotion in self.core_emotions]
+        self.population.updated[self.dog] = self.population.clock()
+        self.normalize_emotions()
+
+    def update_emotion(self, emotion, delta):
+        self.population.update_emotion(emotion, delta, [self.dog])
+
+    def decay_emotions(self, decay_rate=0.05):
+        self.population.decay(decay_rate, [self.dog])
+
+    def blend_emotions(self, blend_dict):
+        self.population.blend(blend_dict, [self.dog])
+
+    def normalize_emotions(self):
+        self.population.normalize([self.dog])
+
+    def get_emotion_vector(self):
+        # Not cached: batched population updates change the row behind our back
+        self._settle()
+        return dict(zip(self.core_emotions, self._weights.tolist()))
+
+    def get_dominant_emotion(self):
+        self._settle()
+        return self.core_emotions[int(self._weights.argmax())]
+
+    def get_top_emotions(self, n=3):
+        self._settle()
+        weights = self._weights.tolist()
+        return sorted(zip(self.core_emotions, weights), key=lambda x: x[1], reverse=True)[:n]
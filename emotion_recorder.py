@@ -0,0 +1,136 @@
+"""
+Emotion Time-Series Recorder
+
+- Records a dog's emotion vector, action and timestamp after every blend
+  (direct_emotion_blend), for offline analysis of how emotions evolve.
+- Columnar storage: one float64 array of timestamps, one int32 array of
+  action ids and one (events x emotions) float64 matrix, preallocated and
+  doubled when full, so recording is a few array stores per event (amortized
+  constant; no per-event Python objects).
+- Export without copying: columns() returns NumPy views and buffers() plain
+  memoryviews (buffer protocol) of the recorded rows; save() writes .npy
+  files that load_recording() memory-maps back.
+
+Usage:
+    dog = DogPersonality(recorder=EmotionRecorder())
+    ...
+    columns = dog.recorder.columns()   # {"time", "action", "emotions"}
+    dog.recorder.save("recordings/dog-1")
+    recording = load_recording("recordings/dog-1")
+"""
+
+import json
+import os
+import time
+
+import numpy as np
+
+from config import core_sentiments, emotion_recorder_capacity
+
+COLUMNS = ("time", "action", "emotions")
+
+
+class EmotionRecorder:
+    """
+    Growable columnar buffer of (timestamp, action, emotion vector) events.
+    """
+    def __init__(self, core_emotions=core_sentiments, capacity=emotion_recorder_capacity, clock=time.time):
+        self.core_emotions = list(core_emotions)
+        self.clock = clock
+        self.action_names = []
+        self._action_ids = {}
+        self._count = 0
+        self._allocate(max(1, capacity))
+
+    def _allocate(self, capacity):
+        times = np.empty(capacity, dtype=np.float64)
+        actions = np.empty(capacity, dtype=np.int32)
+        emotions = np.empty((capacity, len(self.core_emotions)), dtype=np.float64)
+        n = self._count
+        if n:
+            times[:n] = self._times[:n]
+            actions[:n] = self._actions[:n]
+            emotions[:n] = self._emotions[:n]
+        # Views exported before a resize keep pointing at the old arrays, which stay valid
+        self._times, self._actions, self._emotions = times, actions, emotions
+
+    @property
+    def capacity(self):
+        return self._times.shape[0]
+
+    def __len__(self):
+        return self._count
+
+    def action_id(self, action):
+        """Integer id of an action name (registered on first use)"""
+        action_id = self._action_ids.get(action)
+        if action_id is None:
+            action_id = self._action_ids[action] = len(self.action_names)
+            self.action_names.append(action)
+        return action_id
+
+    def record(self, weights, action, timestamp=None):
+        """
+        Append one event.
+        Args:
+            weights: Emotion weights in core_emotions order (list or array).
+            action (str): The action the weights go with.
+            timestamp (float): Seconds since the epoch (defaults to clock()).
+        """
+        n = self._count
+        if n == self.capacity:
+            self._allocate(2 * n)
+        self._times[n] = self.clock() if timestamp is None else timestamp
+        self._actions[n] = self.action_id(action)
+        self._emotions[n] = weights
+        self._count = n + 1
+
+    def columns(self):
+        """
+        The recorded rows as NumPy views (no copy).
+        Returns:
+            dict: {"time": (n,) float64, "action": (n,) int32 ids into
+                   action_names, "emotions": (n, emotions) float64}
+        """
+        n = self._count
+        return {"time": self._times[:n], "action": self._actions[:n], "emotions": self._emotions[:n]}
+
+    def buffers(self):
+        """
+        The recorded rows as memoryviews over the same memory, for consumers
+        that speak the buffer protocol but not NumPy.
+        """
+        return {name: memoryview(column) for name, column in self.columns().items()}
+
+    def save(self, directory):
+        """
+        Write the recording to directory: one .npy file per column plus
+        meta.json (emotion and action names), readable with load_recording().
+        """
+        os.makedirs(directory, exist_ok=True)
+        for name, column in self.columns().items():
+            np.save(os.path.join(directory, f"{name}.npy"), column)
+        with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"core_emotions": self.core_emotions, "action_names": self.action_names}, f)
+
+    def clear(self):
+        """Forget the recorded events (exported views keep the old data)"""
+        self._count = 0
+        self._allocate(self.capacity)
+
+
+def load_recording(directory, mmap_mode="r"):
+    """
+    Open a recording written by EmotionRecorder.save().
+    Args:
+        directory (str): The recording directory.
+        mmap_mode (str): NumPy mmap mode ("r" maps the files read-only instead
+                         of reading them; None loads them into memory).
+    Returns:
+        dict: The COLUMNS arrays plus "core_emotions" and "action_names".
+    """
+    with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+        recording = json.load(f)
+    for name in COLUMNS:
+        recording[name] = np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode)
+    return recording
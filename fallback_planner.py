@@ -0,0 +1,271 @@
+"""
+Local Fallback Planner
+
+- Zero-network planner that turns a user input and the dog's current emotion
+  vector into a valid goal list in microseconds.
+- Used when the LLM is slow or fails: plan_with_deadline() gives the LLM a
+  latency budget and falls back to the local plan when it runs out, so the
+  dog always has something to do.
+- A late LLM plan can still replace the fallback reaction. It is handed back
+  as a LatePlan that the thread owning the dog collects and applies itself;
+  the executor thread never touches the dog, and a plan whose input has been
+  superseded by a newer one is dropped.
+- stream_with_deadline() does the same for streaming planners: the deadline
+  covers the first streamed goal.
+
+Goals use the same format as parse_llm_goal_output:
+    [("Action", [("Emotion1", weight1), ("Emotion2", weight2)]), ...]
+"""
+
+import queue
+import random
+import re
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout, wait
+
+from config import core_sentiments, action_transitions, allowed_actions, llm_deadline, late_plan_wait
+
+# Emotion evoked by words in text input or in the gesture descriptions built
+# by parse_finger_sequence_to_user_input
+KEYWORD_EMOTIONS = {
+    "good": ("Happy", "Self confidence"),
+    "boy": ("Happy", "Intimacy"),
+    "girl": ("Happy", "Intimacy"),
+    "love": ("Intimacy", "Happy"),
+    "best": ("Happy", "Self confidence"),
+    "amazing": ("Excitement", "Happy"),
+    "play": ("Excitement", "Happy"),
+    "fetch": ("Excitement", "Curious"),
+    "ball": ("Excitement", "Curious"),
+    "walk": ("Excitement", "Curious"),
+    "dinner": ("Excitement", "Happy"),
+    "food": ("Excitement", "Happy"),
+    "treat": ("Excitement", "Happy"),
+    "come": ("Intimacy", "Curious"),
+    "here": ("Intimacy", "Curious"),
+    "sit": ("Self confidence", "Intimacy"),
+    "stay": ("Self confidence", "Vigilant"),
+    "sad": ("Sad", "Intimacy"),
+    "terrible": ("Sad", "Intimacy"),
+    "cry": ("Sad", "Intimacy"),
+    "bad": ("Grievances", "Fear"),
+    "no": ("Grievances", "Confusion"),
+    "stop": ("Vigilant", "Confusion"),
+    "angry": ("Fear", "Grievances"),
+    "tired": ("Tired", "Intimacy"),
+    "sleep": ("Tired", "Boredom"),
+    "bed": ("Tired", "Boredom"),
+    "open": ("Happy", "Curious"),
+    "close": ("Vigilant", "Fear"),
+    "fist": ("Vigilant", "Fear"),
+    "pointer": ("Curious", "Self confidence"),
+    "ok": ("Happy", "Self confidence"),
+    "clockwise": ("Excitement", "Confusion"),
+    "move": ("Curious", "Excitement"),
+}
+
+# Actions (from both action_transitions and actions_short) that express each emotion
+EMOTION_ACTIONS = {
+    "Happy": ["Jump", "Spin", "Shake", "Roll", "JumpAndPaw", "ChaseTail", "Bark"],
+    "Sad": ["Lie Face Down", "Sit", "Lie", "LickPaw"],
+    "Curious": ["Walk", "Downward Dog", "Paw Up", "Stand", "PawUp", "Bark"],
+    "Vigilant": ["Super Stand", "Stand", "Bark", "Sit"],
+    "Fear": ["Retreat", "Lie Face Down", "Lie", "PlayDead"],
+    "Intimacy": ["Paw Up", "Lie Face Up", "Sit", "Roll", "PawUp", "LickPaw"],
+    "Confusion": ["Spin", "Sit", "Stand", "Bark"],
+    "Self confidence": ["Super Stand", "Walk", "Sit", "Bark"],
+    "Boredom": ["Lie Face Down", "Roll", "Lie", "Walk"],
+    "Grievances": ["Retreat", "Kick", "Bark", "Lie"],
+    "Excitement": ["Jump", "Spin", "Kick", "JumpAndPaw", "ChaseTail", "Bark"],
+    "Tired": ["Lie Face Down", "Lie Face Up", "Lie", "Sit", "PlayDead"],
+}
+
+_STRENGTH_PATTERN = re.compile(r"emotion strength:\s*(-?\d+(?:\.\d+)?)")
+
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="llm-plan")
+# A plan request is useless after this many seconds: the deadline plus the
+# time a caller waits for a late plan. Requests submitted to _executor pass
+# it as their timeout, so hung requests can't hold its few workers for long.
+late_plan_window = llm_deadline + late_plan_wait
+
+
+def _input_features(user_input):
+    """
+    Extract (emotion scores, intensity 0..1) from a text, gesture or event input.
+    """
+    if isinstance(user_input, dict):
+        text = str(user_input.get("event", ""))
+        intensity = float(user_input.get("intensity", 0.5))
+    else:
+        text = str(user_input)
+        match = _STRENGTH_PATTERN.search(text)
+        if match:
+            intensity = float(match.group(1))
+        else:
+            intensity = 0.4 + 0.1 * min(text.count("!"), 4)
+
+    scores = dict.fromkeys(core_sentiments, 0.0)
+    for word in re.findall(r"[a-z]+", text.lower()):
+        emotions = KEYWORD_EMOTIONS.get(word)
+        if emotions:
+            scores[emotions[0]] += 1.0
+            scores[emotions[1]] += 0.5
+    return scores, min(1.0, max(0.0, intensity))
+
+
+def plan_fallback_goals(dog, user_input, actions=allowed_actions, max_goals=3):
+    """
+    Build a valid goal list locally, without any network call.
+    Args:
+        dog (DogPersonality): The dog to plan for (its emotions are read, not changed).
+        user_input: Text, gesture description or event dict being reacted to.
+        actions (list): Allowed action names (allowed_actions or actions_short).
+        max_goals (int): Maximum number of goals to return.
+    Returns:
+        list: [(action, [(emotion, weight), (emotion, weight)]), ...]
+    """
+    scores, intensity = _input_features(user_input)
+
+    # The dog's current mood colours the reaction
+    for emotion, weight in dog.get_emotion_vector().items():
+        if emotion in scores:
+            scores[emotion] += 0.5 * weight
+    ranked = sorted(scores, key=scores.get, reverse=True)
+    primary, secondary = ranked[0], ranked[1]
+
+    # Stronger input -> more intense emotions, never more than 1.0 per action
+    total = 0.3 + 0.5 * intensity
+    emotions = [(primary, round(total * 0.6, 3)), (secondary, round(total * 0.4, 3))]
+
+    allowed = set(actions)
+    candidates = [a for a in EMOTION_ACTIONS[primary] + EMOTION_ACTIONS[secondary] if a in allowed]
+    if not candidates:
+        candidates = list(actions)
+
+    goals = [(random.choice(candidates[:3]), emotions)]
+    while len(goals) < max_goals:
+        previous = goals[-1][0]
+        # Follow legal transitions where the action graph knows the action
+        followers = [a for a in action_transitions.get(previous, candidates) if a in allowed]
+        preferred = [a for a in followers if a in candidates and a not in [g[0] for g in goals]]
+        if not preferred:
+            break
+        goals.append((preferred[0], emotions))
+    return goals
+
+
+def plan_with_deadline(llm_planner, fallback_planner, deadline=llm_deadline):
+    """
+    Run the LLM planner with a latency budget.
+    Args:
+        llm_planner (callable): Returns a validated goal list (may raise). It
+                                runs on the executor, so it must not touch the dog.
+        fallback_planner (callable): Local planner used when the LLM misses the deadline or fails.
+        deadline (float): Seconds to wait for the LLM plan.
+    Returns:
+        tuple: (goals, source, late_plan). source is "llm" or "fallback";
+               late_plan is the still-running LLM Future when the deadline was
+               missed (wrap it in a LatePlan), otherwise None.
+    """
+    future = _executor.submit(llm_planner)
+    try:
+        return future.result(timeout=deadline), "llm", None
+    except FuturesTimeout:
+        print(f"⏱️  LLM missed the {deadline:.1f}s deadline, using fallback plan")
+        return fallback_planner(), "fallback", future
+    except Exception as e:
+        print(f"⚠️  LLM planning failed ({e}), using fallback plan")
+        return fallback_planner(), "fallback", None
+
+
+def stream_with_deadline(goal_stream, fallback_planner, deadline=llm_deadline):
+    """
+    Run a streaming LLM planner with a latency budget for its first goal.
+    The stream is consumed on the executor; its goals are handed to the
+    calling thread through a queue, so the stream never touches the dog.
+    Args:
+        goal_stream (iterable): Lazily yields validated goals (e.g. a generator
+                                that has not started yet).
+        fallback_planner (callable): Local planner used when the first goal misses the deadline or the stream fails.
+        deadline (float): Seconds to wait for the first goal.
+    Returns:
+        tuple: (goals, source, late_plan). For source "llm", goals yields the
+               streamed goals as they arrive; for "fallback" it is the local
+               plan, and late_plan is the still-running Future of the whole
+               streamed goal list if the deadline was missed, otherwise None.
+    """
+    handoff = queue.SimpleQueue()
+
+    def consume():
+        streamed = []
+        try:
+            for goal in goal_stream:
+                streamed.append(goal)
+                handoff.put(goal)
+        except Exception as e:
+            handoff.put(e)
+            raise
+        handoff.put(None)
+        return streamed
+
+    future = _executor.submit(consume)
+    try:
+        first = handoff.get(timeout=deadline)
+    except queue.Empty:
+        print(f"⏱️  LLM missed the {deadline:.1f}s deadline for its first goal, using fallback plan")
+        return fallback_planner(), "fallback", future
+    if first is None or isinstance(first, Exception):
+        print(f"⚠️  LLM planning failed ({first or 'no goals'}), using fallback plan")
+        return fallback_planner(), "fallback", None
+
+    def streamed_goals():
+        item = first
+        while item is not None:
+            if isinstance(item, Exception):
+                raise item
+            yield item
+            item = handoff.get()
+    return streamed_goals(), "llm", None
+
+
+class LatePlan:
+    """
+    An LLM plan still running after its fallback reaction was uploaded.
+    It belongs to whoever owns the dog: goals() is called from that thread
+    (after wait(), or once add_done_callback has handed the plan over to it),
+    and only returns the plan if no newer input has arrived since.
+    """
+    def __init__(self, future, dog):
+        self.future = future
+        self.generation = dog.user_inputs.total   # inputs the dog had seen when the plan was made
+        self.emotions = dog.get_emotion_vector()  # the dog's emotions before the fallback plan was blended
+
+    def wait(self, timeout=None):
+        """Block until the plan finishes or timeout seconds pass"""
+        wait([self.future], timeout)
+
+    def add_done_callback(self, callback):
+        """
+        Call callback(late_plan) when the plan finishes. It runs on the
+        executor thread, so it should only hand the plan to the dog's owner
+        (e.g. loop.call_soon_threadsafe or a queue).
+        """
+        self.future.add_done_callback(lambda future: callback(self))
+
+    def cancel(self):
+        """Cancel the request if it hasn't started (a running one ends at its timeout)"""
+        self.future.cancel()
+
+    def goals(self, dog):
+        """
+        Returns:
+            list or None: The plan's goals if it finished successfully and dog
+                          hasn't received another input since; otherwise None
+                          (failed late plans are ignored, the fallback stands).
+        """
+        future = self.future
+        if not future.done() or future.cancelled() or future.exception() is not None:
+            return None
+        if dog.user_inputs.total != self.generation:
+            print("Dropping late LLM plan: a newer input arrived")
+            return None
+        return future.result()
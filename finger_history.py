@@ -0,0 +1,142 @@
+"""
+Finger History Ring Buffer
+
+- Keeps the most recent finger-sequence entries (keypoint, point_history,
+  emotion_strength) in a fixed-size ring, so memory stays constant for the
+  whole session.
+- Every entry gets a global sequence number. Readers keep a cursor (the last
+  number they have seen) and ask only for entries after it, so each poll
+  transfers and compares just the new entries.
+- A cursor that fell out of the ring (or comes from before a server restart)
+  gets everything still buffered plus a reset flag.
+- snapshot()/restore() copy the buffer out and back in with its cursor, for
+  the journal (journal.py).
+- SqliteFingerHistory has the same API on a SQLite/WAL table, for server
+  worker processes that share one history.
+"""
+
+import json
+import threading
+
+from config import finger_history_size
+from sequence_store import connect_sqlite, SqliteTransaction
+
+
+class FingerHistory:
+    """
+    Thread-safe ring buffer of finger entries with cursor-based reads.
+    """
+    def __init__(self, capacity=finger_history_size):
+        self.capacity = capacity
+        self._entries = [None] * capacity
+        self._latest = 0      # sequence number of the newest entry (0 = empty)
+        self._lock = threading.RLock()  # reentrant so subclasses can extend add() under it
+
+    @property
+    def cursor(self):
+        return self._latest
+
+    def add(self, entries):
+        """
+        Append entries in order.
+        Returns:
+            int: Sequence number (cursor) of the last entry added.
+        """
+        with self._lock:
+            for entry in entries:
+                self._latest += 1
+                self._entries[self._latest % self.capacity] = entry
+            return self._latest
+
+    def since(self, cursor):
+        """
+        Get the entries added after cursor.
+        Returns:
+            tuple: (entries, new cursor, reset). reset is True when entries
+                   after cursor were overwritten or cursor is from the future,
+                   in which case every buffered entry is returned.
+        """
+        with self._lock:
+            oldest = max(1, self._latest - self.capacity + 1)
+            reset = cursor > self._latest or cursor < oldest - 1
+            start = oldest if reset else cursor + 1
+            entries = [self._entries[n % self.capacity] for n in range(start, self._latest + 1)]
+            return entries, self._latest, reset
+
+    def recent(self, count=None):
+        """Most recent entries (all buffered ones by default), oldest first"""
+        entries, _, _ = self.since(-1)
+        return entries if count is None else entries[-count:]
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: {"cursor": n, "entries": [buffered entries, oldest first]}
+        """
+        entries, latest, _ = self.since(-1)
+        return {"cursor": latest, "entries": entries}
+
+    def restore(self, state):
+        """Replace the buffer with the contents of a snapshot(), keeping its cursor"""
+        entries = state["entries"][-self.capacity:]
+        with self._lock:
+            self._entries = [None] * self.capacity
+            self._latest = state["cursor"] - len(entries)
+            for entry in entries:
+                self._latest += 1
+                self._entries[self._latest % self.capacity] = entry
+
+
+class SqliteFingerHistory:
+    """
+    FingerHistory API backed by a SQLite/WAL table shared between processes.
+    """
+    def __init__(self, path, capacity=finger_history_size):
+        self.path = path
+        self.capacity = capacity
+        self._local = threading.local()  # one connection per thread, opened lazily (after fork)
+        db = connect_sqlite(path)
+        try:
+            db.execute("CREATE TABLE IF NOT EXISTS finger_history "
+                       "(seq INTEGER PRIMARY KEY AUTOINCREMENT, entry TEXT NOT NULL)")
+        finally:
+            db.close()
+
+    def _connection(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = self._local.db = connect_sqlite(self.path)
+        return db
+
+    def _latest(self, db):
+        # AUTOINCREMENT numbers never go back, even after old rows are trimmed
+        row = db.execute("SELECT seq FROM sqlite_sequence WHERE name = 'finger_history'").fetchone()
+        return row[0] if row else 0
+
+    @property
+    def cursor(self):
+        return self._latest(self._connection())
+
+    def add(self, entries):
+        with SqliteTransaction(self._connection()) as db:
+            db.executemany("INSERT INTO finger_history (entry) VALUES (?)", [(json.dumps(e),) for e in entries])
+            latest = self._latest(db)
+            db.execute("DELETE FROM finger_history WHERE seq <= ?", (latest - self.capacity,))
+        return latest
+
+    def since(self, cursor):
+        db = self._connection()
+        db.execute("BEGIN")  # one snapshot for both reads
+        try:
+            latest = self._latest(db)
+            oldest = max(1, latest - self.capacity + 1)
+            reset = cursor > latest or cursor < oldest - 1
+            start = oldest if reset else cursor + 1
+            rows = db.execute("SELECT entry FROM finger_history WHERE seq >= ? ORDER BY seq", (start,)).fetchall()
+        finally:
+            db.execute("COMMIT")
+        return [json.loads(row[0]) for row in rows], latest, reset
+
+    def recent(self, count=None):
+        entries, _, _ = self.since(-1)
+        return entries if count is None else entries[-count:]
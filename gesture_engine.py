@@ -0,0 +1,313 @@
+"""
+Asyncio Gesture Engine
+
+- Runs the finger-sequence polling loop with overlapped I/O: polling the
+  finger server, LLM planning and sequence uploads run as separate tasks.
+- Polling happens at a fixed rate regardless of LLM latency, so the reaction
+  period is no longer poll interval + LLM round-trip.
+- Polls are incremental: the poller keeps a cursor into the server's finger
+  history and only receives (and looks at) entries added since the last poll.
+- Blocking helpers from behavior_logic (requests, OpenAI) run in worker
+  threads; everything that reads or changes the DogPersonality (recording
+  the input, building the prompt, the fallback plan, blending) stays on the
+  event loop thread. Worker threads only make the LLM request, or iterate
+  the LLM stream and hand each goal to the loop.
+- Latest-wins scheduling: snapshots that arrive while a plan is in flight
+  are coalesced into a single pending input, an in-flight plan is discarded
+  when a sufficiently different gesture arrives, and plans older than the
+  staleness deadline never reach upload_sequence.
+- Every plan has a cancel token (threading.Event), set when the plan is
+  preempted or stopped. The streaming worker checks it before handing over
+  each goal, the loop before each blend, and the uploader drops steps of a
+  cancelled plan, so a discarded stream can't interleave its steps with the
+  next plan's. A streamed plan whose step goes stale is cancelled as a whole.
+- stop() / task cancellation shuts all stages down cleanly.
+
+Usage:
+    engine = GestureEngine(DogPersonality(), poll_interval=2.0)
+    asyncio.run(engine.run())
+    print(engine.stats)
+"""
+
+import asyncio
+import threading
+from collections import deque
+
+from behavior_logic import (
+    get_finger_updates,
+    parse_finger_sequence_to_user_input,
+    extract_gesture_features,
+    gestures_differ,
+    cached_goal_request,
+    buildSequence,
+    direct_emotion_blend,
+    to_json_sequence,
+    upload_sequence,
+    append_sequence,
+    goal_prompt,
+    stream_llm_goals,
+)
+from fallback_planner import plan_fallback_goals
+from config import llm_streaming, plan_staleness_deadline, gesture_strength_threshold, finger_window
+from config import llm_fallback_enabled, llm_deadline
+
+
+class GestureEngine:
+    """
+    Concurrent poll -> plan -> upload pipeline for one dog.
+    """
+    def __init__(self, dog, poll_interval=2.0, stream=llm_streaming,
+                 staleness_deadline=plan_staleness_deadline,
+                 strength_threshold=gesture_strength_threshold):
+        self.dog = dog
+        self.poll_interval = poll_interval
+        self.stream = stream
+        self.staleness_deadline = staleness_deadline
+        self.strength_threshold = strength_threshold
+        self.stats = {
+            "snapshots": 0,       # new finger snapshots seen by the poller
+            "coalesced": 0,       # snapshots overwritten before planning started
+            "planned": 0,         # plans started
+            "preempted": 0,       # in-flight plans cancelled by a different gesture
+            "dropped_stale": 0,   # finished plans older than the staleness deadline
+            "uploaded": 0,
+        }
+        self._pending = None      # latest (received_at, user_input, features) not yet planned
+        self._pending_event = None
+        self._in_flight = None    # (features, task, cancel token) of the plan currently running
+        self._uploads = None
+        self._tasks = []
+
+    async def run(self):
+        """
+        Run the poller, planner and uploader until stop() is called or the
+        task is cancelled.
+        """
+        self._pending_event = asyncio.Event()
+        self._uploads = asyncio.Queue()
+        self._tasks = [
+            asyncio.create_task(self._poll_loop(), name="poll"),
+            asyncio.create_task(self._plan_loop(), name="plan"),
+            asyncio.create_task(self._upload_loop(), name="upload"),
+        ]
+        try:
+            await asyncio.gather(*self._tasks)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            for task in self._tasks:
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stop(self):
+        """
+        Cancel all pipeline stages. In-flight worker threads finish in the
+        background but their results are discarded.
+        """
+        for task in self._tasks:
+            task.cancel()
+
+    def _is_stale(self, received_at):
+        return asyncio.get_running_loop().time() - received_at > self.staleness_deadline
+
+    def _submit(self, user_input, features):
+        """Latest-wins hand-off from the poller to the planner."""
+        if self._pending is not None:
+            self.stats["coalesced"] += 1
+        self._pending = (asyncio.get_running_loop().time(), user_input, features)
+        self._pending_event.set()
+
+        # A different gesture makes the in-flight plan pointless
+        if self._in_flight is not None:
+            in_flight_features, task, cancelled = self._in_flight
+            if not task.done() and gestures_differ(in_flight_features, features, self.strength_threshold):
+                cancelled.set()
+                task.cancel()
+                self.stats["preempted"] += 1
+                print("Discarding in-flight plan: gesture changed")
+
+    async def _poll_loop(self):
+        loop = asyncio.get_running_loop()
+        cursor = 0
+        window = deque(maxlen=finger_window)  # most recent entries, describing the current gesture
+        last_snapshot = None                  # only for servers without cursor support
+        while True:
+            started = loop.time()
+            entries, new_cursor, reset = await asyncio.to_thread(get_finger_updates, cursor)
+            if new_cursor is None and entries == last_snapshot:
+                entries = []  # legacy server: the whole history again, unchanged
+            elif new_cursor is None:
+                last_snapshot = entries
+            cursor = new_cursor
+            if reset:
+                window.clear()
+
+            # Only entries added since the last poll count as new activity
+            if entries:
+                window.extend(entries)
+                current_finger_sequence = list(window)
+                print(f"\n--- New user activity detected ---")
+                print(f"New finger entries: {entries}")
+                user_input = parse_finger_sequence_to_user_input(current_finger_sequence)
+                print(f"Parsed user input: {user_input}")
+                self.stats["snapshots"] += 1
+                self._submit(user_input, extract_gesture_features(current_finger_sequence))
+
+            # Fixed-rate polling: subtract the time the poll itself took
+            await asyncio.sleep(max(0.0, self.poll_interval - (loop.time() - started)))
+
+    async def _plan_loop(self):
+        while True:
+            await self._pending_event.wait()
+            self._pending_event.clear()
+            received_at, user_input, features = self._pending
+            self._pending = None
+
+            cancelled = threading.Event()
+            if self.stream:
+                # Streaming mode queues each step for upload as it is parsed
+                planner = self._stream_plan(received_at, user_input, cancelled)
+            else:
+                planner = self._plan(user_input)
+            task = asyncio.create_task(planner)
+            self._in_flight = (features, task, cancelled)
+            self.stats["planned"] += 1
+            try:
+                # wait() (unlike await task) lets preemption cancel the plan
+                # without cancelling this loop
+                await asyncio.wait([task])
+            finally:
+                self._in_flight = None
+                if not task.done():
+                    cancelled.set()
+                    task.cancel()
+            if task.cancelled():
+                continue
+            if task.exception() is not None:
+                print(f"Error generating dog response: {task.exception()}")
+                continue
+            result = task.result()
+
+            if self.stream:
+                print(f"Generated dog response: {result}")
+                continue
+            if self._is_stale(received_at):
+                self.stats["dropped_stale"] += 1
+                print("Dropping stale plan: exceeded staleness deadline")
+                continue
+            dog_response = to_json_sequence(buildSequence(self.dog, result))
+            print(f"Generated dog response: {dog_response}")
+            await self._uploads.put((received_at, dog_response, "replace", cancelled))
+
+    async def _plan(self, user_input):
+        """
+        Record the input and build the prompt on the loop, and send only the
+        LLM request to a worker thread. Falls back to the local planner (on
+        the loop) if the request misses config.llm_deadline or fails; a late
+        LLM plan is discarded.
+        Returns:
+            list: The goals to blend.
+        """
+        self.dog.add_user_input(user_input)
+        # Past the deadline the fallback plan is used, so the request is only useful until then
+        timeout = llm_deadline if llm_fallback_enabled else self.staleness_deadline
+        request = asyncio.to_thread(cached_goal_request, goal_prompt(self.dog), timeout=timeout)
+        if not llm_fallback_enabled:
+            return await request
+        try:
+            return await asyncio.wait_for(request, llm_deadline)
+        except asyncio.TimeoutError:
+            print(f"⏱️  LLM missed the {llm_deadline:.1f}s deadline, using fallback plan")
+        except Exception as e:
+            print(f"⚠️  LLM planning failed ({e}), using fallback plan")
+        return plan_fallback_goals(self.dog, user_input)
+
+    async def _stream_plan(self, received_at, user_input, cancelled):
+        """
+        Stream goals from the LLM in a worker thread and, on the loop, blend
+        each one and queue it for upload (the first replaces the dog's queue,
+        the rest are appended). Falls back to the local planner if the first
+        goal misses config.llm_deadline.
+        Returns:
+            list: The steps queued for upload.
+        """
+        loop = asyncio.get_running_loop()
+        self.dog.add_user_input(user_input)
+        # Read the dog here; the worker thread only talks to the LLM
+        goals = stream_llm_goals(self.dog, prompt=goal_prompt(self.dog), timeout=self.staleness_deadline)
+        handoff = asyncio.Queue()
+        abandoned = threading.Event()  # set when the fallback plan is used instead
+
+        def hand_over(item):
+            try:
+                loop.call_soon_threadsafe(handoff.put_nowait, item)
+            except RuntimeError:
+                pass  # the loop has closed; nobody is waiting
+
+        def stream():
+            try:
+                for goal in goals:
+                    if cancelled.is_set() or abandoned.is_set():
+                        break
+                    hand_over(goal)
+            except Exception as e:
+                hand_over(e)
+            finally:
+                goals.close()
+                hand_over(None)
+
+        worker = asyncio.create_task(asyncio.to_thread(stream))
+        steps = []
+        try:
+            deadline = llm_deadline if llm_fallback_enabled else None
+            try:
+                goal = await asyncio.wait_for(handoff.get(), deadline)
+            except asyncio.TimeoutError:
+                goal = TimeoutError(f"no goal within the {llm_deadline:.1f}s deadline")
+            if isinstance(goal, Exception) or goal is None:
+                if not llm_fallback_enabled:
+                    raise goal or RuntimeError("LLM stream produced no goals")
+                abandoned.set()
+                print(f"⚠️  Streaming LLM plan failed ({goal or 'no goals'}), using fallback plan")
+                steps = to_json_sequence(buildSequence(self.dog, plan_fallback_goals(self.dog, user_input)))
+                await self._uploads.put((received_at, steps, "replace", cancelled))
+                return steps
+            while goal is not None:
+                if isinstance(goal, Exception):
+                    raise goal
+                if cancelled.is_set():
+                    break
+                act, emos = direct_emotion_blend(self.dog, *goal)
+                step = {"action": act, "emotions": emos}
+                await self._uploads.put((received_at, [step], "append" if steps else "replace", cancelled))
+                steps.append(step)
+                print("Streamed step:", step)
+                goal = await handoff.get()
+            return steps
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        finally:
+            if cancelled.is_set() or abandoned.is_set():
+                worker.cancel()
+
+    async def _upload_loop(self):
+        while True:
+            received_at, sequence, mode, cancelled = await self._uploads.get()
+            if cancelled.is_set():
+                print("Dropping step of a cancelled plan")
+                continue
+            # Enforce the deadline again right before the sequence goes out
+            if self._is_stale(received_at):
+                cancelled.set()  # later streamed steps of this plan are stale too
+                self.stats["dropped_stale"] += 1
+                print("Dropping stale plan: exceeded staleness deadline")
+                continue
+            try:
+                if mode == "replace":
+                    await asyncio.to_thread(upload_sequence, sequence)
+                    self.stats["uploaded"] += 1
+                else:
+                    await asyncio.to_thread(append_sequence, sequence)
+            except Exception as e:
+                print(f"Error uploading dog response: {e}")
@@ -0,0 +1,336 @@
+"""
+Shared LLM Goal Parser
+
+- One precompiled validator used by behavior_logic and TextDogCompanion.
+- Accepts the legacy tuple text:
+      [("Jump", [("Happy", 0.5), ("Excitement", 0.4)]), ...]
+  and the JSON structured-output format (see goal_response_format):
+      {"goals": [{"action": "Jump", "emotions": [{"emotion": "Happy", "weight": 0.5}]}]}
+- Tuples are matched with precompiled regular expressions instead of
+  ast.literal_eval, and names are resolved with name -> integer-id dicts.
+- Salvages partial output: complete tuples in a truncated response are kept,
+  and plans longer than max_goals are truncated instead of rejected.
+- parse_coded() returns compact integer-coded goals:
+      [(action_id, ((emotion_id, weight), ...)), ...]
+"""
+
+import json
+import re
+
+import config
+from config import core_sentiments, allowed_actions, actions_short
+
+_NAME = r"""(?:"([^"\\]*)"|'([^'\\]*)')"""
+_NUMBER = r"(-?\d+(?:\.\d*)?(?:[eE][-+]?\d+)?|-?\.\d+)"
+
+# ("Action", [ ...emotion pairs... ])
+GOAL_TUPLE = re.compile(r"\(\s*" + _NAME + r"\s*,\s*\[([^\[\]]*)\]\s*,?\s*\)")
+# ("Emotion", 0.5)
+EMOTION_PAIR = re.compile(r"\(\s*" + _NAME + r"\s*,\s*" + _NUMBER + r"\s*,?\s*\)")
+_PAIR_SEPARATORS = re.compile(r"[\s,]*")
+
+
+class GoalValidator:
+    """
+    Precompiled validator for one set of allowed actions and emotions.
+    """
+    def __init__(self, allowed_actions, allowed_emotions, max_goals=3, max_emotions=10, max_total_weight=1.05):
+        self.actions = tuple(allowed_actions)
+        self.emotions = tuple(allowed_emotions)
+        self.action_ids = {action: i for i, action in enumerate(self.actions)}
+        self.emotion_ids = {emotion: i for i, emotion in enumerate(self.emotions)}
+        self.max_goals = max_goals
+        self.max_emotions = max_emotions
+        self.max_total_weight = max_total_weight  # A small buffer for float math
+
+    def parse(self, content, max_goals=None):
+        """
+        Parse and validate LLM output.
+        Returns:
+            list: [(action, [(emotion, weight), ...]), ...], at most max_goals long.
+        Raises:
+            ValueError: If no valid goal could be recovered.
+        """
+        return [self.decode_goal(goal) for goal in self.parse_coded(content, max_goals)]
+
+    def parse_coded(self, content, max_goals=None):
+        """
+        Parse and validate LLM output into integer-coded goals.
+        Returns:
+            list: [(action_id, ((emotion_id, weight), ...)), ...]
+        Raises:
+            ValueError: If no valid goal could be recovered.
+        """
+        max_goals = self.max_goals if max_goals is None else max_goals
+        content = content.strip()
+        if content.startswith("```"):
+            content = content.split("\n", 1)[-1]
+        if content.endswith("```"):
+            content = content.rsplit("```", 1)[0]
+
+        if content.lstrip().startswith("{"):
+            goals = self._parse_json(content)
+        else:
+            goals = self._parse_tuples(content)
+
+        coded = []
+        for action, pairs in goals:
+            goal = self.code_goal(action, pairs)
+            if goal is not None:
+                coded.append(goal)
+                if len(coded) == max_goals:
+                    break
+        if not coded:
+            raise ValueError("LLM output did not meet valid goal constraints.")
+        return coded
+
+    def code_goal(self, action, pairs):
+        """
+        Validate one goal.
+        Args:
+            action (str): Action name.
+            pairs (list): [(emotion, weight), ...] with numeric weights.
+        Returns:
+            tuple or None: (action_id, ((emotion_id, weight), ...)) if valid, else None.
+        """
+        # Names must be strings: the model can emit lists/objects, which aren't hashable
+        action_id = self.action_ids.get(action) if isinstance(action, str) else None
+        if action_id is None or not 1 <= len(pairs) <= self.max_emotions:
+            return None
+        coded_pairs = []
+        total_weight = 0.0
+        for emotion, weight in pairs:
+            emotion_id = self.emotion_ids.get(emotion) if isinstance(emotion, str) else None
+            if emotion_id is None or isinstance(weight, bool) or not isinstance(weight, (int, float)):
+                return None
+            weight = float(weight)
+            total_weight += weight
+            coded_pairs.append((emotion_id, weight))
+        if not 0.0 <= total_weight <= self.max_total_weight:
+            return None
+        return (action_id, tuple(coded_pairs))
+
+    def validate_item(self, item):
+        """
+        Validate an already-parsed ("Action", [(emotion, weight), ...]) tuple.
+        Returns:
+            tuple or None: (action, [(emotion, float_weight), ...]) if valid, else None.
+        """
+        if not (isinstance(item, tuple) and len(item) == 2):
+            return None
+        action, emotions = item
+        if not isinstance(emotions, list) or not all(isinstance(e, tuple) and len(e) == 2 for e in emotions):
+            return None
+        goal = self.code_goal(action, emotions)
+        return None if goal is None else self.decode_goal(goal)
+
+    def validate_tuple_text(self, text):
+        """
+        Validate the source text of a single goal tuple (used when streaming).
+        Returns:
+            tuple or None: (action, [(emotion, weight), ...]) if valid, else None.
+        """
+        goals = list(self._parse_tuples(text))
+        if len(goals) != 1:
+            return None
+        goal = self.code_goal(*goals[0])
+        return None if goal is None else self.decode_goal(goal)
+
+    def decode_goal(self, goal):
+        """
+        Convert an integer-coded goal back to names.
+        """
+        action_id, pairs = goal
+        return (self.actions[action_id], [(self.emotions[e], w) for e, w in pairs])
+
+    def _parse_tuples(self, content):
+        # Generator, so parse_coded can stop as soon as max_goals are valid
+        for match in GOAL_TUPLE.finditer(content):
+            action = match.group(1) if match.group(1) is not None else match.group(2)
+            inner = match.group(3)
+            pairs = []
+            for pair in EMOTION_PAIR.finditer(inner):
+                emotion = pair.group(1) if pair.group(1) is not None else pair.group(2)
+                pairs.append((emotion, float(pair.group(3))))
+            # Anything but pairs and separators means a malformed emotion list
+            if _PAIR_SEPARATORS.fullmatch(EMOTION_PAIR.sub("", inner)) is None:
+                continue
+            yield (action, pairs)
+
+    def _parse_json(self, content):
+        try:
+            data = json.loads(content)
+        except ValueError:
+            # Truncated JSON: fall back to salvaging complete goal objects
+            return self._salvage_json(content)
+        items = data.get("goals") if isinstance(data, dict) else None
+        if not isinstance(items, list):
+            raise ValueError("LLM output has no list of goals.")
+        goals = []
+        for item in items:
+            goal = self._json_goal(item)
+            if goal is not None:
+                goals.append(goal)
+        return goals
+
+    def _salvage_json(self, content):
+        goals = []
+        decoder = json.JSONDecoder()
+        index = content.find("[")
+        while index != -1:
+            start = content.find("{", index)
+            if start == -1:
+                break
+            try:
+                item, index = decoder.raw_decode(content, start)
+            except ValueError:
+                break
+            goal = self._json_goal(item)
+            if goal is not None:
+                goals.append(goal)
+        return goals
+
+    def _json_goal(self, item):
+        if not isinstance(item, dict) or not isinstance(item.get("emotions"), list):
+            return None
+        pairs = []
+        for emotion in item["emotions"]:
+            if not isinstance(emotion, dict):
+                return None
+            pairs.append((emotion.get("emotion"), emotion.get("weight")))
+        return (item.get("action"), pairs)
+
+
+def goal_response_format(validator):
+    """
+    Build an OpenAI json_schema response_format that constrains the
+    completion to valid actions and emotions.
+    """
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "dog_goals",
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": {
+                    "goals": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "action": {"type": "string", "enum": list(validator.actions)},
+                                "emotions": {
+                                    "type": "array",
+                                    "items": {
+                                        "type": "object",
+                                        "properties": {
+                                            "emotion": {"type": "string", "enum": list(validator.emotions)},
+                                            "weight": {"type": "number"},
+                                        },
+                                        "required": ["emotion", "weight"],
+                                        "additionalProperties": False,
+                                    },
+                                },
+                            },
+                            "required": ["action", "emotions"],
+                            "additionalProperties": False,
+                        },
+                    },
+                },
+                "required": ["goals"],
+                "additionalProperties": False,
+            },
+        },
+    }
+
+
+def structured_output_options(actions):
+    """
+    Extra completion arguments that constrain the response to the JSON goal
+    schema when config.llm_structured_output is enabled.
+    """
+    if not config.llm_structured_output:
+        return {}
+    return {"response_format": goal_response_format(get_validator(actions, core_sentiments))}
+
+
+class StreamingGoalParser:
+    """
+    Incremental parser for streamed LLM output.
+    Feed it text chunks as they arrive; it returns each validated goal as soon
+    as the enclosing ("Action", [...]) tuple is closed.
+    """
+    def __init__(self, allowed_actions, allowed_emotions, max_goals=3):
+        self.validator = get_validator(allowed_actions, allowed_emotions, max_goals)
+        self.max_goals = max_goals
+        self.goal_count = 0
+        self._buffer = []
+        self._depth = 0       # parenthesis depth
+        self._quote = None    # active string delimiter, if any
+        self._escaped = False
+        self._last = None     # last non-space character seen inside parentheses
+
+    @property
+    def done(self):
+        return self.goal_count >= self.max_goals
+
+    def feed(self, text):
+        """
+        Consume a chunk of streamed text.
+        Returns:
+            list: Goals completed by this chunk (possibly empty).
+        """
+        goals = []
+        for ch in text:
+            if self.done:
+                break
+            if self._depth > 0:
+                self._buffer.append(ch)
+            if self._quote:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == self._quote or ch == "\n":
+                    # Names never span lines, so a newline ends a stray quote too
+                    self._quote = None
+                continue
+            if not ch.isspace():
+                last, self._last = self._last, ch
+            if ch in "\"'":
+                # Only where a name can start, so the apostrophe in prose like
+                # "(the dog's happy)" doesn't swallow the rest of the output
+                if self._depth > 0 and last in "([,":
+                    self._quote = ch
+            elif ch == "(":
+                if self._depth == 0:
+                    self._buffer = [ch]
+                self._depth += 1
+            elif ch == ")" and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    goal = self.validator.validate_tuple_text("".join(self._buffer))
+                    if goal is not None:
+                        self.goal_count += 1
+                        goals.append(goal)
+        return goals
+
+
+_validators = {}
+
+
+def get_validator(allowed_actions, allowed_emotions, max_goals=3):
+    """
+    Get a (cached) precompiled validator for these action/emotion lists.
+    """
+    key = (tuple(allowed_actions), tuple(allowed_emotions), max_goals)
+    validator = _validators.get(key)
+    if validator is None:
+        validator = _validators[key] = GoalValidator(allowed_actions, allowed_emotions, max_goals)
+    return validator
+
+
+# Validators for the two action vocabularies used in this project
+gesture_goal_validator = get_validator(allowed_actions, core_sentiments)
+text_goal_validator = get_validator(actions_short, core_sentiments)
@@ -0,0 +1,196 @@
+"""
+Hedged LLM Requests
+
+- Cuts tail latency and parse-failure retries for the planning functions.
+- hedged_call() fires up to k attempts of the same request: either all at
+  once, or a backup attempt after a hedge delay (fixed, or a percentile of
+  observed request latency). An attempt that fails validation immediately
+  triggers the next one.
+- The first attempt that returns a valid result wins; attempts that haven't
+  started are cancelled, and running ones are told to stop through their
+  cancel event (request_fn(cancelled)) so they can close their connection.
+- HedgeStats tracks wins per attempt, wasted attempts and p50/p99 latency.
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import config
+
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="llm-hedge")
+
+
+def _percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class HedgeStats:
+    """
+    Thread-safe counters and latency samples for hedged calls.
+    """
+    def __init__(self, max_samples=1000):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.requests = 0
+        self.failures = 0
+        self.wasted = 0
+        self.wins = {}  # attempt index (0 = primary) -> number of wins
+        self.call_latencies = deque(maxlen=max_samples)
+        self.request_latencies = deque(maxlen=max_samples)
+
+    def record_request(self, latency, ok):
+        with self._lock:
+            self.request_latencies.append(latency)
+            if not ok:
+                self.failures += 1
+
+    def request_percentile(self, fraction, min_samples=20):
+        """
+        Get a percentile of single-request latency, or None until enough samples exist.
+        """
+        with self._lock:
+            if len(self.request_latencies) < min_samples:
+                return None
+            return _percentile(self.request_latencies, fraction)
+
+    def summary(self):
+        """
+        Returns:
+            dict: calls, requests, wins per attempt, wasted/failed attempts and
+                  p50/p99 end-to-end call latency in seconds.
+        """
+        with self._lock:
+            summary = {
+                "calls": self.calls,
+                "requests": self.requests,
+                "wins": dict(self.wins),
+                "wasted": self.wasted,
+                "failures": self.failures,
+                "p50": None,
+                "p99": None,
+            }
+            if self.call_latencies:
+                summary["p50"] = _percentile(self.call_latencies, 0.50)
+                summary["p99"] = _percentile(self.call_latencies, 0.99)
+            return summary
+
+
+hedge_stats = HedgeStats()
+
+
+class AttemptCancelled(Exception):
+    """
+    Raised by a request_fn that stopped because another attempt already won.
+    """
+
+
+def _timed(request_fn, cancelled, stats):
+    started = time.perf_counter()
+    try:
+        result = request_fn(cancelled)
+    except AttemptCancelled:
+        # Stopped by the winner: neither a latency sample nor a failure
+        raise
+    except Exception:
+        stats.record_request(time.perf_counter() - started, ok=False)
+        raise
+    stats.record_request(time.perf_counter() - started, ok=True)
+    return result
+
+
+def _hedge_delay(hedge_delay, stats):
+    if hedge_delay is not None:
+        return hedge_delay
+    observed = stats.request_percentile(config.llm_hedge_percentile)
+    return observed if observed is not None else config.llm_hedge_default_delay
+
+
+def hedged_call(request_fn, k=None, hedge_delay=None, concurrent=None, stats=None):
+    """
+    Run request_fn with hedging and return the first valid result.
+    Args:
+        request_fn (callable): request_fn(cancelled) performs one completion +
+                               validation and raises on failure. cancelled is a
+                               threading.Event set once another attempt has won;
+                               the attempt should then close its response and
+                               raise AttemptCancelled.
+        k (int): Maximum attempts (config.llm_hedge_k). 1 disables hedging.
+        hedge_delay (float): Seconds before firing a backup attempt. None uses the
+                             config.llm_hedge_percentile of observed request latency
+                             (config.llm_hedge_delay if set).
+        concurrent (bool): Fire all k attempts at once instead of staggering them.
+        stats (HedgeStats): Where to record statistics (module-level hedge_stats).
+    Returns:
+        The result of the winning attempt.
+    Raises:
+        The last attempt's exception if every attempt fails.
+    """
+    k = config.llm_hedge_k if k is None else k
+    hedge_delay = config.llm_hedge_delay if hedge_delay is None else hedge_delay
+    concurrent = config.llm_hedge_concurrent if concurrent is None else concurrent
+    stats = stats or hedge_stats
+
+    started = time.perf_counter()
+    with stats._lock:
+        stats.calls += 1
+        if k <= 1:
+            stats.requests += 1
+    if k <= 1:
+        # Hedging disabled: run inline, but keep the statistics
+        try:
+            result = _timed(request_fn, threading.Event(), stats)
+        finally:
+            with stats._lock:
+                stats.call_latencies.append(time.perf_counter() - started)
+        with stats._lock:
+            stats.wins[0] = stats.wins.get(0, 0) + 1
+        return result
+
+    attempts = {}  # future -> attempt index
+    failed = set()
+    cancelled = {}  # future -> cancel event
+
+    def launch():
+        event = threading.Event()
+        future = _executor.submit(_timed, request_fn, event, stats)
+        attempts[future] = len(attempts)
+        cancelled[future] = event
+        with stats._lock:
+            stats.requests += 1
+
+    launch()
+    if concurrent:
+        while len(attempts) < k:
+            launch()
+
+    last_error = None
+    while True:
+        pending = [f for f in attempts if f not in failed]
+        timeout = None if len(attempts) >= k else _hedge_delay(hedge_delay, stats)
+        done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        if not done:
+            launch()  # primary is slow: hedge
+            continue
+        for future in done:
+            if future.exception() is None:
+                index = attempts[future]
+                others = [f for f in attempts if f is not future and f not in failed]
+                for other in others:
+                    cancelled[other].set()
+                wasted = sum(1 for f in others if not f.cancel())
+                with stats._lock:
+                    stats.wins[index] = stats.wins.get(index, 0) + 1
+                    stats.wasted += wasted
+                    stats.call_latencies.append(time.perf_counter() - started)
+                return future.result()
+            failed.add(future)
+            last_error = future.exception()
+            if len(attempts) < k:
+                launch()  # failed validation: retry right away
+        if len(failed) == len(attempts):
+            with stats._lock:
+                stats.call_latencies.append(time.perf_counter() - started)
+            raise last_error
@@ -0,0 +1,162 @@
+"""
+Bounded User Input History
+
+- The most recent inputs live in a fixed-size ring, which is all prompts ever
+  read (the last 1-3 entries), so a dog's memory use stays constant however
+  long the session runs.
+- Inputs pushed out of the ring are folded into a rolling summary: how many
+  there were, counts of gestures (keypoint + direction), events and text
+  keywords, and the running average and dominant-emotion counts of the dog's
+  emotions when they arrived. The count tables are pruned to their most
+  common keys, so the summary stays bounded too.
+- Optionally, evicted inputs are also appended to a JSON-lines archive on
+  disk for offline analysis (config.input_history_archive).
+- InputHistory reads like the list it replaces: len(), iteration, indexing
+  and slicing (history[-3:]) cover the buffered window, oldest first.
+"""
+
+import json
+import re
+from collections import Counter
+
+from config import input_history_size, input_history_summary_keys, input_history_archive
+
+GESTURE = re.compile(r"User hand gesture: (.+?) keypoint, moving (\w+)")
+WORD = re.compile(r"[a-z']{3,}")
+STOP_WORDS = frozenset("the and you are was for that this with have what your not but can how its it's".split())
+
+
+class InputSummary:
+    """
+    Compact rolling summary of the inputs that left the ring.
+    """
+    def __init__(self, core_emotions, max_keys=input_history_summary_keys):
+        self.core_emotions = core_emotions
+        self.max_keys = max_keys
+        self.count = 0
+        self.gestures = Counter()     # "keypoint moving direction" -> inputs
+        self.events = Counter()       # event name (dict inputs) -> inputs
+        self.keywords = Counter()     # text word -> inputs it appeared in
+        self.dominant = Counter()     # dominant emotion when the input arrived -> inputs
+        self.emotion_mean = [0.0] * len(core_emotions)  # average emotion weights when inputs arrived
+
+    def add(self, user_input, weights):
+        """Fold one input, with the dog's emotion weights when it arrived, into the summary"""
+        self.count += 1
+        if isinstance(user_input, dict):
+            self._count(self.events, [str(user_input.get("event", "unknown"))])
+        else:
+            text = str(user_input)
+            gesture = GESTURE.match(text)
+            if gesture:
+                self._count(self.gestures, [f"{gesture.group(1)} moving {gesture.group(2)}"])
+            else:
+                self._count(self.keywords, set(WORD.findall(text.lower())) - STOP_WORDS)
+        if weights is not None:
+            self.dominant[self.core_emotions[weights.index(max(weights))]] += 1
+            n = self.count
+            self.emotion_mean[:] = [mean + (w - mean) / n for mean, w in zip(self.emotion_mean, weights)]
+
+    def _count(self, counter, keys):
+        counter.update(keys)
+        if len(counter) > 2 * self.max_keys:
+            # Prune in batches so the cost is amortized; rare keys are dropped
+            kept = counter.most_common(self.max_keys)
+            counter.clear()
+            counter.update(dict(kept))
+
+    def to_dict(self, top=5):
+        """
+        Returns:
+            dict: Input count, the top gestures/events/keywords/dominant
+                  emotions, and the average emotion vector.
+        """
+        return {
+            "count": self.count,
+            "gestures": self.gestures.most_common(top),
+            "events": self.events.most_common(top),
+            "keywords": self.keywords.most_common(top),
+            "dominant_emotions": self.dominant.most_common(top),
+            "emotion_mean": dict(zip(self.core_emotions, self.emotion_mean)),
+        }
+
+
+class InputHistory:
+    """
+    Ring buffer of recent user inputs with a rolling summary (and optional
+    disk archive) of the older ones.
+    """
+    def __init__(self, core_emotions, capacity=input_history_size, archive_path=input_history_archive):
+        self.capacity = capacity
+        self.summary = InputSummary(core_emotions)
+        self.archive_path = archive_path
+        self._entries = [None] * capacity
+        self._weights = [None] * capacity  # emotion weights when each entry arrived
+        self._total = 0      # inputs ever added; the newest is at (_total - 1) % capacity
+        self._archive = None
+
+    def append(self, user_input, weights=None):
+        """
+        Add an input; the oldest buffered one is summarized (and archived) once the ring is full.
+        Args:
+            user_input (dict or str): The user input event.
+            weights (list): The dog's emotion weights, in core_emotions order (optional).
+        """
+        slot = self._total % self.capacity
+        if self._total >= self.capacity:
+            self._evict(self._entries[slot], self._weights[slot])
+        self._entries[slot] = user_input
+        self._weights[slot] = None if weights is None else [float(w) for w in weights]
+        self._total += 1
+
+    def _evict(self, user_input, weights):
+        self.summary.add(user_input, weights)
+        if self.archive_path:
+            if self._archive is None:
+                self._archive = open(self.archive_path, "a", encoding="utf-8")
+            record = {"input": user_input}
+            if weights is not None:
+                record["emotions"] = dict(zip(self.summary.core_emotions, weights))
+            self._archive.write(json.dumps(record, default=str) + "\n")
+
+    @property
+    def total(self):
+        """Inputs ever added, including summarized ones"""
+        return self._total
+
+    def recent(self, count=None):
+        """The last count buffered inputs (all by default), oldest first"""
+        size = len(self)
+        count = size if count is None else min(count, size)
+        start = self._total - count
+        return [self._entries[n % self.capacity] for n in range(start, self._total)]
+
+    def __len__(self):
+        return min(self._total, self.capacity)
+
+    def __iter__(self):
+        return iter(self.recent())
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            if index.stop is None and index.step is None and index.start is not None and index.start < 0:
+                return self.recent(-index.start)  # history[-n:], what prompts ask for
+            return self.recent()[index]
+        size = len(self)
+        if not -size <= index < size:
+            raise IndexError("input history index out of range")
+        return self._entries[(self._total - size + index % size) % self.capacity]
+
+    def __repr__(self):
+        return f"InputHistory({self.recent()!r}, total={self._total})"
+
+    def flush(self):
+        """Push archived inputs to disk"""
+        if self._archive is not None:
+            self._archive.flush()
+
+    def close(self):
+        """Close the archive file (reopened on the next eviction)"""
+        if self._archive is not None:
+            self._archive.close()
+            self._archive = None
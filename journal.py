@@ -0,0 +1,293 @@
+"""
+Durable Sequence Journal
+
+- Append-only log of every change to the in-memory sequence queues and finger
+  history, so a restarted action server (--store journal) comes back with
+  every dog's queue and the recent finger entries.
+- Records are JSON framed with their length and CRC32. They are written as
+  they happen and fsync'd in batches by a background thread every
+  journal_fsync_interval seconds, so a crash loses at most that window; a
+  torn last record fails its CRC and is dropped on replay.
+- Compaction: once the log passes journal_compact_bytes, writers pause just
+  long enough to copy the state and switch to a new log file. The snapshot
+  is written and the older logs deleted in the background, so the journal
+  stays bounded.
+- On start the snapshot is loaded and only the logs written after it are
+  replayed, read through mmap.
+
+Files in the journal directory:
+    snapshot.json          {"generation": g, "sequences": ..., "finger": ...}
+    journal-<g>.log        changes made after the snapshot of generation g
+"""
+
+import json
+import mmap
+import os
+import re
+import struct
+import threading
+import zlib
+
+from config import default_dog_id, journal_fsync_interval, journal_compact_bytes
+from sequence_store import SequenceStore, SequenceTooLong
+from finger_history import FingerHistory
+
+FRAME = struct.Struct("<II")  # payload length, CRC32 of the payload
+SNAPSHOT = "snapshot.json"
+LOG_NAME = re.compile(r"^journal-(\d+)\.log$")
+
+
+def read_records(path):
+    """
+    Yield the records of one log file, stopping at the first torn or
+    corrupt record.
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            offset = 0
+            while offset + FRAME.size <= size:
+                length, crc = FRAME.unpack_from(data, offset)
+                start, end = offset + FRAME.size, offset + FRAME.size + length
+                if end > size or zlib.crc32(data[start:end]) != crc:
+                    print(f"⚠️  Journal {os.path.basename(path)}: dropping torn record at byte {offset}")
+                    return
+                yield json.loads(data[start:end])
+                offset = end
+
+
+class JournaledSequenceStore(SequenceStore):
+    """
+    SequenceStore that writes each change to a Journal (once attached).
+    Records are written under the store lock, so the log order is the order
+    the changes were applied in.
+    """
+    journal = None
+
+    def _log(self, record):
+        if self.journal is not None:
+            self.journal.write(record)
+
+    def replace(self, sequence, dog_id=default_dog_id):
+        with self._lock:
+            version = super().replace(sequence, dog_id)
+            self._log({"op": "replace", "dog_id": dog_id, "sequence": sequence})
+            return version
+
+    def enqueue(self, sequence, dog_id=default_dog_id):
+        with self._lock:
+            version = super().enqueue(sequence, dog_id)
+            self._log({"op": "enqueue", "dog_id": dog_id, "sequence": sequence})
+            return version
+
+    def append(self, steps, dog_id=default_dog_id):
+        with self._lock:
+            version = super().append(steps, dog_id)
+            self._log({"op": "append", "dog_id": dog_id, "sequence": steps})
+            return version
+
+    def clear(self, dog_id=default_dog_id):
+        with self._lock:
+            version = super().clear(dog_id)
+            self._log({"op": "clear", "dog_id": dog_id})
+            return version
+
+    def dequeue(self, dog_id=default_dog_id):
+        with self._lock:
+            sequence, remaining = super().dequeue(dog_id)
+            if sequence is not None:
+                self._log({"op": "dequeue", "dog_id": dog_id})
+            return sequence, remaining
+
+
+class JournaledFingerHistory(FingerHistory):
+    """FingerHistory that writes each batch of added entries to a Journal."""
+    journal = None
+
+    def add(self, entries):
+        with self._lock:
+            latest = super().add(entries)
+            if self.journal is not None:
+                self.journal.write({"op": "finger", "entries": entries})
+            return latest
+
+
+class Journal:
+    """
+    Append-only, fsync-batched log of the changes to a JournaledSequenceStore
+    and a JournaledFingerHistory, with snapshot compaction.
+    """
+    def __init__(self, directory, fsync_interval=journal_fsync_interval, compact_bytes=journal_compact_bytes):
+        self.directory = directory
+        self.fsync_interval = fsync_interval
+        self.compact_bytes = compact_bytes
+        self.sequences = None
+        self.finger_history = None
+        self.generation = 0
+        self._file = None
+        self._size = 0
+        self._dirty = False
+        self._lock = threading.Lock()            # file writes and log switches
+        self._compact_lock = threading.Lock()    # one compaction at a time
+        self._compact_wanted = threading.Event()
+        self._stopped = threading.Event()
+        self._threads = []
+        os.makedirs(directory, exist_ok=True)
+
+    def _log_path(self, generation):
+        return os.path.join(self.directory, f"journal-{generation:08d}.log")
+
+    def _log_generations(self):
+        generations = []
+        for name in os.listdir(self.directory):
+            match = LOG_NAME.match(name)
+            if match:
+                generations.append(int(match.group(1)))
+        return sorted(generations)
+
+    def attach(self, sequences, finger_history):
+        """
+        Rebuild the store and history from the snapshot plus the logs after it,
+        then log every later change to them.
+        Returns:
+            int: Number of log records replayed.
+        """
+        self.sequences, self.finger_history = sequences, finger_history
+        snapshot_generation = 0
+        path = os.path.join(self.directory, SNAPSHOT)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                snapshot = json.load(f)
+            snapshot_generation = snapshot["generation"]
+            sequences.restore(snapshot["sequences"])
+            finger_history.restore(snapshot["finger"])
+
+        replayed = 0
+        generations = [g for g in self._log_generations() if g >= snapshot_generation]
+        for generation in generations:
+            for record in read_records(self._log_path(generation)):
+                self._apply(record)
+                replayed += 1
+
+        # Start a fresh log and fold the replayed ones into a new snapshot
+        self.generation = max(generations + [snapshot_generation])
+        sequences.journal = finger_history.journal = self
+        self.compact()
+
+        for target in (self._flush_loop, self._compact_loop):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return replayed
+
+    def _apply(self, record):
+        op = record["op"]
+        if op == "finger":
+            self.finger_history.add(record["entries"])
+        elif op == "replace":
+            self.sequences.replace(record["sequence"], record["dog_id"])
+        elif op == "enqueue":
+            self.sequences.enqueue(record["sequence"], record["dog_id"])
+        elif op == "append":
+            try:
+                self.sequences.append(record["sequence"], record["dog_id"])
+            except SequenceTooLong as e:
+                # Logged before appends were capped; the dog keeps what it had
+                print(f"⚠️  Journal: skipping append ({e})")
+        elif op == "clear":
+            self.sequences.clear(record["dog_id"])
+        elif op == "dequeue":
+            self.sequences.dequeue(record["dog_id"])
+
+    def write(self, record):
+        """Append one record. Callers hold the lock of the structure they changed."""
+        payload = json.dumps(record, separators=(",", ":")).encode("utf-8")
+        with self._lock:
+            self._file.write(FRAME.pack(len(payload), zlib.crc32(payload)) + payload)
+            self._size += FRAME.size + len(payload)
+            if self._stopped.is_set():
+                # Closed: no flusher thread any more, so make each write durable
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            else:
+                self._dirty = True
+            if self._size >= self.compact_bytes:
+                self._compact_wanted.set()
+
+    def sync(self):
+        """Flush buffered records and fsync them"""
+        with self._lock:
+            if not self._dirty:
+                return
+            self._file.flush()
+            self._dirty = False
+            file = self._file
+        try:
+            os.fsync(file.fileno())
+        except (OSError, ValueError):
+            pass  # the log was switched and closed meanwhile; closing synced it
+
+    def _flush_loop(self):
+        while not self._stopped.wait(self.fsync_interval):
+            self.sync()
+
+    def _compact_loop(self):
+        while not self._stopped.is_set():
+            if self._compact_wanted.wait(timeout=1.0):
+                self._compact_wanted.clear()
+                if not self._stopped.is_set():
+                    self.compact()
+
+    def compact(self):
+        """
+        Snapshot the current state, continue in a new log file and delete the
+        logs the snapshot covers.
+        """
+        with self._compact_lock:
+            # Pause writers (they hold the store/history lock while writing)
+            # so the copied state matches the point where the new log starts
+            with self.sequences._lock, self.finger_history._lock:
+                state = {"sequences": self.sequences.snapshot(), "finger": self.finger_history.snapshot()}
+                with self._lock:
+                    old = self._file
+                    self.generation += 1
+                    self._file = open(self._log_path(self.generation), "ab")
+                    self._size = 0
+                    self._dirty = False
+            if old is not None:
+                old.flush()
+                os.fsync(old.fileno())
+                old.close()
+
+            state["generation"] = self.generation
+            path = os.path.join(self.directory, SNAPSHOT)
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(state, f, separators=(",", ":"))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(path + ".tmp", path)
+            self._fsync_directory()
+            for generation in self._log_generations():
+                if generation < self.generation:
+                    os.remove(self._log_path(generation))
+
+    def _fsync_directory(self):
+        if os.name == "nt":
+            return  # directories can't be opened for fsync on Windows
+        fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def close(self):
+        """Stop the background threads and fsync; later writes are synced one by one"""
+        self._stopped.set()
+        self._compact_wanted.set()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        with self._lock:
+            self._file.flush()
+            os.fsync(self._file.fileno())
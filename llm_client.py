@@ -0,0 +1,152 @@
+"""
+Shared LLM Client Provider
+
+- One process-wide OpenAI client reused by every planning entry point.
+- Connections to the LLM endpoint are pooled and kept alive between calls,
+  so a dog reaction no longer pays for a new connection/TLS handshake.
+- Pool size and timeouts come from config.py and can be overridden at runtime.
+- Health/reset hooks let callers drop a broken client after connection errors.
+
+Usage:
+    from llm_client import get_llm_client, report_llm_failure
+
+    client = get_llm_client()
+    try:
+        response = client.chat.completions.create(...)
+    except Exception as e:
+        report_llm_failure(e)
+        raise
+"""
+
+import os
+import threading
+import time
+
+import httpx
+import openai
+
+import config
+
+_client = None
+_client_lock = threading.Lock()
+
+# Runtime overrides applied on top of config.py (see configure_llm_client)
+_overrides = {}
+
+_health = {
+    "created_at": None,
+    "clients_created": 0,
+    "resets": 0,
+    "failures": 0,
+    "last_error": None,
+}
+
+
+def _setting(name):
+    return _overrides.get(name, getattr(config, name))
+
+
+def _create_client():
+    """Build a new OpenAI client backed by a keep-alive HTTP connection pool."""
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise RuntimeError("OPENAI_API_KEY environment variable not set.")
+
+    http_client = httpx.Client(
+        limits=httpx.Limits(
+            max_connections=_setting("llm_pool_size"),
+            max_keepalive_connections=_setting("llm_keepalive_connections"),
+            keepalive_expiry=_setting("llm_keepalive_expiry"),
+        ),
+        timeout=httpx.Timeout(_setting("llm_timeout"), connect=_setting("llm_connect_timeout")),
+    )
+    return openai.OpenAI(
+        api_key=api_key,
+        base_url=os.getenv("OPENAI_BASE_URL") or None,
+        http_client=http_client,
+        max_retries=_setting("llm_max_retries"),
+    )
+
+
+def get_llm_client():
+    """
+    Get the shared OpenAI client, creating it on first use.
+    Returns:
+        openai.OpenAI: The process-wide client.
+    """
+    global _client
+    client = _client
+    if client is not None:
+        return client
+    with _client_lock:
+        if _client is None:
+            _client = _create_client()
+            _health["created_at"] = time.time()
+            _health["clients_created"] += 1
+        return _client
+
+
+def reset_llm_client():
+    """
+    Close the shared client and its connection pool.
+    The next call to get_llm_client() builds a fresh one.
+    """
+    global _client
+    with _client_lock:
+        client, _client = _client, None
+        if client is not None:
+            _health["resets"] += 1
+    if client is not None:
+        try:
+            client.close()
+        except Exception:
+            pass
+
+
+def configure_llm_client(**settings):
+    """
+    Override client settings at runtime (e.g. llm_pool_size=20, llm_timeout=10.0)
+    and reset the shared client so the new settings take effect.
+    Args:
+        **settings: Any of the llm_* settings defined in config.py.
+    """
+    for name in settings:
+        if not name.startswith("llm_") or not hasattr(config, name):
+            raise ValueError(f"Unknown LLM client setting: {name}")
+    _overrides.update(settings)
+    reset_llm_client()
+
+
+def report_llm_failure(error):
+    """
+    Record a failed LLM call. Connection-level errors reset the shared client
+    so a stale or broken pool is not reused for the next reaction.
+    Args:
+        error (Exception): The exception raised by the LLM call.
+    """
+    _health["failures"] += 1
+    _health["last_error"] = repr(error)
+    if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError, httpx.TransportError)):
+        reset_llm_client()
+
+
+def llm_client_health(probe=False):
+    """
+    Get health information for the shared client.
+    Args:
+        probe (bool): If True, make a lightweight request (list models) to check
+                      the endpoint is reachable. A failed probe resets the client.
+    Returns:
+        dict: Health counters, plus "healthy" when probe=True.
+    """
+    status = dict(_health)
+    status["initialized"] = _client is not None
+    if probe:
+        try:
+            get_llm_client().models.list()
+            status["healthy"] = True
+        except Exception as e:
+            report_llm_failure(e)
+            status["healthy"] = False
+            status["last_error"] = repr(e)
+    return status
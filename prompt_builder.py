@@ -0,0 +1,177 @@
+"""
+Prompt Builder for LLM Goal Planning
+
+- Byte-stable system prompt per personality, rendered once and cached, so the
+  provider's prompt-prefix cache can be reused across calls.
+- The varying part (latest input and context) always goes last, after the
+  fixed instructions.
+- Recent user inputs are trimmed to a token budget, newest first.
+- max_tokens is sized from config.max_goals instead of a flat 512.
+- Token usage (prompt, cached prompt, completion) and latency are recorded
+  per call in prompt_stats.
+"""
+
+import threading
+
+import config
+from config import rules
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("o200k_base")
+except Exception:  # optional dependency; fall back to a length heuristic
+    _encoding = None
+
+_system_prompts = {}
+
+GESTURE_INSTRUCTIONS = """I need you to react in an excited and very unique manner utilizing different commands and possibilities DO NOT JUST USE SIT AND WALK OR ELSE I WILL BEAT YOU"""
+
+TEXT_INSTRUCTIONS = """I need to react as a dog would to this human communication. Consider:
+- The tone and emotion in their words
+- What they might want me to do
+- How I should respond based on my personality
+- Whether they're being friendly, commanding, playful, or emotional
+
+React in an authentic dog-like manner with varied and creative actions!"""
+
+
+def estimate_tokens(text):
+    """
+    Count (or estimate, without tiktoken) the tokens in a piece of text.
+    """
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return len(text) // 4 + 1
+
+
+def system_prompt(personality):
+    """
+    Get the cached system prompt for a personality. The same personality
+    always yields the identical string.
+    """
+    prompt = _system_prompts.get(personality)
+    if prompt is None:
+        prompt = _system_prompts[personality] = f"""
+You are a dog with the following personality: {personality}
+
+{rules}
+"""
+    return prompt
+
+
+def trim_context(user_inputs, max_items, token_budget=None):
+    """
+    Keep the most recent inputs that fit in the token budget.
+    Args:
+        user_inputs (list or InputHistory): Input history, oldest first.
+        max_items (int): Maximum number of inputs to keep.
+        token_budget (int): Token budget for the kept inputs (config.prompt_context_token_budget).
+    Returns:
+        list: The kept inputs, oldest first.
+    """
+    token_budget = config.prompt_context_token_budget if token_budget is None else token_budget
+    kept = []
+    used = 0
+    for user_input in reversed(user_inputs[-max_items:]):
+        cost = estimate_tokens(str(user_input))
+        if kept and used + cost > token_budget:
+            break
+        kept.append(user_input)
+        used += cost
+    kept.reverse()
+    return kept
+
+
+def goal_max_tokens(max_goals=None):
+    """
+    Completion budget for a plan of up to max_goals goals.
+    """
+    max_goals = config.max_goals if max_goals is None else max_goals
+    per_goal = config.prompt_tokens_per_goal
+    if config.llm_structured_output:
+        per_goal *= 2  # JSON keys roughly double the size of each goal
+    return max_goals * per_goal + config.prompt_token_overhead
+
+
+def build_gesture_messages(dog_personality):
+    """
+    Chat messages asking the LLM to react to the latest (gesture) input.
+    """
+    recent_inputs = trim_context(dog_personality.get_user_inputs(), 1)
+    return [
+        {"role": "system", "content": system_prompt(dog_personality.get_personality())},
+        {"role": "user", "content": f"""{GESTURE_INSTRUCTIONS}
+
+I am doing this currently {recent_inputs}"""},
+    ]
+
+
+def build_text_messages(dog_personality, user_text):
+    """
+    Chat messages asking the LLM to react to written text input.
+    """
+    recent_inputs = trim_context(dog_personality.get_user_inputs(), 3)
+    return [
+        {"role": "system", "content": system_prompt(dog_personality.get_personality())},
+        {"role": "user", "content": f"""{TEXT_INSTRUCTIONS}
+
+Recent conversation context: {recent_inputs}
+
+The human said to me: "{user_text}\""""},
+    ]
+
+
+class PromptStats:
+    """
+    Per-call token usage and latency for LLM planning requests.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.cached_prompt_tokens = 0
+        self.completion_tokens = 0
+        self.latency = 0.0
+        self.last_call = None
+
+    def record(self, usage, latency):
+        """
+        Record the usage object of a completion (may be None) and its latency.
+        """
+        prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+        completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached_tokens = getattr(details, "cached_tokens", 0) or 0
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += prompt_tokens
+            self.cached_prompt_tokens += cached_tokens
+            self.completion_tokens += completion_tokens
+            self.latency += latency
+            self.last_call = {
+                "prompt_tokens": prompt_tokens,
+                "cached_prompt_tokens": cached_tokens,
+                "completion_tokens": completion_tokens,
+                "latency": latency,
+            }
+
+    def summary(self):
+        """
+        Returns:
+            dict: Totals plus per-call averages.
+        """
+        with self._lock:
+            calls = self.calls or 1
+            return {
+                "calls": self.calls,
+                "prompt_tokens": self.prompt_tokens,
+                "cached_prompt_tokens": self.cached_prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "avg_prompt_tokens": self.prompt_tokens / calls,
+                "avg_completion_tokens": self.completion_tokens / calls,
+                "avg_latency": self.latency / calls,
+                "last_call": self.last_call,
+            }
+
+
+prompt_stats = PromptStats()
@@ -0,0 +1,78 @@
+"""
+Per-Client Token Buckets
+
+- Each client gets a bucket of `burst` tokens that refills at `rate` tokens
+  per second; an upload takes one token (a batch one per item).
+- A client with too few tokens is told how long to wait, which the server
+  sends back as Retry-After, so a runaway producer slows down without
+  starving the readers.
+- The client key (X-Client-Id) is chosen by the client, so it is advisory:
+  it splits an address's allowance between its producers, but every client
+  at one address also draws from a shared address bucket that is
+  ids_per_address times larger. Sending a fresh id per request therefore
+  can't buy more than that address's share.
+- At most max_clients buckets of each kind are kept; the least recently
+  seen is dropped first (it comes back with a full bucket).
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from config import upload_rate_limit, upload_burst, rate_limit_max_clients, rate_limit_ids_per_address
+
+
+class TokenBucketLimiter:
+    """
+    Thread-safe token buckets keyed by client, within per-address buckets.
+    """
+    def __init__(self, rate=upload_rate_limit, burst=upload_burst, max_clients=rate_limit_max_clients,
+                 ids_per_address=rate_limit_ids_per_address):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self.ids_per_address = ids_per_address
+        self._buckets = OrderedDict()    # client -> [tokens, monotonic time of last refill]
+        self._addresses = OrderedDict()  # address -> [tokens, monotonic time of last refill]
+        self._lock = threading.Lock()
+
+    def _bucket(self, buckets, key, rate, burst, now):
+        # Caller holds self._lock; returns the key's bucket, refilled up to now
+        bucket = buckets.get(key)
+        if bucket is None:
+            if len(buckets) >= self.max_clients:
+                buckets.popitem(last=False)
+            bucket = buckets[key] = [float(burst), now]
+        else:
+            buckets.move_to_end(key)
+            bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+        return bucket
+
+    def acquire(self, client, cost=1, address=None):
+        """
+        Take cost tokens from the client's bucket (and its address's bucket,
+        if given) if both have them.
+        Args:
+            client: Client key, e.g. the address plus the X-Client-Id header.
+            cost (int): Tokens to take.
+            address: The client's network address, or None for no address limit.
+        Returns:
+            float: 0.0 if admitted, else seconds until enough tokens are available.
+        """
+        if self.rate <= 0:
+            return 0.0
+        cost = min(cost, self.burst)  # a batch bigger than the burst could never pass
+        now = time.monotonic()
+        with self._lock:
+            buckets = [(self._bucket(self._buckets, client, self.rate, self.burst, now), self.rate)]
+            if address is not None:
+                share = self.ids_per_address
+                buckets.append((self._bucket(self._addresses, address, self.rate * share, self.burst * share, now),
+                                self.rate * share))
+            wait = max((cost - bucket[0]) / rate for bucket, rate in buckets)
+            if wait > 0:
+                return wait
+            for bucket, _ in buckets:
+                bucket[0] -= cost
+            return 0.0
@@ -0,0 +1,219 @@
+"""
+Reaction Cache for LLM Goal Plans
+
+- Caches validated goal lists so repeated inputs ("Good boy!", the same hand
+  gesture) don't cost a full LLM call every time.
+- Keyed on the personality string, the normalized user input and a quantized
+  bucket of the dog's current emotion vector.
+- Bounded LRU size with TTL expiry, plus an optional SQLite file so cached
+  reactions survive restarts (capped at the same size, most recently stored
+  kept; expired rows are deleted when the file is opened).
+- Keeps several plan variants per key and picks one at random so the dog
+  does not become repetitive.
+"""
+
+import hashlib
+import json
+import random
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import config
+from config import core_sentiments
+
+
+def normalize_input(user_input):
+    """
+    Normalize a user input (text, gesture description or event dict) so that
+    trivially different spellings share a cache entry.
+    """
+    if not isinstance(user_input, str):
+        user_input = json.dumps(user_input, sort_keys=True, default=str)
+    return " ".join(re.findall(r"[\w.]+", user_input.lower()))
+
+
+def quantize_emotions(emotion_vector, buckets=4):
+    """
+    Map an emotion vector onto a coarse bucket string, one digit per core sentiment.
+    """
+    digits = []
+    for emotion in core_sentiments:
+        weight = emotion_vector.get(emotion, 0.0)
+        digits.append(str(min(buckets - 1, max(0, int(weight * buckets)))))
+    return "".join(digits)
+
+
+class ReactionCache:
+    """
+    LRU + TTL cache of goal plans, with several variants per key and an
+    optional on-disk backing store.
+    """
+    def __init__(self, max_size=256, ttl=1800.0, max_variants=3, explore_probability=0.3,
+                 emotion_buckets=4, path=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.max_variants = max_variants
+        self.explore_probability = explore_probability
+        self.emotion_buckets = emotion_buckets
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> (stored_at, [variants])
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS reactions "
+                "(key TEXT PRIMARY KEY, stored_at REAL, variants TEXT)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS reactions_stored_at ON reactions (stored_at)")
+            # Drop what expired while we were down, and anything over a since-lowered max_size
+            self._db.execute("DELETE FROM reactions WHERE stored_at < ?", (time.time() - ttl,))
+            self._trim_disk()
+            self._db.commit()
+
+    def make_key(self, personality, user_input, emotion_vector, kind="gesture"):
+        """
+        Build the cache key for a planning request.
+        Args:
+            personality (str): The dog's personality description.
+            user_input: The input being reacted to (str, dict or list of recent inputs).
+            emotion_vector (dict): The dog's current emotion vector.
+            kind (str): Planner namespace, so plans validated against different
+                        action lists never mix.
+        Returns:
+            str: A stable hex digest.
+        """
+        raw = "\x1f".join([
+            kind,
+            personality,
+            normalize_input(user_input),
+            quantize_emotions(emotion_vector, self.emotion_buckets),
+        ])
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """
+        Look up a cached plan.
+        Returns:
+            list or None: One of the cached goal-list variants, or None on a miss.
+            While fewer than max_variants are stored, a hit is occasionally
+            reported as a miss so a fresh variant gets generated.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._load(key)
+            if entry is not None and now - entry[0] > self.ttl:
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            variants = entry[1]
+            if len(variants) < self.max_variants and random.random() < self.explore_probability:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return random.choice(variants)
+
+    def put(self, key, goals):
+        """
+        Store a validated goal list as a variant for this key.
+        """
+        goals = [(action, [tuple(e) for e in emotions]) for action, emotions in goals]
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            variants = [] if entry is None or now - entry[0] > self.ttl else entry[1]
+            if goals not in variants:
+                variants.append(goals)
+            variants = variants[-self.max_variants:]
+            self._entries[key] = (now, variants)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO reactions (key, stored_at, variants) VALUES (?, ?, ?)",
+                    (key, now, json.dumps(variants)),
+                )
+                self._trim_disk()
+                self._db.commit()
+
+    def clear(self):
+        """
+        Remove all cached plans (memory and disk) and reset the counters.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM reactions")
+                self._db.commit()
+
+    def stats(self):
+        """
+        Get cache statistics.
+        Returns:
+            dict: hits, misses, hit_rate, evictions and current size.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+            }
+
+    def _load(self, key):
+        if self._db is None:
+            return None
+        row = self._db.execute(
+            "SELECT stored_at, variants FROM reactions WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        variants = [
+            [(action, [tuple(e) for e in emotions]) for action, emotions in goals]
+            for goals in json.loads(row[1])
+        ]
+        entry = (row[0], variants)
+        self._entries[key] = entry
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return entry
+
+    def _trim_disk(self):
+        # Keep the max_size most recently stored plans on disk, like the in-memory LRU
+        self._db.execute(
+            "DELETE FROM reactions WHERE key IN "
+            "(SELECT key FROM reactions ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_size,),
+        )
+
+    def _drop(self, key):
+        self._entries.pop(key, None)
+        if self._db is not None:
+            self._db.execute("DELETE FROM reactions WHERE key = ?", (key,))
+            self._db.commit()
+
+
+# Shared cache used by the planning entry points (None when disabled in config.py)
+reaction_cache = ReactionCache(
+    max_size=config.reaction_cache_size,
+    ttl=config.reaction_cache_ttl,
+    max_variants=config.reaction_cache_variants,
+    emotion_buckets=config.reaction_cache_emotion_buckets,
+    path=config.reaction_cache_path,
+) if config.reaction_cache_enabled else None
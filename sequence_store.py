@@ -0,0 +1,489 @@
+"""
+Per-Dog Sequence Queues
+
+- One bounded FIFO queue of action sequences per dog/session ID, so producers
+  no longer overwrite each other and a sequence uploaded while the previous
+  one is still playing waits its turn.
+- Operations (all O(1) per call, thread-safe):
+      replace  - drop everything queued and store one sequence (old upload behaviour)
+      enqueue  - queue a sequence behind the others (QueueFull when at the cap)
+      append   - extend the newest queued sequence with more steps (streaming)
+      clear    - drop everything queued
+      dequeue  - take the next sequence to play
+- Memory caps: max_queue_length sequences per dog, max_steps steps per
+  sequence (appends included, so streaming can't grow one without bound) and
+  max_dogs dogs; when the dog table is full the least recently used idle dog
+  is evicted (idle dogs are kept in their own LRU order, so this is O(1)).
+- Reads (get, dequeue, long-poll/SSE waits) never create a dog, so polling
+  unknown dog IDs can't evict real ones or fail with StoreFull.
+- Every change gives the dog a new version from a store-wide counter (so
+  versions keep increasing even if an evicted dog comes back) and wakes
+  long-poll/SSE waiters for that dog only.
+- SqliteSequenceStore has the same API on top of a SQLite database in WAL
+  mode, so several server worker processes can share one set of queues.
+- snapshot()/restore() copy every queue out and back in, for the journal
+  (journal.py) that makes the in-memory store survive restarts.
+- close() wakes every waiter so a shutting-down server can finish its
+  long-polls and SSE streams right away.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+
+from config import sequence_queue_length, sequence_max_dogs, default_dog_id, sequence_store_poll_interval
+from config import max_sequence_steps
+
+
+class QueueFull(Exception):
+    """Raised when a dog's queue (or the dog table) is at its cap."""
+
+
+class StoreFull(QueueFull):
+    """Raised when every dog slot holds queued sequences, so no new dog fits."""
+
+
+class SequenceTooLong(Exception):
+    """Raised when a sequence (after an append, the combined one) would exceed max_steps."""
+
+
+def check_steps(sequence, max_steps, dog_id):
+    """
+    Raises:
+        SequenceTooLong: If sequence has more than max_steps steps.
+    """
+    if sequence is not None and len(sequence) > max_steps:
+        raise SequenceTooLong(f"Sequence for dog {dog_id!r} would have {len(sequence)} steps; "
+                              f"the limit is {max_steps}")
+
+
+class DogQueue:
+    """
+    Queued sequences and version state for one dog.
+    """
+    __slots__ = ("pending", "latest", "version", "changed", "changed_at")
+
+    def __init__(self, lock):
+        self.pending = deque()
+        self.latest = None    # newest sequence stored, as returned by /get_sequence
+        self.version = 0
+        self.changed = threading.Condition(lock)
+        self.changed_at = time.time()  # wall clock of the last change, for /metrics
+
+
+class SequenceStore:
+    """
+    Thread-safe table of DogQueues keyed by dog ID.
+    """
+    def __init__(self, max_queue_length=sequence_queue_length, max_dogs=sequence_max_dogs,
+                 max_steps=max_sequence_steps):
+        self.max_queue_length = max_queue_length
+        self.max_dogs = max_dogs
+        self.max_steps = max_steps
+        self._lock = threading.RLock()
+        self._version = 0
+        self._dogs = OrderedDict()  # dog_id -> DogQueue, least recently used first
+        self._idle = OrderedDict()  # the dogs with nothing queued, least recently used first
+        self._added = threading.Condition(self._lock)  # notified when a dog is created
+        self.closed = False
+
+    def _queue(self, dog_id):
+        # Caller holds self._lock
+        queue = self._dogs.get(dog_id)
+        if queue is not None:
+            self._dogs.move_to_end(dog_id)
+            return queue
+        if len(self._dogs) >= self.max_dogs:
+            self._evict_idle()
+        queue = self._dogs[dog_id] = DogQueue(self._lock)
+        self._idle[dog_id] = queue
+        self._added.notify_all()
+        return queue
+
+    def _evict_idle(self):
+        if not self._idle:
+            raise StoreFull(f"Sequence store is full ({self.max_dogs} dogs with queued sequences)")
+        dog_id, queue = self._idle.popitem(last=False)
+        del self._dogs[dog_id]
+        queue.changed.notify_all()
+
+    def _track_idle(self, dog_id, queue):
+        # Caller holds self._lock; call after every change to queue.pending
+        if queue.pending:
+            self._idle.pop(dog_id, None)
+        else:
+            self._idle[dog_id] = queue
+            self._idle.move_to_end(dog_id)
+
+    def _changed(self, queue):
+        self._version += 1
+        queue.version = self._version
+        queue.changed_at = time.time()
+        queue.changed.notify_all()
+        return queue.version
+
+    def replace(self, sequence, dog_id=default_dog_id):
+        """
+        Drop everything queued for the dog and store one sequence.
+        Returns:
+            int: The dog's new version.
+        Raises:
+            SequenceTooLong: If the sequence has more than max_steps steps.
+        """
+        check_steps(sequence, self.max_steps, dog_id)
+        with self._lock:
+            queue = self._queue(dog_id)
+            queue.pending.clear()
+            queue.pending.append(sequence)
+            queue.latest = sequence
+            self._track_idle(dog_id, queue)
+            return self._changed(queue)
+
+    def enqueue(self, sequence, dog_id=default_dog_id):
+        """
+        Queue a sequence behind the ones already waiting.
+        Raises:
+            QueueFull: If the dog already has max_queue_length sequences queued.
+            SequenceTooLong: If the sequence has more than max_steps steps.
+        """
+        check_steps(sequence, self.max_steps, dog_id)
+        with self._lock:
+            queue = self._queue(dog_id)
+            if len(queue.pending) >= self.max_queue_length:
+                raise QueueFull(f"Queue for dog {dog_id!r} is full ({self.max_queue_length} sequences)")
+            queue.pending.append(sequence)
+            queue.latest = sequence
+            self._track_idle(dog_id, queue)
+            return self._changed(queue)
+
+    def append(self, steps, dog_id=default_dog_id):
+        """
+        Extend the newest queued sequence with more steps. If it has already been
+        dequeued, the steps are queued as a continuation. A null (cleared)
+        sequence counts as empty.
+        Raises:
+            ValueError: If steps is None; there is nothing to append.
+            SequenceTooLong: If the extended sequence would have more than max_steps steps.
+        """
+        if steps is None:
+            raise ValueError("Cannot append a null sequence")
+        with self._lock:
+            queue = self._queue(dog_id)
+            latest = (queue.latest or []) + steps
+            newest = (queue.pending[-1] or []) + steps if queue.pending else list(steps)
+            check_steps(latest, self.max_steps, dog_id)
+            check_steps(newest, self.max_steps, dog_id)
+            if queue.pending:
+                queue.pending[-1] = newest
+            else:
+                queue.pending.append(newest)
+            queue.latest = latest
+            self._track_idle(dog_id, queue)
+            return self._changed(queue)
+
+    def clear(self, dog_id=default_dog_id):
+        """Drop everything queued for the dog."""
+        with self._lock:
+            queue = self._queue(dog_id)
+            queue.pending.clear()
+            queue.latest = None
+            self._track_idle(dog_id, queue)
+            return self._changed(queue)
+
+    def dequeue(self, dog_id=default_dog_id):
+        """
+        Take the next sequence to play.
+        Returns:
+            tuple: (sequence or None if nothing is queued, sequences still queued)
+        """
+        with self._lock:
+            queue = self._dogs.get(dog_id)
+            if queue is None or not queue.pending:
+                return None, 0
+            self._dogs.move_to_end(dog_id)
+            sequence = queue.pending.popleft()
+            self._track_idle(dog_id, queue)
+            # Not a new version: the latest sequence clients long-poll for is unchanged
+            return sequence, len(queue.pending)
+
+    def get(self, dog_id=default_dog_id):
+        """
+        Returns:
+            tuple: (latest sequence, version, number of queued sequences)
+        """
+        with self._lock:
+            queue = self._dogs.get(dog_id)
+            if queue is None:
+                return None, 0, 0
+            return queue.latest, queue.version, len(queue.pending)
+
+    def wait_for_version(self, since, timeout, dog_id=default_dog_id):
+        """
+        Block until the dog's version is newer than since. An unknown dog is
+        not created; the wait lasts until something is stored for it.
+        Returns:
+            tuple: (latest sequence, version), or (None, None) on timeout.
+        """
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            while True:
+                queue = self._dogs.get(dog_id)
+                if queue is not None and queue.version > since:
+                    return queue.latest, queue.version
+                remaining = deadline - time.monotonic()
+                if self.closed or remaining <= 0:
+                    return None, None
+                # Evicting the dog notifies its condition, so the loop looks it up again
+                (self._added if queue is None else queue.changed).wait(remaining)
+
+    def close(self):
+        """Wake all waiters; later waits return immediately"""
+        with self._lock:
+            self.closed = True
+            self._added.notify_all()
+            for queue in self._dogs.values():
+                queue.changed.notify_all()
+
+    def stats(self):
+        """
+        Returns:
+            dict: dogs, queued (total), max_queued (deepest queue), newest_change
+                  (time.time() of the last change, None if empty) and
+                  oldest_queued_change (least recent change among dogs with
+                  queued sequences, None if none are queued).
+        """
+        with self._lock:
+            queues = list(self._dogs.values())
+            waiting = [queue for queue in queues if queue.pending]
+            return {
+                "dogs": len(queues),
+                "queued": sum(len(queue.pending) for queue in waiting),
+                "max_queued": max((len(queue.pending) for queue in waiting), default=0),
+                "newest_change": max((queue.changed_at for queue in queues), default=None),
+                "oldest_queued_change": min((queue.changed_at for queue in waiting), default=None),
+            }
+
+    def snapshot(self):
+        """
+        JSON-serializable copy of every queue (sequences are never changed in
+        place, so they are shared rather than copied).
+        Returns:
+            dict: {"version": n, "dogs": [[dog_id, latest, version, [queued...]], ...]}
+        """
+        with self._lock:
+            return {
+                "version": self._version,
+                "dogs": [[dog_id, queue.latest, queue.version, list(queue.pending)]
+                         for dog_id, queue in self._dogs.items()],
+            }
+
+    def restore(self, state):
+        """Replace every queue with the contents of a snapshot()"""
+        with self._lock:
+            self._dogs.clear()
+            self._idle.clear()
+            self._version = state["version"]
+            for dog_id, latest, version, pending in state["dogs"]:
+                queue = self._dogs[dog_id] = DogQueue(self._lock)
+                queue.latest, queue.version = latest, version
+                queue.pending.extend(pending)
+                self._track_idle(dog_id, queue)
+            self._added.notify_all()
+
+
+def connect_sqlite(path):
+    """SQLite connection in autocommit mode with WAL journaling, for explicit transactions"""
+    db = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    return db
+
+
+class SqliteTransaction:
+    """BEGIN IMMEDIATE ... COMMIT (ROLLBACK on error), serializing writers across processes"""
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute("BEGIN IMMEDIATE")
+        return self.db
+
+    def __exit__(self, exc_type, exc, tb):
+        self.db.execute("ROLLBACK" if exc_type else "COMMIT")
+
+
+class SqliteSequenceStore:
+    """
+    SequenceStore API backed by a SQLite/WAL database shared between processes.
+    Waiters are woken at once by changes made in this process and notice
+    changes from other processes within sequence_store_poll_interval.
+    """
+    def __init__(self, path, max_queue_length=sequence_queue_length, max_dogs=sequence_max_dogs,
+                 poll_interval=sequence_store_poll_interval, max_steps=max_sequence_steps):
+        self.path = path
+        self.max_queue_length = max_queue_length
+        self.max_dogs = max_dogs
+        self.max_steps = max_steps
+        self.poll_interval = poll_interval
+        self.closed = False
+        self._local = threading.local()  # one connection per thread, opened lazily (after fork)
+        self._changed = threading.Condition()
+        # Schema setup uses its own connection, so none is inherited by forked workers
+        db = connect_sqlite(path)
+        try:
+            with SqliteTransaction(db):
+                db.execute("CREATE TABLE IF NOT EXISTS dogs (dog_id TEXT PRIMARY KEY, latest TEXT, "
+                           "version INTEGER NOT NULL, used REAL NOT NULL)")
+                db.execute("CREATE TABLE IF NOT EXISTS queued (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                           "dog_id TEXT NOT NULL, sequence TEXT NOT NULL)")
+                db.execute("CREATE INDEX IF NOT EXISTS queued_by_dog ON queued (dog_id, id)")
+                db.execute("CREATE INDEX IF NOT EXISTS dogs_by_used ON dogs (used)")
+                db.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+                db.execute("INSERT OR IGNORE INTO counters VALUES ('version', 0)")
+        finally:
+            db.close()
+
+    def _connection(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = self._local.db = connect_sqlite(self.path)
+        return db
+
+    def _transaction(self):
+        return SqliteTransaction(self._connection())
+
+    def _touch(self, db, dog_id, create=True):
+        """
+        Make sure the dog has a row, evicting an idle dog if the table is full.
+        Returns:
+            bool: Whether the dog has a row (always True when create is set).
+        """
+        now = time.time()
+        if db.execute("UPDATE dogs SET used = ? WHERE dog_id = ?", (now, dog_id)).rowcount:
+            return True
+        if not create:
+            return False
+        if db.execute("SELECT COUNT(*) FROM dogs").fetchone()[0] >= self.max_dogs:
+            idle = db.execute("SELECT dog_id FROM dogs WHERE dog_id NOT IN (SELECT dog_id FROM queued) "
+                              "ORDER BY used LIMIT 1").fetchone()
+            if idle is None:
+                raise StoreFull(f"Sequence store is full ({self.max_dogs} dogs with queued sequences)")
+            db.execute("DELETE FROM dogs WHERE dog_id = ?", idle)
+        db.execute("INSERT INTO dogs VALUES (?, NULL, 0, ?)", (dog_id, now))
+        return True
+
+    def _new_version(self, db, dog_id, latest):
+        db.execute("UPDATE counters SET value = value + 1 WHERE name = 'version'")
+        version = db.execute("SELECT value FROM counters WHERE name = 'version'").fetchone()[0]
+        db.execute("UPDATE dogs SET latest = ?, version = ? WHERE dog_id = ?",
+                   (None if latest is None else json.dumps(latest), version, dog_id))
+        return version
+
+    def _notify(self):
+        with self._changed:
+            self._changed.notify_all()
+
+    def replace(self, sequence, dog_id=default_dog_id):
+        check_steps(sequence, self.max_steps, dog_id)
+        with self._transaction() as db:
+            self._touch(db, dog_id)
+            db.execute("DELETE FROM queued WHERE dog_id = ?", (dog_id,))
+            db.execute("INSERT INTO queued (dog_id, sequence) VALUES (?, ?)", (dog_id, json.dumps(sequence)))
+            version = self._new_version(db, dog_id, sequence)
+        self._notify()
+        return version
+
+    def enqueue(self, sequence, dog_id=default_dog_id):
+        check_steps(sequence, self.max_steps, dog_id)
+        with self._transaction() as db:
+            self._touch(db, dog_id)
+            queued = db.execute("SELECT COUNT(*) FROM queued WHERE dog_id = ?", (dog_id,)).fetchone()[0]
+            if queued >= self.max_queue_length:
+                raise QueueFull(f"Queue for dog {dog_id!r} is full ({self.max_queue_length} sequences)")
+            db.execute("INSERT INTO queued (dog_id, sequence) VALUES (?, ?)", (dog_id, json.dumps(sequence)))
+            version = self._new_version(db, dog_id, sequence)
+        self._notify()
+        return version
+
+    def append(self, steps, dog_id=default_dog_id):
+        if steps is None:
+            raise ValueError("Cannot append a null sequence")
+        with self._transaction() as db:
+            self._touch(db, dog_id)
+            newest = db.execute("SELECT id, sequence FROM queued WHERE dog_id = ? ORDER BY id DESC LIMIT 1",
+                                (dog_id,)).fetchone()
+            latest = db.execute("SELECT latest FROM dogs WHERE dog_id = ?", (dog_id,)).fetchone()[0]
+            latest = (json.loads(latest) if latest else []) + steps
+            check_steps(latest, self.max_steps, dog_id)
+            if newest is None:
+                db.execute("INSERT INTO queued (dog_id, sequence) VALUES (?, ?)", (dog_id, json.dumps(steps)))
+            else:
+                extended = (json.loads(newest[1]) or []) + steps
+                check_steps(extended, self.max_steps, dog_id)
+                db.execute("UPDATE queued SET sequence = ? WHERE id = ?", (json.dumps(extended), newest[0]))
+            version = self._new_version(db, dog_id, latest)
+        self._notify()
+        return version
+
+    def clear(self, dog_id=default_dog_id):
+        with self._transaction() as db:
+            self._touch(db, dog_id)
+            db.execute("DELETE FROM queued WHERE dog_id = ?", (dog_id,))
+            version = self._new_version(db, dog_id, None)
+        self._notify()
+        return version
+
+    def dequeue(self, dog_id=default_dog_id):
+        with self._transaction() as db:
+            if not self._touch(db, dog_id, create=False):
+                return None, 0
+            oldest = db.execute("SELECT id, sequence FROM queued WHERE dog_id = ? ORDER BY id LIMIT 1",
+                                (dog_id,)).fetchone()
+            if oldest is None:
+                return None, 0
+            db.execute("DELETE FROM queued WHERE id = ?", (oldest[0],))
+            remaining = db.execute("SELECT COUNT(*) FROM queued WHERE dog_id = ?", (dog_id,)).fetchone()[0]
+        return json.loads(oldest[1]), remaining
+
+    def get(self, dog_id=default_dog_id):
+        db = self._connection()
+        row = db.execute("SELECT latest, version FROM dogs WHERE dog_id = ?", (dog_id,)).fetchone()
+        if row is None:
+            return None, 0, 0
+        queued = db.execute("SELECT COUNT(*) FROM queued WHERE dog_id = ?", (dog_id,)).fetchone()[0]
+        return (json.loads(row[0]) if row[0] else None), row[1], queued
+
+    def wait_for_version(self, since, timeout, dog_id=default_dog_id):
+        deadline = time.monotonic() + timeout
+        while True:
+            sequence, version, _ = self.get(dog_id)
+            if version > since:
+                return sequence, version
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self.closed:
+                return None, None
+            with self._changed:
+                self._changed.wait(min(remaining, self.poll_interval))
+
+    def close(self):
+        """Wake all waiters; later waits return immediately"""
+        self.closed = True
+        self._notify()
+
+    def stats(self):
+        # "used" is the time of the dog's last change (or dequeue)
+        db = self._connection()
+        dogs, newest = db.execute("SELECT COUNT(*), MAX(used) FROM dogs").fetchone()
+        queued, max_queued = db.execute(
+            "SELECT COALESCE(SUM(n), 0), COALESCE(MAX(n), 0) FROM "
+            "(SELECT COUNT(*) AS n FROM queued GROUP BY dog_id)").fetchone()
+        oldest = db.execute("SELECT MIN(used) FROM dogs WHERE dog_id IN (SELECT dog_id FROM queued)").fetchone()[0]
+        return {
+            "dogs": dogs,
+            "queued": queued,
+            "max_queued": max_queued,
+            "newest_change": newest,
+            "oldest_queued_change": oldest,
+        }
@@ -0,0 +1,136 @@
+"""
+Action Server Metrics
+
+- Request counts, payload sizes and fixed-bucket latency histograms per route,
+  rendered by /metrics in the Prometheus text exposition format.
+- Recording is cheap: the bucket index is found with bisect before taking the
+  histogram's lock, which is then held for a few integer additions.
+- Counters live in each server process; with several gunicorn workers a
+  scrape sees the worker that answered it. Queue gauges come from the store,
+  so with --store sqlite they cover every worker.
+"""
+
+import bisect
+import threading
+import time
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram; bucket i counts values <= buckets[i], the last
+    one everything larger (+Inf).
+    """
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{name}="{value}"' for name, value in labels.items()) + "}"
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class RequestMetrics:
+    """
+    Per-route request counters and histograms for one server process.
+    """
+    def __init__(self):
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._requests = {}       # (route, method, status) -> count
+        self._response_bytes = {}  # route -> total bytes of sized responses
+        self._latency = {}        # route -> Histogram of seconds
+        self._request_size = {}   # route -> Histogram of request body bytes
+
+    def _histograms(self, route):
+        latency = self._latency.get(route)
+        if latency is None:
+            with self._lock:
+                # _latency is read without the lock, so a route must be in
+                # _request_size before it appears there
+                self._request_size.setdefault(route, Histogram(SIZE_BUCKETS))
+                latency = self._latency.setdefault(route, Histogram(LATENCY_BUCKETS))
+        return latency, self._request_size[route]
+
+    def observe(self, route, method, status, seconds, request_bytes, response_bytes=None):
+        """
+        Record one finished request.
+        Args:
+            route (str): URL rule, e.g. "/get_sequence".
+            response_bytes (int): Body size, None for streamed responses.
+        """
+        latency, request_size = self._histograms(route)
+        latency.observe(seconds)
+        request_size.observe(request_bytes)
+        key = (route, method, status)
+        with self._lock:
+            self._requests[key] = self._requests.get(key, 0) + 1
+            if response_bytes is not None:
+                self._response_bytes[route] = self._response_bytes.get(route, 0) + response_bytes
+
+    def render(self, gauges=()):
+        """
+        Args:
+            gauges (list): (name, help, value) tuples; None values are left out.
+        Returns:
+            str: Every metric in the Prometheus text format.
+        """
+        with self._lock:
+            requests = sorted(self._requests.items())
+            response_bytes = sorted(self._response_bytes.items())
+            routes = sorted(self._latency)
+
+        lines = [
+            "# HELP action_server_requests_total Requests handled, by route, method and status.",
+            "# TYPE action_server_requests_total counter",
+        ]
+        for (route, method, status), count in requests:
+            lines.append(f"action_server_requests_total{_labels(route=route, method=method, status=status)} {count}")
+        lines += [
+            "# HELP action_server_response_bytes_total Response body bytes sent (streams excluded).",
+            "# TYPE action_server_response_bytes_total counter",
+        ]
+        for route, total in response_bytes:
+            lines.append(f"action_server_response_bytes_total{_labels(route=route)} {total}")
+        for name, help_text, histograms in (
+            ("action_server_request_duration_seconds", "Time to handle a request (first byte for streams).",
+             self._latency),
+            ("action_server_request_size_bytes", "Request body size.", self._request_size),
+        ):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+            for route in routes:
+                histogram = histograms[route]
+                counts, total = histogram.snapshot()
+                cumulative = 0
+                for bound, count in zip(list(histogram.buckets) + ["+Inf"], counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_labels(route=route, le=bound)} {cumulative}")
+                lines.append(f"{name}_sum{_labels(route=route)} {_number(total)}")
+                lines.append(f"{name}_count{_labels(route=route)} {cumulative}")
+
+        gauges = list(gauges) + [("action_server_start_time_seconds", "Unix time this process started.",
+                                  self.started)]
+        for name, help_text, value in gauges:
+            if value is None:
+                continue
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {_number(value)}"]
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,175 @@
+"""
+Lazy closed-form emotion decay (DogPersonality._settle, DogPopulation.settle)
+against the discrete decay_emotions ticks it replaces.
+
+Run from the repository root:
+    python -m pytest tests
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from config import emotion_decay_resolution  # noqa: E402
+from dog_personality import DogPersonality  # noqa: E402
+from dog_population import DogPopulation  # noqa: E402
+
+RATE = 0.05
+INTERVAL = 10.0
+EVENT = {"Sad": 0.4, "Grievances": 0.2, "Fear": 0.3}
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def make_pair(clock):
+    """(lazily decaying dog, reference dog ticked by hand), with the same emotions"""
+    lazy = DogPersonality(decay_rate=RATE, decay_interval=INTERVAL, clock=clock)
+    ticked = DogPersonality(decay_rate=0, clock=clock)
+    for dog in (lazy, ticked):
+        dog.blend_emotions(EVENT)
+    return lazy, ticked
+
+
+def assert_close(a, b):
+    assert a.keys() == b.keys()
+    for emotion in a:
+        assert a[emotion] == pytest.approx(b[emotion], abs=1e-12)
+
+
+@pytest.mark.parametrize("ticks", [1, 2, 7, 50, 400])
+def test_personality_matches_discrete_ticks(ticks):
+    clock = FakeClock()
+    lazy, ticked = make_pair(clock)
+    for _ in range(ticks):
+        clock.now += INTERVAL
+        ticked.decay_emotions(RATE)
+    assert_close(lazy.get_emotion_vector(), ticked.get_emotion_vector())
+    assert lazy.get_dominant_emotion() == ticked.get_dominant_emotion()
+
+
+def test_personality_interleaved_reads_and_blends():
+    clock = FakeClock()
+    lazy, ticked = make_pair(clock)
+    for n in range(1, 40):
+        clock.now += INTERVAL
+        ticked.decay_emotions(RATE)
+        if n % 3 == 0:
+            lazy.get_top_emotions(3)
+        if n % 7 == 0:
+            for dog in (lazy, ticked):
+                dog.blend_emotions({"Happy": 0.2})
+    assert_close(lazy.get_emotion_vector(), ticked.get_emotion_vector())
+
+
+def test_partial_intervals_accumulate():
+    clock = FakeClock()
+    lazy, ticked = make_pair(clock)
+    for _ in range(4):
+        clock.now += INTERVAL / 4
+        lazy.get_emotion_vector()
+    ticked.decay_emotions(RATE)
+    assert_close(lazy.get_emotion_vector(), ticked.get_emotion_vector())
+
+
+def test_zero_elapsed_changes_nothing():
+    clock = FakeClock()
+    lazy, _ = make_pair(clock)
+    before = lazy.get_emotion_vector()
+    for _ in range(3):
+        assert lazy.get_emotion_vector() == before
+    clock.now += emotion_decay_resolution / 2
+    assert lazy.get_emotion_vector() == before
+
+
+def test_clock_going_backwards_owes_nothing():
+    clock = FakeClock()
+    lazy, ticked = make_pair(clock)
+    clock.now -= 100 * INTERVAL
+    assert_close(lazy.get_emotion_vector(), ticked.get_emotion_vector())
+    # Decay restarts from the new baseline rather than the old timestamp
+    clock.now += INTERVAL
+    ticked.decay_emotions(RATE)
+    assert_close(lazy.get_emotion_vector(), ticked.get_emotion_vector())
+
+
+def test_rate_is_clamped():
+    clock = FakeClock()
+    wiped = DogPersonality(decay_rate=1.5, decay_interval=INTERVAL, clock=clock)
+    growing = DogPersonality(decay_rate=-0.5, decay_interval=INTERVAL, clock=clock)
+    for dog in (wiped, growing):
+        dog.blend_emotions(EVENT)
+    before = growing.get_emotion_vector()
+    clock.now += 3.5 * INTERVAL
+    vector = wiped.get_emotion_vector()
+    assert vector[wiped.get_dominant_emotion()] == pytest.approx(1.0)
+    assert all(0.0 <= weight <= 1.0 for weight in vector.values())
+    assert growing.get_emotion_vector() == before
+
+
+def test_update_emotion_clamps_after_decay():
+    clock = FakeClock()
+    lazy, ticked = make_pair(clock)
+    clock.now += 5 * INTERVAL
+    for _ in range(5):
+        ticked.decay_emotions(RATE)
+    for dog in (lazy, ticked):
+        dog.update_emotion("Curious", -1.0)
+    assert lazy.get_emotion_vector()["Curious"] == 0.0
+    assert_close(lazy.get_emotion_vector(), ticked.get_emotion_vector())
+
+
+def test_set_emotion_vector_resets_the_clock():
+    clock = FakeClock()
+    dog = DogPersonality(decay_rate=RATE, decay_interval=INTERVAL, clock=clock)
+    clock.now += 100 * INTERVAL
+    dog.set_emotion_vector({"Happy": 0.5, "Sad": 0.5})
+    assert dog.get_emotion_vector()["Sad"] == pytest.approx(0.5)
+
+
+@pytest.mark.parametrize("ticks", [1, 9, 120])
+def test_population_matches_discrete_ticks(ticks):
+    clock = FakeClock()
+    lazy = DogPopulation(6, decay_rate=RATE, decay_interval=INTERVAL, clock=clock)
+    ticked = DogPopulation(6, decay_rate=0, clock=clock)
+    for population in (lazy, ticked):
+        population.blend(EVENT, dogs=[1, 3, 4])
+    for n in range(ticks):
+        clock.now += INTERVAL
+        ticked.decay(RATE)
+        if n % 4 == 0:
+            lazy.settle([0, 1])  # dogs settled at different times
+    assert lazy.dominant_emotions() == ticked.dominant_emotions()  # settles everyone
+    np.testing.assert_allclose(lazy.emotions, ticked.emotions, rtol=0, atol=1e-12)
+
+
+def test_population_matches_personality():
+    clock = FakeClock()
+    population = DogPopulation(3, decay_rate=RATE, decay_interval=INTERVAL, clock=clock)
+    dog = DogPersonality(decay_rate=RATE, decay_interval=INTERVAL, clock=clock)
+    population.blend(EVENT)
+    dog.blend_emotions(EVENT)
+    clock.now += 13.7 * INTERVAL
+    assert_close(population[2].get_emotion_vector(), dog.get_emotion_vector())
+
+
+def test_population_zero_and_negative_elapsed():
+    clock = FakeClock()
+    population = DogPopulation(4, decay_rate=RATE, decay_interval=INTERVAL, clock=clock)
+    population.blend(EVENT)
+    before = population.emotions.copy()
+    population.settle()
+    np.testing.assert_array_equal(population.emotions, before)
+    clock.now -= 50 * INTERVAL
+    population.settle()
+    np.testing.assert_array_equal(population.emotions, before)
+    np.testing.assert_array_equal(population.updated, clock.now)
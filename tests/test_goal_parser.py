@@ -0,0 +1,124 @@
+"""
+GoalValidator and StreamingGoalParser parsing of LLM output.
+
+Run from the repository root:
+    python -m pytest tests
+"""
+
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from config import actions_short, core_sentiments  # noqa: E402
+from goal_parser import StreamingGoalParser, get_validator  # noqa: E402
+
+TUPLES = '[("Jump", [("Happy", 0.5), ("Excitement", 0.4)]), ("Sit", [("Tired", 0.6)])]'
+
+
+@pytest.fixture
+def validator():
+    return get_validator(actions_short, core_sentiments, max_goals=3)
+
+
+def json_goals(*goals):
+    return json.dumps({"goals": [
+        {"action": action, "emotions": [{"emotion": e, "weight": w} for e, w in pairs]}
+        for action, pairs in goals
+    ]})
+
+
+def test_parse_tuples(validator):
+    assert validator.parse(TUPLES) == [
+        ("Jump", [("Happy", 0.5), ("Excitement", 0.4)]),
+        ("Sit", [("Tired", 0.6)]),
+    ]
+
+
+def test_parse_tuples_in_code_fence(validator):
+    assert validator.parse("```python\n" + TUPLES + "\n```")[0][0] == "Jump"
+
+
+def test_parse_json(validator):
+    content = json_goals(("Bark", [("Vigilant", 0.7)]), ("Walk", [("Curious", 0.3), ("Happy", 0.3)]))
+    assert validator.parse(content) == [
+        ("Bark", [("Vigilant", 0.7)]),
+        ("Walk", [("Curious", 0.3), ("Happy", 0.3)]),
+    ]
+
+
+def test_invalid_goals_are_skipped(validator):
+    content = '[("Fly", [("Happy", 0.5)]), ("Sit", [("Smug", 0.5)]), ("Sit", [("Happy", 0.9), ("Sad", 0.9)]), ("Eat", [("Happy", 0.5)])]'
+    assert validator.parse(content) == [("Eat", [("Happy", 0.5)])]
+
+
+@pytest.mark.parametrize("content", [
+    "",
+    "the dog wants to play",
+    '[("Jump", [("Happy", "lots")])]',
+    '[("Jump", [("Happy", 0.5), oops])]',
+    '{"goals": 5}',
+    '{"goals": {"action": "Jump"}}',
+    '["Jump"]',
+    '{"goals": [{"action": ["Jump"], "emotions": [{"emotion": "Happy", "weight": 0.5}]}]}',
+    '{"goals": [{"action": "Jump", "emotions": [{"emotion": "Happy", "weight": true}]}]}',
+])
+def test_malformed_output_raises_value_error(validator, content):
+    with pytest.raises(ValueError):
+        validator.parse(content)
+
+
+def test_truncated_tuples_keep_complete_goals(validator):
+    assert validator.parse(TUPLES[:-20]) == [("Jump", [("Happy", 0.5), ("Excitement", 0.4)])]
+
+
+def test_truncated_json_keeps_complete_goals(validator):
+    content = json_goals(("Bark", [("Vigilant", 0.7)]), ("Walk", [("Curious", 0.3)]))
+    assert validator.parse(content[:-10]) == [("Bark", [("Vigilant", 0.7)])]
+
+
+def test_max_goals_truncates_plan(validator):
+    content = json_goals(*[("Sit", [("Happy", 0.1 * i)]) for i in range(1, 6)])
+    assert len(validator.parse(content)) == 3
+    assert [goal[1][0][1] for goal in validator.parse(content, max_goals=2)] == [0.1, 0.2]
+
+
+def test_parse_coded_uses_vocabulary_ids(validator):
+    assert validator.parse_coded('[("Jump", [("Happy", 0.5)])]') == [
+        (actions_short.index("Jump"), ((core_sentiments.index("Happy"), 0.5),)),
+    ]
+
+
+def test_streaming_parser_yields_goals_as_tuples_close():
+    parser = StreamingGoalParser(actions_short, core_sentiments, max_goals=3)
+    split = TUPLES.index("]),") + 2
+    assert parser.feed(TUPLES[:split - 1]) == []
+    assert parser.feed(TUPLES[split - 1:split]) == [("Jump", [("Happy", 0.5), ("Excitement", 0.4)])]
+    assert parser.feed(TUPLES[split:]) == [("Sit", [("Tired", 0.6)])]
+    assert parser.goal_count == 2
+    assert not parser.done
+
+
+def test_streaming_parser_handles_truncated_stream():
+    parser = StreamingGoalParser(actions_short, core_sentiments, max_goals=3)
+    goals = []
+    for ch in TUPLES[:-20]:
+        goals.extend(parser.feed(ch))
+    assert goals == [("Jump", [("Happy", 0.5), ("Excitement", 0.4)])]
+    assert parser.goal_count == 1
+
+
+def test_streaming_parser_ignores_apostrophes_in_prose():
+    parser = StreamingGoalParser(actions_short, core_sentiments, max_goals=3)
+    goals = parser.feed("Sure (the dog's happy): " + TUPLES)
+    assert [goal[0] for goal in goals] == ["Jump", "Sit"]
+
+
+def test_streaming_parser_stops_at_max_goals():
+    parser = StreamingGoalParser(actions_short, core_sentiments, max_goals=1)
+    assert parser.feed(TUPLES) == [("Jump", [("Happy", 0.5), ("Excitement", 0.4)])]
+    assert parser.done
+    assert parser.feed('("Sit", [("Tired", 0.6)])') == []
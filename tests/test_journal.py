@@ -0,0 +1,116 @@
+"""
+Journal round trips (write, compact, replay) and recovery from a torn or
+corrupt log tail.
+
+Run from the repository root:
+    python -m pytest tests
+"""
+
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from journal import FRAME, Journal, JournaledFingerHistory, JournaledSequenceStore, read_records  # noqa: E402
+
+SIT = {"action": "Sit", "emotions": {"Happy": 1.0}}
+JUMP = {"action": "Jump", "emotions": {"Excitement": 1.0}}
+
+
+def open_journal(directory, **kwargs):
+    """(journal, store, history, records replayed) attached to directory"""
+    journal = Journal(str(directory), fsync_interval=60, **kwargs)
+    store, history = JournaledSequenceStore(), JournaledFingerHistory(capacity=8)
+    replayed = journal.attach(store, history)
+    return journal, store, history, replayed
+
+
+def log_paths(directory):
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".log"))
+
+
+@pytest.fixture
+def journal_dir(tmp_path):
+    return tmp_path / "journal"
+
+
+def test_round_trip_through_compaction(journal_dir):
+    journal, store, history, _ = open_journal(journal_dir)
+    store.replace([SIT], "rex")
+    store.enqueue([JUMP], "fido")
+    store.enqueue([SIT], "fido")
+    history.add([{"keypoint": "Open"}, {"keypoint": "Close"}])
+    journal.compact()
+    # Changes after the snapshot live only in the new log
+    store.append([JUMP], "rex")
+    store.dequeue("fido")
+    store.clear("ghost")
+    history.add([{"keypoint": "OK"}])
+    journal.close()
+    assert len(log_paths(journal_dir)) == 1
+
+    journal, replayed_store, replayed_history, replayed = open_journal(journal_dir)
+    journal.close()
+    assert replayed == 4
+    for dog_id in ("rex", "fido", "ghost"):
+        assert replayed_store.get(dog_id) == store.get(dog_id)
+    assert replayed_store.dequeue("fido") == store.dequeue("fido")
+    assert replayed_history.snapshot() == history.snapshot()
+
+
+def test_compaction_triggered_by_log_size(journal_dir):
+    journal, store, _, _ = open_journal(journal_dir, compact_bytes=1)
+    first_log = log_paths(journal_dir)[0]
+    store.replace([SIT], "rex")
+    deadline = time.monotonic() + 5
+    while log_paths(journal_dir) == [first_log] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    journal.close()
+    assert first_log not in log_paths(journal_dir)
+
+    journal, replayed_store, _, replayed = open_journal(journal_dir)
+    journal.close()
+    assert replayed == 0
+    assert replayed_store.get("rex") == store.get("rex")
+
+
+def write_three_replaces(journal_dir):
+    journal, store, _, _ = open_journal(journal_dir)
+    for sequence in ([SIT], [JUMP], [SIT, JUMP]):
+        store.replace(sequence, "rex")
+    journal.close()
+    (path,) = log_paths(journal_dir)
+    return path
+
+
+def test_torn_tail_is_dropped(journal_dir):
+    path = write_three_replaces(journal_dir)
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - 3)
+
+    assert [record["sequence"] for record in read_records(path)] == [[SIT], [JUMP]]
+    journal, store, _, replayed = open_journal(journal_dir)
+    journal.close()
+    assert replayed == 2
+    assert store.get("rex")[0] == [JUMP]
+
+
+def test_corrupt_record_stops_replay(journal_dir):
+    path = write_three_replaces(journal_dir)
+    records = list(read_records(path))
+    with open(path, "r+b") as f:
+        data = bytearray(f.read())
+        # Flip a payload byte of the second record: it and everything after are dropped
+        first_length, _ = FRAME.unpack_from(data, 0)
+        data[2 * FRAME.size + first_length + 5] ^= 0xFF
+        f.seek(0)
+        f.write(data)
+
+    assert list(read_records(path)) == records[:1]
+    journal, store, _, replayed = open_journal(journal_dir)
+    journal.close()
+    assert replayed == 1
+    assert store.get("rex")[0] == [SIT]
@@ -0,0 +1,72 @@
+"""
+SequenceStore and SqliteSequenceStore behaviour shared by both backends.
+
+Run from the repository root:
+    python -m pytest tests
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from sequence_store import SequenceStore, SqliteSequenceStore, SequenceTooLong  # noqa: E402
+
+STEP = {"action": "Sit", "emotions": {"Happy": 1.0}}
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        store = SequenceStore()
+    else:
+        store = SqliteSequenceStore(str(tmp_path / "sequences.db"))
+    yield store
+    store.close()
+
+
+def test_append_rejects_null_steps(store):
+    store.replace([STEP], "dog")
+    with pytest.raises(ValueError):
+        store.append(None, "dog")
+    assert store.get("dog")[0] == [STEP]
+
+
+def test_append_after_null_enqueue(store):
+    store.enqueue(None, "dog")
+    store.append([STEP], "dog")
+    assert store.get("dog")[0] == [STEP]
+    assert store.dequeue("dog")[0] == [STEP]
+
+
+def test_append_after_null_replace_and_clear(store):
+    store.replace(None, "dog")
+    store.append([STEP], "dog")
+    store.clear("dog")
+    store.append([STEP, STEP], "dog")
+    assert store.get("dog")[0] == [STEP, STEP]
+
+
+def test_append_extends_newest_queued(store):
+    store.enqueue([STEP], "dog")
+    store.enqueue([STEP], "dog")
+    store.append([STEP], "dog")
+    assert store.dequeue("dog") == ([STEP], 1)
+    assert store.dequeue("dog") == ([STEP, STEP], 0)
+
+
+def test_append_is_capped_at_max_steps(store):
+    store.max_steps = 4
+    store.replace([STEP] * 3, "dog")
+    store.append([STEP], "dog")
+    with pytest.raises(SequenceTooLong):
+        store.append([STEP], "dog")
+    assert store.get("dog")[0] == [STEP] * 4
+    # Once dequeued, the continuation still counts against the latest sequence
+    store.dequeue("dog")
+    with pytest.raises(SequenceTooLong):
+        store.append([STEP], "dog")
+    with pytest.raises(SequenceTooLong):
+        store.enqueue([STEP] * 5, "dog")
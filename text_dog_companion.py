@@ -16,129 +16,41 @@ Features:
 - Server integration for Unity/animation systems
 """
 
-import os
-import openai
 import requests
 import json
 from dog_personality import DogPersonality
-from config import core_sentiments, rules, allowed_actions, actions_short
+from behavior_logic import goal_prompt, cached_goal_request, apply_late_plan
+from goal_parser import get_validator
+from fallback_planner import plan_fallback_goals, plan_with_deadline, LatePlan, late_plan_window
+from config import core_sentiments, allowed_actions, actions_short
+from config import llm_fallback_enabled, action_server_url, default_dog_id
+from config import action_server_binary, late_plan_wait
+from wire_format import sequence_request
+import action_client
 
 class TextDogCompanion:
-    def __init__(self):
-        self.server_url = "http://localhost:50007"
+    def __init__(self, dog_id=default_dog_id):
+        self.server_url = action_server_url
+        self.dog_id = dog_id
         self.dog = DogPersonality()
         
-    def get_llm_goals_from_text(self, user_text):    
+    def get_llm_goals_from_text(self, user_text):
         """
         Generate dog actions based on written text input.
         """
-        if not os.getenv("OPENAI_API_KEY"):
-            raise RuntimeError("OPENAI_API_KEY environment variable not set.")
-
-        # Initialize the OpenAI client with the new API
-        client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
-        personality = self.dog.get_personality()
-        
-        # Get the last few user inputs for context
-        recent_inputs = self.dog.get_user_inputs()[-3:]
-        
-        prompt = f"""
-You are a dog with the following personality: {personality}
-
-{rules}
-"""
-        
-        userPrompt = f"""The human said to me: "{user_text}"
-
-Recent conversation context: {recent_inputs}
-
-I need to react as a dog would to this human communication. Consider:
-- The tone and emotion in their words
-- What they might want me to do
-- How I should respond based on my personality
-- Whether they're being friendly, commanding, playful, or emotional
-
-React in an authentic dog-like manner with varied and creative actions!"""
-
-        try:
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": prompt},
-                    {"role": "user", "content": userPrompt}
-                    ],
-                max_tokens=512,
-                temperature=0.7,
-            )
-            content = response.choices[0].message.content.strip()
-            return self.parse_llm_goal_output(content)
-        except Exception as e:
-            raise RuntimeError(f"Failed to get valid LLM goals from text: {e}")
+        return cached_goal_request(goal_prompt(self.dog, user_text, "companion_text"), actions_short)
 
     def parse_llm_goal_output(self, content, max_goals=3):
         """Parse LLM output into valid action-emotion pairs"""
-        import ast
-        
-        # Remove code fencing if present
-        content = content.strip()
-        if content.startswith("```"):
-            content = content.split("\n", 1)[-1]
-        if content.endswith("```"):
-            content = content.rsplit("```", 1)[0]
-        
-        # Only grab substring that is a list
-        start = content.find('[')
-        end = content.rfind(']')
-        if start == -1 or end == -1:
-            raise ValueError("No valid list in LLM output.")
-        content = content[start:end+1]
-        
-        # Parse as Python literal (list of tuples)
-        try:
-            goals = ast.literal_eval(content)
-        except Exception as e:
-            raise ValueError(f"Could not parse LLM output as Python data: {e}")
-        
-        if isinstance(goals, tuple):  # Make singletons into list
-            goals = [goals]
-        if not isinstance(goals, list):
-            raise ValueError("Parsed LLM output is not a list.")
-
-        valid_goals = []
-        for item in goals:
-            if not (isinstance(item, tuple) and len(item) == 2):
-                continue
-            action, emotions = item
-            
-            # Check if action is in allowed actions
-            if action not in actions_short:  # Use actions_short for validation
-                continue
-                
-            if (
-                isinstance(emotions, list) and
-                1 <= len(emotions) <= 10 and
-                all(
-                    isinstance(e, tuple) and len(e) == 2 and
-                    e[0] in core_sentiments and
-                    isinstance(e[1], (float, int))
-                    for e in emotions
-                )
-            ):
-                total_weight = sum(float(e[1]) for e in emotions)
-                if 0.0 <= total_weight <= 1.05:  # A small buffer for float math
-                    valid_emotions = [(e[0], float(e[1])) for e in emotions]
-                    valid_goals.append((action, valid_emotions))
-
-        if not (1 <= len(valid_goals) <= max_goals):
-            raise ValueError(f"Invalid number of goals: {len(valid_goals)}")
-
-        return valid_goals
+        # Use actions_short for validation
+        return get_validator(actions_short, core_sentiments, max_goals).parse(content)
 
     def direct_emotion_blend(self, action, emotions):
-        """Directly blend emotions for an action"""
+        """Directly blend emotions for an action (recorded like behavior_logic.direct_emotion_blend)"""
         self.dog.blend_emotions(emotions)
-        return (action, self.dog.get_emotion_vector())
+        vector = self.dog.get_emotion_vector()
+        self.dog.record_emotions(action)
+        return (action, vector)
 
     def build_sequence(self, valid_goals):
         """Build action sequence from LLM goals"""
@@ -159,16 +71,18 @@ React in an authentic dog-like manner with varied and creative actions!"""
     def upload_sequence(self, sequence):
         """Upload sequence to server"""
         try:
-            response = requests.post(f"{self.server_url}/upload_sequence", 
-                                   json={"sequence": sequence})
+            response = action_client.post(f"{self.server_url}/upload_sequence",
+                                          **sequence_request(sequence, self.dog_id, action_server_binary))
             return response.json()
         except requests.exceptions.RequestException:
             print("⚠️  Could not connect to server (server may not be running)")
             return None
 
-    def process_text_input(self, user_text):
+    def process_text_input(self, user_text, late_plan_timeout=late_plan_wait):
         """
         Process written text input and generate dog response sequence.
+        If the fallback plan was uploaded, waits up to late_plan_timeout
+        seconds for the LLM plan to replace it.
         """
         print(f"\n🐕 Processing: '{user_text}'")
         
@@ -176,8 +90,18 @@ React in an authentic dog-like manner with varied and creative actions!"""
         self.dog.add_user_input(user_text)
         
         try:
-            # Get LLM goals based on text input
-            valid_goals = self.get_llm_goals_from_text(user_text)
+            # Get LLM goals based on text input (local fallback plan if the LLM is slow or fails)
+            late_plan = None
+            if llm_fallback_enabled:
+                # Read the dog here; the executor only makes the request
+                prompt = goal_prompt(self.dog, user_text, "companion_text")
+                valid_goals, source, late_plan = plan_with_deadline(
+                    lambda: cached_goal_request(prompt, actions_short, late_plan_window),
+                    lambda: plan_fallback_goals(self.dog, user_text, actions_short),
+                )
+                late_plan = late_plan and LatePlan(late_plan, self.dog)
+            else:
+                valid_goals = self.get_llm_goals_from_text(user_text)
             print(f"📋 Generated {len(valid_goals)} actions: {[goal[0] for goal in valid_goals]}")
             
             # Build the action sequence
@@ -195,6 +119,8 @@ React in an authentic dog-like manner with varied and creative actions!"""
             
             # Upload to server if available
             self.upload_sequence(json_ready_sequence)
+            json_ready_sequence = (apply_late_plan(self.dog, late_plan, late_plan_timeout, upload=self.upload_sequence)
+                                   or json_ready_sequence)
                 
             return json_ready_sequence
             
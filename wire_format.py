@@ -0,0 +1,139 @@
+"""
+Binary Wire Format for Action Sequences
+
+- Optional compact encoding of [{"action": ..., "emotions": {...}}, ...],
+  negotiated with the Content-Type / Accept header CONTENT_TYPE. JSON stays
+  the default and is always accepted.
+- Layout (little-endian):
+      header  "DS", format version (u8), flags (u8), step count (u16)
+      step    action id (u8), then len(core_sentiments) float32 weights
+              in core_sentiments order
+  Actions outside ACTION_NAMES are sent as id 255, a length byte and the
+  UTF-8 name. Flag bit 0 marks "no sequence" (JSON null).
+- Weights travel as float32, so decoded values differ from the originals in
+  roughly the 7th significant digit.
+- A 3-step sequence is ~150 bytes instead of ~1.3 KB of JSON (see
+  benchmarks/wire_format_bench.py).
+"""
+
+import struct
+
+from config import core_sentiments, allowed_actions, actions_short
+
+CONTENT_TYPE = "application/x-dog-sequence"
+# Prefer binary, but let servers without it answer in JSON
+ACCEPT_BINARY = f"{CONTENT_TYPE}, application/json;q=0.5"
+
+# Fixed id order: append new actions at the end so old ids stay valid
+ACTION_NAMES = tuple(dict.fromkeys(list(allowed_actions) + list(actions_short)))
+ACTION_IDS = {name: i for i, name in enumerate(ACTION_NAMES)}
+EMOTION_IDS = {name: i for i, name in enumerate(core_sentiments)}
+
+MAGIC = b"DS"
+FORMAT_VERSION = 1
+FLAG_NULL = 0x01
+UNKNOWN_ACTION = 0xFF
+
+HEADER = struct.Struct("<2sBBH")
+WEIGHTS = struct.Struct(f"<{len(core_sentiments)}f")
+STEP = struct.Struct(f"<B{len(core_sentiments)}f")
+
+
+def encode_sequence(sequence):
+    """
+    Encode a sequence (or None) in the binary format.
+    Raises:
+        ValueError: If a step has keys other than action/emotions, emotions
+                    outside core_sentiments or weights that aren't numbers
+                    (send it as JSON instead), or isn't a step at all, or
+                    the sequence has more than 65535 steps.
+    """
+    if sequence is None:
+        return HEADER.pack(MAGIC, FORMAT_VERSION, FLAG_NULL, 0)
+    try:
+        parts = [HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(sequence))]
+    except (struct.error, TypeError) as e:
+        # More steps than the u16 count holds, or not a list at all
+        raise ValueError(f"Sequence cannot be encoded in the binary format ({e})") from e
+    for step in sequence:
+        try:
+            parts.append(_encode_step(step))
+        except (struct.error, TypeError, AttributeError, KeyError) as e:
+            # Non-numeric weights, non-string actions, steps that aren't dicts
+            raise ValueError(f"Step cannot be encoded in the binary format: {step} ({e})") from e
+    return b"".join(parts)
+
+
+def _encode_step(step):
+    emotions = step.get("emotions") or {}
+    if len(step) != 2 or not all(name in EMOTION_IDS for name in emotions):
+        raise ValueError(f"Step cannot be encoded in the binary format: {step}")
+    weights = [emotions.get(name, 0.0) for name in core_sentiments]
+    action_id = ACTION_IDS.get(step["action"])
+    if action_id is None:
+        name = step["action"].encode("utf-8")
+        return bytes((UNKNOWN_ACTION, len(name))) + name + WEIGHTS.pack(*weights)
+    return STEP.pack(action_id, *weights)
+
+
+def decode_sequence(data):
+    """
+    Decode the binary format.
+    Returns:
+        list or None: [{"action": ..., "emotions": {emotion: weight, ...}}, ...]
+    Raises:
+        ValueError: If the data is not a valid encoded sequence.
+    """
+    try:
+        magic, version, flags, count = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError("Not a binary dog sequence")
+        if flags & FLAG_NULL:
+            return None
+        offset = HEADER.size
+        sequence = []
+        for _ in range(count):
+            action_id = data[offset]
+            if action_id == UNKNOWN_ACTION:
+                length = data[offset + 1]
+                action = bytes(data[offset + 2:offset + 2 + length]).decode("utf-8")
+                offset += 2 + length
+                weights = WEIGHTS.unpack_from(data, offset)
+                offset += WEIGHTS.size
+            else:
+                action = ACTION_NAMES[action_id]
+                weights = STEP.unpack_from(data, offset)[1:]
+                offset += STEP.size
+            sequence.append({"action": action, "emotions": dict(zip(core_sentiments, weights))})
+    except (struct.error, IndexError, UnicodeDecodeError) as e:
+        raise ValueError(f"Malformed binary dog sequence: {e}")
+    if offset != len(data):
+        raise ValueError("Trailing data after binary dog sequence")
+    return sequence
+
+
+def sequence_request(sequence, dog_id, binary):
+    """
+    Keyword arguments for requests.post() that upload a sequence, binary if
+    requested and possible, else JSON.
+    """
+    if binary:
+        try:
+            return {"data": encode_sequence(sequence), "params": {"dog_id": dog_id},
+                    "headers": {"Content-Type": CONTENT_TYPE}}
+        except ValueError:
+            pass
+    return {"json": {"sequence": sequence, "dog_id": dog_id}}
+
+
+def read_sequence_response(response):
+    """
+    Read a /get_sequence response in either format.
+    Returns:
+        tuple: (sequence, version)
+    """
+    if response.headers.get("Content-Type", "").startswith(CONTENT_TYPE):
+        return decode_sequence(response.content), int(response.headers.get("X-Sequence-Version", 0))
+    data = response.json()
+    return data["sequence"], data.get("version", 0)
+